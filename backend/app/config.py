@@ -2,6 +2,7 @@
 Configuración de la aplicación
 """
 import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
@@ -17,6 +18,36 @@ class Settings(BaseSettings):
     
     # Base de datos
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    # Pool async (psycopg 3) para rutas async def; el pool psycopg2 sigue en 2-10
+    DB_ASYNC_POOL_MIN_SIZE: int = int(os.getenv("DB_ASYNC_POOL_MIN_SIZE", "1"))
+    DB_ASYNC_POOL_MAX_SIZE: int = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", "10"))
+    # Réplica de lectura opcional para reportes, auditoría e historial de órdenes.
+    # Si no responde o va más de MAX_LAG segundos por detrás, se lee del primario.
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DATABASE_REPLICA_MAX_LAG_SECONDS", "5"))
+    DATABASE_REPLICA_CHECK_SECONDS: float = float(os.getenv("DATABASE_REPLICA_CHECK_SECONDS", "2"))
+    DATABASE_REPLICA_POOL_MAX_SIZE: int = int(os.getenv("DATABASE_REPLICA_POOL_MAX_SIZE", "10"))
+    # LISTEN/NOTIFY entre workers; sin él las caches en memoria se desactivan
+    DB_EVENTS_ENABLED: bool = os.getenv("DB_EVENTS_ENABLED", "true").lower() == "true"
+    # Caché de reportes: los días cerrados no caducan; los que incluyen hoy, a los N segundos
+    REPORT_CACHE_MAX_ENTRIES: int = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "512"))
+    REPORT_CACHE_TODAY_TTL_SECONDS: int = int(os.getenv("REPORT_CACHE_TODAY_TTL_SECONDS", "30"))
+    # Conexiones del pool psycopg2 (máx. 10) que las secciones del dashboard pueden
+    # ocupar a la vez por worker; el resto de secciones espera su turno
+    DASHBOARD_MAX_CONNECTIONS: int = int(os.getenv("DASHBOARD_MAX_CONNECTIONS", "4"))
+    # Cubo de ventas en memoria (/api/reports/cube): una copia por worker, refrescada cada N segundos
+    SALES_CUBE_ENABLED: bool = os.getenv("SALES_CUBE_ENABLED", "true").lower() == "true"
+    SALES_CUBE_REFRESH_SECONDS: int = int(os.getenv("SALES_CUBE_REFRESH_SECONDS", "60"))
+    # Previsión de demanda (job en segundo plano, un solo worker calcula)
+    FORECAST_ENABLED: bool = os.getenv("FORECAST_ENABLED", "true").lower() == "true"
+    FORECAST_REFRESH_MINUTES: int = int(os.getenv("FORECAST_REFRESH_MINUTES", "60"))
+    FORECAST_HISTORY_WEEKS: int = int(os.getenv("FORECAST_HISTORY_WEEKS", "8"))
+    FORECAST_DAYS: int = int(os.getenv("FORECAST_DAYS", "7"))
+    # Idempotency-Key en POST de órdenes y pagos: respuestas guardadas N horas,
+    # las últimas N claves también en memoria por worker
+    IDEMPOTENCY_TTL_HOURS: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024"))
+    IDEMPOTENCY_PRUNE_MINUTES: int = int(os.getenv("IDEMPOTENCY_PRUNE_MINUTES", "60"))
     
     # API
     API_TITLE: str = "Burger POS API"
@@ -35,6 +66,26 @@ class Settings(BaseSettings):
     
     # Configuración de negocio
     TAX_RATE: float = 0.10  # 10% de impuestos
+    # Día de negocio: zona horaria del local y hora local a la que empieza el día
+    # (ventas a las 01:30 con corte a las 4 cuentan para el día anterior)
+    BUSINESS_TIMEZONE: str = os.getenv("BUSINESS_TIMEZONE", "UTC")
+    BUSINESS_DAY_CUTOFF_HOUR: int = int(os.getenv("BUSINESS_DAY_CUTOFF_HOUR", "0"))
+
+    @field_validator("BUSINESS_TIMEZONE")
+    @classmethod
+    def validate_business_timezone(cls, v):
+        try:
+            ZoneInfo(v)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"BUSINESS_TIMEZONE desconocida: {v}")
+        return v
+
+    @field_validator("BUSINESS_DAY_CUTOFF_HOUR")
+    @classmethod
+    def validate_cutoff_hour(cls, v):
+        if not 0 <= v <= 23:
+            raise ValueError("BUSINESS_DAY_CUTOFF_HOUR debe estar entre 0 y 23")
+        return v
 
     # Seguridad - NO DEFAULT VALUES for production
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
@@ -0,0 +1,116 @@
+"""
+Process-local registry of the active cash session id.
+
+Every order (POST /orders, POST /orders/batch), every payment and the
+"current session" order list need the id of the open cash session, which
+only changes when a session is opened or closed. Each worker keeps that id
+in memory instead of querying cash_sessions on every call.
+
+Rules:
+- "Active" is the open session opened last (ties by id), the same rule as
+  GET /cash/sessions/active (CashRepository).
+- Loaded as soon as the listener connects (startup and every reconnect,
+  when notifications may have been missed) and on demand after an
+  invalidation.
+- open_cash_session / close_cash_session already queue NOTIFY
+  "cash_sessions" on RESOURCES_CHANNEL (ETag guard); every worker drops its
+  id on it. The writer also updates its own copy after commit
+  (read-your-writes in this worker).
+- While the listener is down every call queries the database.
+- A load that overlaps an invalidation is not stored (generation check),
+  and neither is one read from the read replica.
+"""
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+from ..database import async_connection, read_staleness
+from ..repositories.cash_repository import ACTIVE_SESSION_ID_SQL
+from .db_events import db_events
+from .etag import RESOURCES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+_UNKNOWN = object()  # sin cargar (None significa "no hay sesión abierta")
+
+
+class ActiveSessionRegistry:
+    """Thread-safe: sync routes read it from the threadpool, the listener
+    invalidates it from the event loop."""
+
+    def __init__(self):
+        self._session_id = _UNKNOWN
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._preload_task: Optional[asyncio.Task] = None
+
+    def invalidate(self, payload: str = ""):
+        with self._lock:
+            self._session_id = _UNKNOWN
+            self._generation += 1
+
+    def set(self, session_id: Optional[int]):
+        """Active session after this worker committed an open/close."""
+        with self._lock:
+            self._generation += 1
+            self._session_id = session_id if db_events.is_listening else _UNKNOWN
+
+    def _lookup(self):
+        """(session_id, None) on hit, (_UNKNOWN, generation) on miss, (_UNKNOWN, None) if bypassed."""
+        with self._lock:
+            if not db_events.is_listening:
+                return _UNKNOWN, None
+            if self._session_id is not _UNKNOWN:
+                return self._session_id, None
+            return _UNKNOWN, self._generation
+
+    def _store(self, session_id: Optional[int], generation: Optional[int], conn) -> Optional[int]:
+        if generation is None or read_staleness(conn):
+            return session_id
+        with self._lock:
+            if generation == self._generation and db_events.is_listening:
+                self._session_id = session_id
+        return session_id
+
+    def get_id(self, conn) -> Optional[int]:
+        """Active session id for a psycopg2 connection (get_db / get_read_db)."""
+        session_id, generation = self._lookup()
+        if session_id is not _UNKNOWN:
+            return session_id
+        cursor = conn.cursor()
+        cursor.execute(ACTIVE_SESSION_ID_SQL)
+        row = cursor.fetchone()
+        return self._store(row['id'] if row else None, generation, conn)
+
+    async def aget_id(self, conn) -> Optional[int]:
+        """Same as get_id() for a psycopg 3 async connection (get_async_db)."""
+        session_id, generation = self._lookup()
+        if session_id is not _UNKNOWN:
+            return session_id
+        cursor = conn.cursor()
+        await cursor.execute(ACTIVE_SESSION_ID_SQL)
+        row = await cursor.fetchone()
+        return self._store(row['id'] if row else None, generation, conn)
+
+    async def _preload(self):
+        try:
+            async with async_connection() as conn:
+                session_id = await self.aget_id(conn)
+            logger.info("💵 Sesión de caja activa: %s", session_id if session_id is not None else "ninguna")
+        except Exception as e:
+            logger.warning("⚠️ No se pudo cargar la sesión de caja activa: %s", e)
+
+    def _on_reconnect(self):
+        self.invalidate()
+        self._preload_task = asyncio.get_running_loop().create_task(self._preload())
+
+    def _on_resources_changed(self, payload: str):
+        if "cash_sessions" in payload.split(","):
+            self.invalidate()
+
+
+# Singleton instance
+active_session = ActiveSessionRegistry()
+db_events.subscribe(RESOURCES_CHANNEL, active_session._on_resources_changed)
+db_events.on_reconnect(active_session._on_reconnect)
@@ -0,0 +1,90 @@
+"""
+Business-day model: which trading day an order belongs to.
+
+The shop trades past midnight, so a business day runs from
+BUSINESS_DAY_CUTOFF_HOUR (local time in BUSINESS_TIMEZONE) to the same hour
+the next day. An order at 01:30 with a 04:00 cutoff belongs to the previous
+business day.
+
+`created_at` columns are naive UTC (CURRENT_TIMESTAMP on a UTC database).
+Reports never wrap them in DATE(); a business day or a range of them is
+translated into a half-open [start, end) range of naive UTC timestamps,
+which the created_at indexes can serve:
+
+    start, end = day_bounds(report_date)
+    ... WHERE created_at >= %s AND created_at < %s
+
+orders.business_date (migration 007) stores the same value per order for
+grouping. It is filled by a trigger from the business_day_config row, which
+must match these settings; after changing them run
+
+    python -m app.services.sales_rollup --apply-business-day
+"""
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import psycopg
+from psycopg.rows import dict_row
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CONFIG_SQL = "SELECT timezone, cutoff_hour FROM business_day_config"
+
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def _to_utc_naive(local: datetime) -> datetime:
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def day_start(day: date) -> datetime:
+    """Naive UTC instant at which business day `day` starts."""
+    local = datetime.combine(day, time(settings.BUSINESS_DAY_CUTOFF_HOUR), _zone(settings.BUSINESS_TIMEZONE))
+    return _to_utc_naive(local)
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """Half-open [start, end) naive UTC range of one business day."""
+    return day_start(day), day_start(day + timedelta(days=1))
+
+
+def range_bounds(date_from: Optional[date], date_to: Optional[date]) -> tuple[Optional[datetime], Optional[datetime]]:
+    """Half-open range covering business days date_from..date_to (inclusive); None = unbounded."""
+    return (
+        day_start(date_from) if date_from else None,
+        day_start(date_to + timedelta(days=1)) if date_to else None,
+    )
+
+
+def business_date(created_at: datetime) -> date:
+    """Business day of a naive UTC timestamp."""
+    local = created_at.replace(tzinfo=timezone.utc).astimezone(_zone(settings.BUSINESS_TIMEZONE))
+    return (local - timedelta(hours=settings.BUSINESS_DAY_CUTOFF_HOUR)).date()
+
+
+def today() -> date:
+    """Current business day."""
+    return business_date(datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+async def check_database_config():
+    """Log an error if business_day_config (read by the business_date trigger) differs from the settings."""
+    async with await psycopg.AsyncConnection.connect(
+        settings.DATABASE_URL, connect_timeout=5, row_factory=dict_row
+    ) as conn:
+        row = await (await conn.execute(CONFIG_SQL)).fetchone()
+    expected = (settings.BUSINESS_TIMEZONE, settings.BUSINESS_DAY_CUTOFF_HOUR)
+    if row and (row['timezone'], row['cutoff_hour']) != expected:
+        logger.error(
+            "business_day_config de la base %s no coincide con BUSINESS_TIMEZONE/"
+            "BUSINESS_DAY_CUTOFF_HOUR %s: ejecute python -m app.services.sales_rollup --apply-business-day",
+            (row['timezone'], row['cutoff_hour']), expected,
+        )
@@ -0,0 +1,144 @@
+"""
+Process-local cache of the menu catalog (products, categories, modifiers).
+
+The menu changes a few times a day but every till refresh and every order
+reads it. Each worker keeps one snapshot of the three tables keyed by id,
+loaded in a single pass on first use and dropped when any worker commits a
+catalog change (NOTIFY on CATALOG_CHANNEL, see db_events).
+
+Rules:
+- Admin writes call `notify_catalog_changed()` inside their transaction and
+  `catalog_cache.invalidate()` after commit (read-your-writes in this worker;
+  the other workers get the NOTIFY).
+- While the listener is down the cache is bypassed: `get()` returns None and
+  callers run their own query.
+- A load that overlaps an invalidation is discarded (generation check), so a
+  snapshot read before a commit is never stored after it.
+- `stock_quantity` is decremented by every order without a NOTIFY, so in
+  cached rows it reflects the last load. Nothing that sells uses it.
+"""
+import logging
+import threading
+from typing import Optional
+
+from .db_events import NOTIFY_SQL, db_events
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "catalog_changed"
+
+# Same columns and order (ORDER BY name) as the uncached endpoints, so rows can
+# be returned as-is and list order matches the database collation.
+PRODUCTS_SQL = """
+    SELECT
+        p.id, p.name, p.category_id, p.price,
+        p.description, p.image_url, p.is_available,
+        p.sort_order, p.stock_quantity, p.created_at, p.updated_at,
+        c.name as category_name
+    FROM products p
+    JOIN categories c ON p.category_id = c.id
+    ORDER BY p.name
+"""
+
+CATEGORIES_SQL = "SELECT id, name, description, created_at FROM categories ORDER BY name"
+
+MODIFIERS_SQL = "SELECT id, name, price, is_active FROM modifiers ORDER BY name"
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog; dicts keyed by id, in name order."""
+
+    __slots__ = ("products", "categories", "modifiers")
+
+    def __init__(self, products: list, categories: list, modifiers: list):
+        self.products = {row['id']: row for row in products}
+        self.categories = {row['id']: row for row in categories}
+        self.modifiers = {row['id']: row for row in modifiers}
+
+
+class CatalogCache:
+    """Thread-safe: sync routes read it from the threadpool, the listener
+    invalidates it from the event loop."""
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "invalidations": 0}
+
+    @property
+    def generation(self) -> int:
+        """Increases with every invalidation (local, NOTIFY or reconnect)."""
+        return self._generation
+
+    def invalidate(self, payload: str = ""):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def _lookup(self) -> tuple[Optional[CatalogSnapshot], Optional[int]]:
+        """(snapshot, None) on hit, (None, generation) on miss, (None, None) if bypassed."""
+        with self._lock:
+            if not db_events.is_listening:
+                self._stats["bypassed"] += 1
+                return None, None
+            if self._snapshot is not None:
+                self._stats["hits"] += 1
+                return self._snapshot, None
+            self._stats["misses"] += 1
+            return None, self._generation
+
+    def _store(self, snapshot: CatalogSnapshot, generation: int) -> CatalogSnapshot:
+        with self._lock:
+            if generation == self._generation and db_events.is_listening:
+                self._snapshot = snapshot
+        return snapshot
+
+    def get(self, conn) -> Optional[CatalogSnapshot]:
+        """Snapshot for a psycopg2 connection (get_db), loading it if needed."""
+        snapshot, generation = self._lookup()
+        if snapshot is not None or generation is None:
+            return snapshot
+        cursor = conn.cursor()
+        rows = []
+        for query in (PRODUCTS_SQL, CATEGORIES_SQL, MODIFIERS_SQL):
+            cursor.execute(query)
+            rows.append(cursor.fetchall())
+        return self._store(CatalogSnapshot(*rows), generation)
+
+    async def aget(self, conn) -> Optional[CatalogSnapshot]:
+        """Same as get() for a psycopg 3 async connection (get_async_db)."""
+        snapshot, generation = self._lookup()
+        if snapshot is not None or generation is None:
+            return snapshot
+        cursor = conn.cursor()
+        rows = []
+        for query in (PRODUCTS_SQL, CATEGORIES_SQL, MODIFIERS_SQL):
+            await cursor.execute(query)
+            rows.append(await cursor.fetchall())
+        return self._store(CatalogSnapshot(*rows), generation)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "cached": self._snapshot is not None,
+                "listening": db_events.is_listening,
+                "products": len(self._snapshot.products) if self._snapshot else 0,
+                "categories": len(self._snapshot.categories) if self._snapshot else 0,
+                "modifiers": len(self._snapshot.modifiers) if self._snapshot else 0,
+            }
+
+
+def notify_catalog_changed(conn, table: str):
+    """Queue a catalog NOTIFY in the current (psycopg2) transaction; sent on commit."""
+    conn.cursor().execute(NOTIFY_SQL, (CATALOG_CHANNEL, table))
+
+
+# Singleton instance
+catalog_cache = CatalogCache()
+db_events.subscribe(CATALOG_CHANNEL, catalog_cache.invalidate)
+db_events.on_reconnect(catalog_cache.invalidate)
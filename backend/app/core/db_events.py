@@ -0,0 +1,116 @@
+"""
+Postgres LISTEN/NOTIFY listener shared by the in-process caches.
+
+Uvicorn runs several workers, each with its own memory. A write that changes
+cached data sends `pg_notify(channel, payload)` inside its transaction;
+Postgres delivers it to every listening worker only after COMMIT, so each
+worker can drop its copy within milliseconds of the change.
+
+- One dedicated autocommit connection per worker (not taken from the pools).
+- Reconnects with backoff if Postgres restarts. Notifications sent while
+  disconnected are lost, so `on_reconnect` hooks run after every (re)connect
+  and caches must start from scratch there.
+- `is_listening` is False while disconnected (or when DB_EVENTS_ENABLED is
+  off, e.g. in tests). Caches must not serve from memory in that state,
+  because they would never hear about changes.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional, Union
+
+import psycopg
+from psycopg import sql
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+Handler = Callable[[str], Union[None, Awaitable[None]]]
+
+
+class DbEventListener:
+    """Dispatch NOTIFY payloads to handlers registered per channel."""
+
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._reconnect_hooks: list[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[psycopg.AsyncConnection] = None
+        self._listening = False
+
+    @property
+    def is_listening(self) -> bool:
+        return self._listening
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Register a handler (sync or async) called with each payload."""
+        self._handlers[channel].append(handler)
+
+    def on_reconnect(self, hook: Callable[[], None]):
+        """Register a hook called after every successful (re)connect."""
+        self._reconnect_hooks.append(hook)
+
+    async def start(self):
+        if not settings.DB_EVENTS_ENABLED:
+            logger.warning("⚠️ DB events deshabilitados (DB_EVENTS_ENABLED=false): caches en memoria desactivadas")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="db-events-listener")
+
+    async def stop(self):
+        self._listening = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None and not self._conn.closed:
+            await self._conn.close()
+        self._conn = None
+
+    async def _run(self):
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                self._conn = await psycopg.AsyncConnection.connect(settings.DATABASE_URL, autocommit=True)
+                for channel in self._handlers:
+                    await self._conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                self._listening = True
+                delay = RECONNECT_MIN_SECONDS
+                logger.info("✅ Escuchando eventos de base de datos: %s", ", ".join(self._handlers))
+                for hook in self._reconnect_hooks:
+                    hook()
+
+                async for notify in self._conn.notifies():
+                    await self._dispatch(notify.channel, notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Listener de eventos desconectado: %s (reintento en %ds)", e, delay)
+            finally:
+                self._listening = False
+                if self._conn is not None and not self._conn.closed:
+                    await self._conn.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    async def _dispatch(self, channel: str, payload: str):
+        for handler in self._handlers.get(channel, []):
+            try:
+                result = handler(payload)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Error procesando evento %s: %s", channel, e, exc_info=True)
+
+
+# Singleton instance (one listener per worker)
+db_events = DbEventListener()
@@ -0,0 +1,136 @@
+"""
+Conditional GET (ETag / 304) for polled read endpoints.
+
+Each cacheable resource has a change counter in this worker, bumped by the
+NOTIFY its writers queue in their transaction ("orders" by ORDERS_CHANNEL,
+"tables" and "cash_sessions" by RESOURCES_CHANNEL). Postgres delivers it to
+every worker, the writer included, once the change commits. "catalog" reuses
+the catalog cache generation. A router opts in with
+
+    router = APIRouter(dependencies=[etag_guard("orders", "catalog")])
+
+and its GET endpoints then answer `If-None-Match` with a bare 304 before the
+route's own dependencies run: no psycopg2 connection, no row fetch, no
+pydantic serialization. The guard still authenticates the caller (one short
+user lookup on the async pool, see obtener_usuario_actual), and the role a
+route requires (verificar_rol) is checked before the 304, so a user without
+it gets a 403 whatever ETag they send. `Server-Timing:
+etag;desc="hit"|"miss"|"off"` tells which path a response took. The user id
+is part of the ETag, since some payloads depend on who asks (e.g.
+/cash/sessions/active) and tills are shared.
+
+The version is read before the route fetches data, and a counter moves only
+after the change is committed. An ETag can therefore be older than the data
+it was sent with, never newer, so a client can't get stuck on stale data.
+That only holds on the primary: a route reading from the replica
+(get_read_db) must be left out with `exclude`, since its data can be older
+than the counters.
+
+ETags are per worker (each has its own counters and an epoch renewed on every
+listener reconnect, when notifications may have been missed), so a poll
+answered by another worker gets a full response. With the listener down the
+guard is off and every request gets a 200.
+"""
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Iterable
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from ..security import obtener_usuario_actual
+from .catalog_cache import catalog_cache
+from .db_events import NOTIFY_SQL, db_events
+from .live_board import ORDERS_CHANNEL
+
+RESOURCES_CHANNEL = "resources_changed"
+
+
+class ResourceVersions:
+    def __init__(self):
+        self._counters: dict[str, int] = defaultdict(int)
+        self._epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+
+    def bump(self, *resources: str):
+        with self._lock:
+            for resource in resources:
+                self._counters[resource] += 1
+
+    def reset(self):
+        """New epoch: every ETag handed out so far stops matching."""
+        with self._lock:
+            self._epoch = uuid.uuid4().hex[:8]
+
+    def _version(self, resource: str) -> int:
+        # El catálogo ya lleva su propio contador (caché de catálogo)
+        if resource == "catalog":
+            return catalog_cache.generation
+        return self._counters[resource]
+
+    def etag(self, resources: Iterable[str], *extra: str) -> str:
+        with self._lock:
+            parts = [self._epoch] + [f"{r}.{self._version(r)}" for r in resources]
+        return f'W/"{"-".join(parts + [e for e in extra if e])}"'
+
+
+def _role_checks(dependant):
+    """verificar_rol dependencies of a route (they run after router dependencies)."""
+    for dependency in dependant.dependencies:
+        if hasattr(dependency.call, "roles_permitidos"):
+            yield dependency.call
+        yield from _role_checks(dependency)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def etag_guard(*resources: str, per_minute: bool = False, exclude: Iterable[str] = ()):
+    """
+    Router dependency: ETag from the versions of `resources`; 304 on match.
+
+    per_minute adds the current minute to the ETag, for payloads that embed
+    relative times (e.g. "12 Mins" on the tables plan). `exclude` lists
+    endpoint names whose payload changes without a resource bump or that
+    read from the replica.
+    """
+    skipped = frozenset(exclude)
+
+    async def guard(request: Request, response: Response, usuario = Depends(obtener_usuario_actual)):
+        route = request.scope.get("route")
+        if request.method != "GET" or getattr(route, "name", None) in skipped:
+            return
+        if not db_events.is_listening:
+            response.headers["Server-Timing"] = 'etag;desc="off"'
+            return
+
+        start = time.perf_counter()
+        minute = str(int(time.time() // 60)) if per_minute else ""
+        etag = resource_versions.etag(resources, f"u{usuario.get('id')}", minute)
+        dur = f"{(time.perf_counter() - start) * 1000:.3f}"
+        if _matches(request.headers.get("if-none-match", ""), etag):
+            # El 304 no puede saltarse el rol que exige la ruta
+            for check in _role_checks(route.dependant):
+                await check(usuario)
+            raise HTTPException(
+                status_code=304,
+                headers={"ETag": etag, "Server-Timing": f'etag;desc="hit";dur={dur}'},
+            )
+        response.headers["ETag"] = etag
+        response.headers["Server-Timing"] = f'etag;desc="miss";dur={dur}'
+
+    return Depends(guard)
+
+
+def notify_resources_changed(conn, *resources: str):
+    """Queue a NOTIFY for `resources` in the current (psycopg2) transaction; sent on commit."""
+    conn.cursor().execute(NOTIFY_SQL, (RESOURCES_CHANNEL, ",".join(resources)))
+
+
+# Singleton instance
+resource_versions = ResourceVersions()
+db_events.subscribe(RESOURCES_CHANNEL, lambda payload: resource_versions.bump(*payload.split(",")))
+db_events.subscribe(ORDERS_CHANNEL, lambda payload: resource_versions.bump("orders"))
+db_events.on_reconnect(resource_versions.reset)
@@ -0,0 +1,246 @@
+"""
+Idempotency-Key for the order and payment POSTs.
+
+Tills on flaky Wi-Fi retry POST /api/orders and POST /api/cash/payments when
+a response is lost, which used to record the order or payment twice. A
+client that sends the same `Idempotency-Key` header on every attempt of one
+operation gets the first successful response back on the retries; the
+request is not run again. The response carries `Idempotent-Replayed: true`.
+
+Rules:
+- The key is claimed with an INSERT into idempotency_keys (migration 015)
+  inside the request's own transaction, and the response is written to
+  the same row before the commit: the write and its stored response commit
+  or roll back together.
+- A retry that arrives while the first attempt is still running blocks on
+  the primary key until it commits (then replays) or rolls back (then runs).
+- Only successful responses are stored. A request that fails (4xx, 5xx)
+  leaves no key behind and can be retried as is.
+- The same key with a different body or user gets a 422.
+- Keys are scoped per endpoint and live IDEMPOTENCY_TTL_HOURS; a periodic
+  task prunes the table. Each worker also keeps the last
+  IDEMPOTENCY_CACHE_SIZE committed responses in memory (LRU), so most
+  retries do not touch the database. Stored responses never change, so
+  the LRU needs no invalidation beyond the TTL.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..config import settings
+from ..database import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+CLAIM_SQL = """
+    INSERT INTO idempotency_keys (scope, key, request_hash)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (scope, key) DO NOTHING
+    RETURNING key
+"""
+
+STORED_SQL = """
+    SELECT request_hash, status_code, response,
+           EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) AS age_seconds
+    FROM idempotency_keys
+    WHERE scope = %s AND key = %s
+"""
+
+SAVE_SQL = """
+    UPDATE idempotency_keys SET status_code = %s, response = %s::jsonb
+    WHERE scope = %s AND key = %s
+"""
+
+PRUNE_SQL = "DELETE FROM idempotency_keys WHERE created_at < CURRENT_TIMESTAMP - make_interval(hours => %s)"
+
+
+class _Stored(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: object
+    expires_at: float  # time.monotonic()
+
+
+class Claim:
+    """Key of one request. `replay` is set when the request must not run."""
+
+    def __init__(self, scope: str, key: str, request_hash: str):
+        self.scope = scope
+        self.key = key
+        self.request_hash = request_hash
+        self.replay: Optional[JSONResponse] = None
+        self.stored: Optional[_Stored] = None
+
+
+def request_hash(user: dict, payload) -> str:
+    """Hash of who sends the request and its body (a pydantic model)."""
+    document = {"user_id": (user or {}).get("id"), "body": jsonable_encoder(payload)}
+    return hashlib.sha256(json.dumps(document, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Thread-safe: sync routes run in the threadpool, async ones in the loop."""
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple, _Stored] = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- LRU ---
+
+    def _lookup(self, scope: str, key: str) -> Optional[_Stored]:
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[(scope, key)]
+                return None
+            self._entries.move_to_end((scope, key))
+            return entry
+
+    def _remember(self, scope: str, key: str, entry: _Stored):
+        with self._lock:
+            self._entries[(scope, key)] = entry
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > settings.IDEMPOTENCY_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- claim / replay ---
+
+    def _begin(self, scope: str, key: Optional[str], user: dict, payload) -> Optional[Claim]:
+        if not key:
+            return None
+        claim = Claim(scope, key, request_hash(user, payload))
+        entry = self._lookup(scope, key)
+        if entry is not None:
+            self._replay(claim, entry)
+        return claim
+
+    def _replay(self, claim: Claim, entry: _Stored):
+        if entry.request_hash != claim.request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key ya usada con otra solicitud"
+            )
+        claim.replay = JSONResponse(
+            status_code=entry.status_code, content=entry.body, headers={REPLAYED_HEADER: "true"}
+        )
+
+    def _from_row(self, claim: Claim, row: dict):
+        """Stored row of a key that was already claimed (and committed)."""
+        if row is None or row['status_code'] is None:
+            # Borrada por el TTL entre el INSERT y el SELECT, o guardada sin respuesta
+            raise HTTPException(status_code=409, detail="Solicitud con esta Idempotency-Key en curso, reintenta")
+        ttl = settings.IDEMPOTENCY_TTL_HOURS * 3600 - float(row['age_seconds'])
+        entry = _Stored(row['request_hash'], row['status_code'], row['response'], time.monotonic() + ttl)
+        self._replay(claim, entry)
+        self._remember(claim.scope, claim.key, entry)
+
+    def claim(self, conn, scope: str, key: Optional[str], user: dict, payload) -> Optional[Claim]:
+        """
+        Claim `key` on a psycopg2 connection (get_db) before the request's
+        first write. None without key; `claim.replay` set if already answered.
+        """
+        claim = self._begin(scope, key, user, payload)
+        if claim is None or claim.replay is not None:
+            return claim
+        cursor = conn.cursor()
+        cursor.execute(CLAIM_SQL, (scope, key, claim.request_hash))
+        if cursor.fetchone() is None:
+            cursor.execute(STORED_SQL, (scope, key))
+            row = cursor.fetchone()
+            conn.rollback()
+            self._from_row(claim, row)
+        return claim
+
+    async def aclaim(self, conn, scope: str, key: Optional[str], user: dict, payload) -> Optional[Claim]:
+        """Same as claim() for a psycopg 3 async connection (get_async_db)."""
+        claim = self._begin(scope, key, user, payload)
+        if claim is None or claim.replay is not None:
+            return claim
+        cursor = conn.cursor()
+        await cursor.execute(CLAIM_SQL, (scope, key, claim.request_hash))
+        if await cursor.fetchone() is None:
+            await cursor.execute(STORED_SQL, (scope, key))
+            row = await cursor.fetchone()
+            await conn.rollback()
+            self._from_row(claim, row)
+        return claim
+
+    # --- save the response (same transaction) ---
+
+    def _prepare(self, claim: Claim, status_code: int, response_model, data) -> tuple:
+        body = jsonable_encoder(response_model.model_validate(data))
+        claim.stored = _Stored(
+            claim.request_hash, status_code, body, time.monotonic() + settings.IDEMPOTENCY_TTL_HOURS * 3600
+        )
+        return status_code, json.dumps(body, separators=(",", ":")), claim.scope, claim.key
+
+    def save(self, conn, claim: Optional[Claim], status_code: int, response_model, data):
+        """Store the response before conn.commit(); remember() after it."""
+        if claim is None:
+            return
+        conn.cursor().execute(SAVE_SQL, self._prepare(claim, status_code, response_model, data))
+
+    async def asave(self, conn, claim: Optional[Claim], status_code: int, response_model, data):
+        if claim is None:
+            return
+        await conn.cursor().execute(SAVE_SQL, self._prepare(claim, status_code, response_model, data))
+
+    def remember(self, claim: Optional[Claim]):
+        """After the commit: later retries in this worker skip the database."""
+        if claim is not None and claim.stored is not None:
+            self._remember(claim.scope, claim.key, claim.stored)
+
+    # --- TTL pruning ---
+
+    def prune(self) -> int:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(PRUNE_SQL, (settings.IDEMPOTENCY_TTL_HOURS,))
+            deleted = cursor.rowcount
+            conn.commit()
+        return deleted
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.IDEMPOTENCY_PRUNE_MINUTES * 60)
+            try:
+                deleted = await asyncio.to_thread(self.prune)
+                if deleted:
+                    logger.info("🧹 Idempotency-Key: %d claves caducadas borradas", deleted)
+            except Exception as e:
+                logger.error("Error borrando Idempotency-Keys caducadas: %s", e, exc_info=True)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="idempotency-prune")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+idempotency = IdempotencyStore()
@@ -0,0 +1,178 @@
+"""
+In-memory live board of active orders for the Kitchen Display.
+
+Holds every order that is not completed or cancelled, with items and
+modifiers, in compact __slots__ objects. GET /api/orders/board serves it
+straight from memory together with a version token, so the KDS no longer
+runs get_orders + get_order per order on every reload.
+
+Maintenance is incremental: the routes that call notify_order_change also
+schedule `live_board.refresh([order_id])` and queue a NOTIFY on
+ORDERS_CHANNEL in their transaction, so the other workers refresh the same
+order when it commits. A refresh re-reads the affected orders from Postgres.
+Loads and refreshes run one at a time under an asyncio lock, and every read
+starts after the previous one finished. A later refresh therefore never
+applies an older state than an earlier one, whatever order the
+notifications arrive in.
+
+While the LISTEN connection is down the board cannot hear other workers,
+so it is dropped and snapshots are read from the database; it is rebuilt on
+the first snapshot after the listener reconnects.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Iterable, List, Optional
+
+from ..database import async_connection
+from ..repositories.order_repository import AsyncOrderRepository
+from .db_events import NOTIFY_SQL, db_events
+
+logger = logging.getLogger(__name__)
+
+ORDERS_CHANNEL = "orders_changed"
+FINISHED_STATUSES = ("completed", "cancelled")
+
+# Identifies this worker in NOTIFY payloads, so it skips its own notifications
+# (it already refreshed the order from the route's background task).
+_ORIGIN = uuid.uuid4().hex[:8]
+
+
+class _Slotted:
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BoardModifier(_Slotted):
+    __slots__ = ("id", "modifier_id", "modifier_name", "additional_price")
+
+    def __init__(self, row: dict):
+        for name in self.__slots__:
+            setattr(self, name, row.get(name))
+
+
+class BoardItem(_Slotted):
+    __slots__ = (
+        "id", "order_id", "product_id", "product_name", "quantity",
+        "unit_price", "subtotal", "special_instructions", "created_at", "modifiers",
+    )
+
+    def __init__(self, row: dict):
+        for name in self.__slots__[:-1]:
+            setattr(self, name, row.get(name))
+        self.modifiers = tuple(BoardModifier(m) for m in row.get('modifiers') or ())
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data['modifiers'] = [m.to_dict() for m in self.modifiers]
+        return data
+
+
+class BoardOrder(_Slotted):
+    __slots__ = (
+        "id", "order_number", "customer_name", "order_type", "status",
+        "subtotal", "tax", "delivery_fee", "discount", "total",
+        "payment_method", "notes", "table_id", "phone_line",
+        "created_at", "completed_at", "user_id", "waiter_name", "has_payment",
+        "items",
+    )
+
+    def __init__(self, row: dict):
+        for name in self.__slots__[:-1]:
+            setattr(self, name, row.get(name))
+        self.items = tuple(BoardItem(i) for i in row.get('items') or ())
+
+    def to_dict(self) -> dict:
+        data = super().to_dict()
+        data['items'] = [i.to_dict() for i in self.items]
+        return data
+
+
+class LiveBoard:
+    def __init__(self):
+        self._orders: dict[int, BoardOrder] = {}
+        self._loaded = False
+        self._counter = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        """Opaque token; equal tokens mean the same board contents in this worker."""
+        return f"{_ORIGIN}-{self._counter}" if self._loaded else None
+
+    def reset(self):
+        """Drop the board; the next snapshot reloads it from the database."""
+        self._loaded = False
+        self._orders.clear()
+
+    def _apply(self, order_ids: Iterable[int], rows: List[dict]):
+        by_id = {row['id']: row for row in rows}
+        for order_id in order_ids:
+            row = by_id.get(order_id)
+            if row is None or row['status'] in FINISHED_STATUSES:
+                self._orders.pop(order_id, None)
+            else:
+                self._orders[order_id] = BoardOrder(row)
+        self._counter += 1
+
+    def _ordered(self) -> List[dict]:
+        orders = sorted(self._orders.values(), key=lambda o: (o.created_at, o.id))
+        return [o.to_dict() for o in orders]
+
+    async def snapshot(self, conn) -> tuple[Optional[str], List[dict]]:
+        """(version, orders) from memory; loads the board with `conn` if needed."""
+        repo = AsyncOrderRepository(conn)
+        if not db_events.is_listening:
+            self.reset()
+            return None, await repo.get_active_with_details()
+
+        async with self._lock:
+            if not self._loaded:
+                rows = await repo.get_active_with_details()
+                self._orders = {row['id']: BoardOrder(row) for row in rows}
+                self._counter += 1
+                self._loaded = True
+            return self.version, self._ordered()
+
+    async def refresh(self, order_ids: List[int]):
+        """Re-read the given orders and add, replace or drop them."""
+        if not db_events.is_listening or not self._loaded:
+            return
+        try:
+            async with self._lock:
+                if not self._loaded:
+                    return
+                async with async_connection() as conn:
+                    rows = await AsyncOrderRepository(conn).get_many_with_details(order_ids)
+                self._apply(order_ids, rows)
+        except Exception as e:
+            # Sin la fila nueva el tablero quedaría desfasado: mejor recargarlo
+            logger.error("Error actualizando tablero de cocina: %s", e, exc_info=True)
+            self.reset()
+
+    async def _on_notify(self, payload: str):
+        origin, _, ids = payload.partition(":")
+        if origin != _ORIGIN:
+            await self.refresh([int(i) for i in ids.split(",") if i])
+
+
+def _payload(order_ids: Iterable[int]) -> str:
+    return f"{_ORIGIN}:{','.join(str(i) for i in order_ids)}"
+
+
+def notify_orders_changed(conn, order_ids: Iterable[int]):
+    """Queue the board NOTIFY in the current (psycopg2) transaction; sent on commit."""
+    conn.cursor().execute(NOTIFY_SQL, (ORDERS_CHANNEL, _payload(order_ids)))
+
+
+async def anotify_orders_changed(conn, order_ids: Iterable[int]):
+    """Same as notify_orders_changed() for an async (get_async_db) connection."""
+    await conn.cursor().execute(NOTIFY_SQL, (ORDERS_CHANNEL, _payload(order_ids)))
+
+
+# Singleton instance
+live_board = LiveBoard()
+db_events.subscribe(ORDERS_CHANNEL, live_board._on_notify)
+db_events.on_reconnect(live_board.reset)
@@ -0,0 +1,190 @@
+"""
+Process-local cache of report results (/api/reports).
+
+Reports over past business days are what managers open most (yesterday,
+last week, last month) and their data barely ever changes, yet each request
+re-runs the aggregation. Each worker keeps the result of every report keyed by
+endpoint and normalized parameters, together with the business days it covers.
+
+Rules:
+- Every write that can change a report sends NOTIFY on REPORTS_CHANNEL with
+  the business date it touched (triggers of migration 008 on orders and
+  order_items). The worker drops the entries whose range includes that day.
+  Payload "*" drops everything (rollup rebuilds, admin purge).
+- Closed days (the range ends before the current business day) have no
+  expiry: they stay until a NOTIFY for one of their days or LRU eviction.
+- Ranges that include the current business day, or are open-ended, also
+  expire after REPORT_CACHE_TODAY_TTL_SECONDS: a bound on staleness if a
+  change slips past the triggers (SQL run with triggers disabled).
+- Catalog changes (CATALOG_CHANNEL) drop everything: top-products embeds
+  product and category names.
+- While the listener is down the cache is bypassed, like the catalog cache.
+- A result computed while any invalidation happened is not stored
+  (generation check), so a report read before a commit is never stored
+  after it.
+- A result read from the read replica (staleness > 0) may predate a commit
+  whose NOTIFY already arrived. If one of its days was invalidated within
+  that window, a closed-day result gets the today TTL instead of no expiry.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, NamedTuple, Optional
+
+from ..config import settings
+from . import business_day
+from .catalog_cache import CATALOG_CHANNEL
+from .db_events import NOTIFY_SQL, db_events
+
+logger = logging.getLogger(__name__)
+
+REPORTS_CHANNEL = "reports_changed"
+PURGE_ALL = "*"
+
+
+class _Entry(NamedTuple):
+    value: Any
+    date_from: Optional[date]
+    date_to: Optional[date]
+    expires_at: Optional[float]  # None: día cerrado, sin caducidad
+
+    def covers(self, day: date) -> bool:
+        return (self.date_from is None or self.date_from <= day) and (self.date_to is None or day <= self.date_to)
+
+
+def make_key(endpoint: str, params: dict) -> str:
+    """Key independent of parameter order and types (dates as ISO strings)."""
+    return endpoint + ":" + json.dumps(params, sort_keys=True, default=str)
+
+
+class ReportCache:
+    """Thread-safe: sync routes read it from the threadpool, the listener
+    invalidates it from the event loop."""
+
+    def __init__(self, max_entries: int = 512, today_ttl: float = 30):
+        self.max_entries = max_entries
+        self.today_ttl = today_ttl
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._generation = 0
+        # Última invalidación por día de negocio (None: todo), en time.monotonic()
+        self._invalidated_at: dict[Optional[date], float] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "expired": 0, "evicted": 0, "invalidations": 0}
+
+    def _lookup(self, key: str) -> tuple[Any, Optional[int]]:
+        """(value, None) on hit, (None, generation) on miss, (None, None) if bypassed."""
+        with self._lock:
+            if not db_events.is_listening:
+                self._stats["bypassed"] += 1
+                return None, None
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value, None
+            self._stats["misses"] += 1
+            return None, self._generation
+
+    def _store(self, key: str, entry: _Entry, generation: int):
+        with self._lock:
+            if generation != self._generation or not db_events.is_listening:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def _invalidated_since(self, since: float, date_from: Optional[date], date_to: Optional[date]) -> bool:
+        probe = _Entry(None, date_from, date_to, None)
+        with self._lock:
+            return any(
+                at > since and (day is None or probe.covers(day))
+                for day, at in self._invalidated_at.items()
+            )
+
+    def get_or_compute(
+        self,
+        endpoint: str,
+        params: dict,
+        date_from: Optional[date],
+        date_to: Optional[date],
+        compute: Callable[[], Any],
+        staleness: float = 0,
+    ) -> Any:
+        """
+        Cached result of `compute()` for business days date_from..date_to
+        (inclusive; None = unbounded). The value is shared between requests
+        and must not be mutated. `staleness`: seconds the data `compute()`
+        reads may lag behind the primary (database.read_staleness).
+        """
+        key = make_key(endpoint, params)
+        value, generation = self._lookup(key)
+        if generation is None:
+            return compute() if value is None else value
+
+        started = time.monotonic()
+        value = compute()
+        closed = date_to is not None and date_to < business_day.today()
+        if closed and staleness and self._invalidated_since(started - staleness, date_from, date_to):
+            closed = False
+        expires_at = None if closed else time.monotonic() + self.today_ttl
+        self._store(key, _Entry(value, date_from, date_to, expires_at), generation)
+        return value
+
+    def invalidate(self, payload: str = PURGE_ALL) -> int:
+        """Drop entries covering the business day in `payload` (ISO date), or all of them for "*"."""
+        try:
+            day = None if payload in ("", PURGE_ALL) else date.fromisoformat(payload)
+        except ValueError:
+            logger.warning("Payload de %s inválido: %r (se vacía la caché)", REPORTS_CHANNEL, payload)
+            day = None
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+            now = time.monotonic()
+            self._invalidated_at[day] = now
+            if len(self._invalidated_at) > 256:
+                self._invalidated_at = {d: at for d, at in self._invalidated_at.items() if now - at < 3600}
+            if day is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            stale = [key for key, entry in self._entries.items() if entry.covers(day)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            closed = sum(1 for entry in self._entries.values() if entry.expires_at is None)
+            return {
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "listening": db_events.is_listening,
+                "entries": len(self._entries),
+                "closed_day_entries": closed,
+                "max_entries": self.max_entries,
+                "today_ttl_seconds": self.today_ttl,
+            }
+
+
+def notify_reports_changed(conn, payload: str = PURGE_ALL):
+    """Queue a reports NOTIFY in the current (psycopg2) transaction; sent on commit."""
+    conn.cursor().execute(NOTIFY_SQL, (REPORTS_CHANNEL, payload))
+
+
+# Singleton instance
+report_cache = ReportCache(settings.REPORT_CACHE_MAX_ENTRIES, settings.REPORT_CACHE_TODAY_TTL_SECONDS)
+db_events.subscribe(REPORTS_CHANNEL, report_cache.invalidate)
+# Nombres de productos y categorías en top-products
+db_events.subscribe(CATALOG_CHANNEL, lambda payload: report_cache.invalidate())
+db_events.on_reconnect(report_cache.invalidate)
@@ -1,10 +1,34 @@
 """
 Gestión de conexión a base de datos con connection pooling.
+
+Hay dos pools en paralelo durante la transición a async:
+- get_db: psycopg2 (bloqueante) para las rutas síncronas, que FastAPI ejecuta
+  en su threadpool.
+- get_async_db: psycopg 3 async para las rutas `async def`, que corren en el
+  event loop y no deben bloquearlo (WebSockets del KDS incluidos).
+
+Y una réplica de lectura opcional (DATABASE_REPLICA_URL) para las lecturas
+pesadas que no necesitan el último commit (reportes, auditoría, historial):
+- get_read_db / pooled_read_connection: conexión de la réplica, con su propio
+  pool, para no quitarle conexiones al cobro en el primario.
+- Cada DATABASE_REPLICA_CHECK_SECONDS se mide el retraso de la réplica con la
+  conexión que se va a entregar. Si no responde o va más de
+  DATABASE_REPLICA_MAX_LAG_SECONDS por detrás, las lecturas van al primario
+  hasta la siguiente comprobación.
+- Sin DATABASE_REPLICA_URL todo va al primario, como antes.
 """
+import asyncio
 import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from psycopg import pq
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 from .config import settings
 
 logger = logging.getLogger(__name__)
@@ -13,6 +37,11 @@ logger = logging.getLogger(__name__)
 # Se inicializa en el primer uso para no fallar en tiempo de importación (tests).
 _pool: ThreadedConnectionPool | None = None
 
+# Pool async (psycopg 3). También se crea en el primer uso; el lock evita que
+# dos requests concurrentes lo abran dos veces.
+_async_pool: AsyncConnectionPool | None = None
+_async_pool_lock = asyncio.Lock()
+
 def _get_pool() -> ThreadedConnectionPool:
     global _pool
     if _pool is None or _pool.closed:
@@ -38,4 +67,249 @@ def get_db():
     try:
         yield conn
     finally:
-        pool.putconn(conn)
\ No newline at end of file
+        pool.putconn(conn)
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Conexión psycopg2 del pool fuera del ciclo de dependencias de FastAPI.
+
+    Para generadores de StreamingResponse: FastAPI cierra las dependencias
+    con yield (get_db) antes de enviar el cuerpo, así que el generador debe
+    tomar y devolver su propia conexión. Revierte lo que quede abierto.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        try:
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+
+
+class _ReplicaConnection(psycopg2.extensions.connection):
+    """Conexiones del pool de la réplica (ver read_staleness)."""
+
+
+# Pool de la réplica y resultado de la última comprobación de retraso
+_replica_pool: ThreadedConnectionPool | None = None
+_replica_lock = threading.Lock()
+_replica_state = {"usable": False, "lag_seconds": None, "checked_at": None, "error": None}
+
+# Retraso 0 si la réplica ya aplicó todo lo recibido y sigue conectada al
+# primario; si no, la antigüedad de la última transacción aplicada.
+# Un DSN que apunta a un primario (p. ej. réplica promovida) no tiene retraso.
+REPLICA_LAG_SQL = """
+    SELECT pg_is_in_recovery() AS in_recovery,
+           EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming,
+           pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS caught_up,
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float AS replay_age
+"""
+
+
+def _get_replica_pool() -> ThreadedConnectionPool:
+    global _replica_pool
+    if _replica_pool is None or _replica_pool.closed:
+        _replica_pool = ThreadedConnectionPool(
+            minconn=1,
+            maxconn=settings.DATABASE_REPLICA_POOL_MAX_SIZE,
+            dsn=settings.DATABASE_REPLICA_URL,
+            cursor_factory=RealDictCursor,
+            connection_factory=_ReplicaConnection,
+        )
+        logger.info("Connection pool de la réplica creado (min=1, max=%d)", settings.DATABASE_REPLICA_POOL_MAX_SIZE)
+    return _replica_pool
+
+
+def _measure_lag(conn) -> float:
+    cursor = conn.cursor()
+    cursor.execute(REPLICA_LAG_SQL)
+    row = cursor.fetchone()
+    conn.rollback()
+    if not row["in_recovery"] or (row["streaming"] and row["caught_up"]):
+        return 0.0
+    return row["replay_age"] if row["replay_age"] is not None else float("inf")
+
+
+def _set_replica_state(usable: bool, lag_seconds: float | None = None, error: str | None = None):
+    with _replica_lock:
+        was_usable = _replica_state["usable"]
+        first = not was_usable and _replica_state["error"] is None
+        _replica_state.update(usable=usable, lag_seconds=lag_seconds, error=error)
+    if (was_usable or first) and not usable:
+        logger.warning("⚠️ Réplica de lectura no disponible (%s): lecturas al primario", error)
+    elif usable and not was_usable:
+        logger.info("✅ Réplica de lectura disponible (retraso %.2fs)", lag_seconds)
+
+
+def _release_replica(conn):
+    try:
+        if not conn.closed:
+            conn.rollback()
+    except psycopg2.Error:
+        pass
+    _get_replica_pool().putconn(conn, close=bool(conn.closed))
+
+
+def _acquire_replica():
+    """Conexión de la réplica, o None si no hay réplica, no responde, va retrasada o su pool está lleno."""
+    if not settings.DATABASE_REPLICA_URL:
+        return None
+    now = time.monotonic()
+    with _replica_lock:
+        checked_at = _replica_state["checked_at"]
+        due = checked_at is None or now - checked_at >= settings.DATABASE_REPLICA_CHECK_SECONDS
+        if not due and not _replica_state["usable"]:
+            return None
+        if due:
+            # Este request comprueba; los demás usan el último resultado mientras tanto
+            _replica_state["checked_at"] = now
+
+    try:
+        conn = _get_replica_pool().getconn()
+    except PoolError:
+        return None  # pool de la réplica agotado: no es un fallo de la réplica
+    except psycopg2.Error as e:
+        _set_replica_state(False, error=str(e).strip())
+        return None
+
+    if not due:
+        if not conn.closed:
+            return conn
+        _release_replica(conn)
+        _set_replica_state(False, error="conexión cerrada")
+        return None
+
+    try:
+        lag = _measure_lag(conn)
+    except psycopg2.Error as e:
+        _release_replica(conn)
+        _set_replica_state(False, error=str(e).strip())
+        return None
+    if lag > settings.DATABASE_REPLICA_MAX_LAG_SECONDS:
+        _release_replica(conn)
+        _set_replica_state(False, lag, f"retraso {lag:.2f}s")
+        return None
+    _set_replica_state(True, lag)
+    return conn
+
+
+def get_read_db():
+    """
+    Conexión para lecturas que toleran DATABASE_REPLICA_MAX_LAG_SECONDS de retraso.
+
+    De la réplica si está configurada y al día; si no, del pool del primario
+    (mismo comportamiento que get_db). Solo para SELECT: en la réplica
+    cualquier escritura falla.
+
+    Yields:
+        Connection: Conexión a PostgreSQL con RealDictCursor
+    """
+    conn = _acquire_replica()
+    if conn is None:
+        yield from get_db()
+        return
+    try:
+        yield conn
+    finally:
+        _release_replica(conn)
+
+
+@contextmanager
+def pooled_read_connection():
+    """Como pooled_connection, pero de la réplica cuando se puede (ver get_read_db)."""
+    conn = _acquire_replica()
+    if conn is None:
+        with pooled_connection() as conn:
+            yield conn
+        return
+    try:
+        yield conn
+    finally:
+        _release_replica(conn)
+
+
+def read_staleness(conn) -> float:
+    """Segundos que los datos de `conn` pueden ir por detrás del primario (0 en el primario)."""
+    if isinstance(conn, _ReplicaConnection):
+        return settings.DATABASE_REPLICA_MAX_LAG_SECONDS + settings.DATABASE_REPLICA_CHECK_SECONDS
+    return 0.0
+
+
+def replica_status() -> dict:
+    """Estado de la réplica de lectura para /health."""
+    with _replica_lock:
+        state = dict(_replica_state)
+    checked_at = state.pop("checked_at")
+    return {
+        "configured": bool(settings.DATABASE_REPLICA_URL),
+        **state,
+        "checked_seconds_ago": round(time.monotonic() - checked_at, 1) if checked_at is not None else None,
+        "max_lag_seconds": settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    }
+
+
+async def _get_async_pool() -> AsyncConnectionPool:
+    global _async_pool
+    if _async_pool is None or _async_pool.closed:
+        async with _async_pool_lock:
+            if _async_pool is None or _async_pool.closed:
+                pool = AsyncConnectionPool(
+                    conninfo=settings.DATABASE_URL,
+                    min_size=settings.DB_ASYNC_POOL_MIN_SIZE,
+                    max_size=settings.DB_ASYNC_POOL_MAX_SIZE,
+                    kwargs={"row_factory": dict_row},
+                    open=False,
+                )
+                await pool.open()
+                _async_pool = pool
+                logger.info(
+                    "Async connection pool creado (min=%d, max=%d)",
+                    settings.DB_ASYNC_POOL_MIN_SIZE, settings.DB_ASYNC_POOL_MAX_SIZE
+                )
+    return _async_pool
+
+
+async def get_async_db():
+    """
+    Obtener una conexión async (psycopg 3) del pool.
+
+    Misma interfaz que get_db pero con await: `cursor = conn.cursor()`,
+    `await cursor.execute(...)`, `await cursor.fetchone()`. Las filas son
+    dicts (dict_row), igual que con RealDictCursor. Si el request deja una
+    transacción abierta (p. ej. solo lecturas) se revierte al devolverla.
+
+    Yields:
+        AsyncConnection: Conexión a PostgreSQL con dict_row
+    """
+    pool = await _get_async_pool()
+    conn = await pool.getconn()
+    try:
+        yield conn
+    finally:
+        if conn.info.transaction_status in (pq.TransactionStatus.INTRANS, pq.TransactionStatus.INERROR):
+            await conn.rollback()
+        await pool.putconn(conn)
+
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Conexión async del pool fuera de un request (tareas en background,
+    listeners). Hace commit al salir, o rollback si hubo excepción.
+    """
+    pool = await _get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def close_async_pool():
+    """Cerrar el pool async (shutdown de la aplicación)."""
+    global _async_pool
+    if _async_pool is not None and not _async_pool.closed:
+        await _async_pool.close()
+        logger.info("Async connection pool cerrado")
+    _async_pool = None
@@ -13,6 +13,12 @@ from fastapi.staticfiles import StaticFiles
 from .routers import categories, products, orders, modifiers, tables, reports, customers, auth, cash_register, uploads, websocket_router, audit, geocoding
 from .middleware.audit_middleware import AuditMiddleware
 from .core.rabbitmq import mq
+from .core.db_events import db_events
+from .core import business_day
+from .services.sales_cube import sales_cube
+from .services.demand_forecast import demand_forecast_job
+from .core.idempotency import idempotency
+from .database import close_async_pool, replica_status
 
 # Configurar logging
 logging.basicConfig(
@@ -43,8 +49,37 @@ async def lifespan(app: FastAPI):
                 else:
                     logger.error("❌ No se pudo conectar a RabbitMQ tras 5 intentos. La app continúa sin él.")
 
+    # Startup: Verificar que el día de negocio de la base coincide con la configuración
+    try:
+        await business_day.check_database_config()
+    except Exception as e:
+        logger.warning("⚠️ No se pudo verificar business_day_config: %s", e)
+
+    # Startup: Escuchar NOTIFY de Postgres (invalidación de caches entre workers)
+    await db_events.start()
+
+    # Startup: Cargar el cubo de ventas en segundo plano (no retrasa el arranque)
+    await sales_cube.start()
+
+    # Startup: Job periódico de previsión de demanda
+    await demand_forecast_job.start()
+
+    # Startup: Borrado periódico de Idempotency-Keys caducadas
+    await idempotency.start()
+
     yield  # La aplicación corre aquí
 
+    # Shutdown: Detener los jobs en segundo plano
+    await idempotency.stop()
+    await demand_forecast_job.stop()
+    await sales_cube.stop()
+
+    # Shutdown: Dejar de escuchar eventos de base de datos
+    await db_events.stop()
+
+    # Shutdown: Cerrar el pool de conexiones async
+    await close_async_pool()
+
     # Shutdown: Cerrar conexión a RabbitMQ
     if settings.RABBITMQ_ENABLED:
         logger.info("🔌 Cerrando conexión a RabbitMQ...")
@@ -71,7 +106,8 @@ app.add_middleware(
     allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "Accept"],
+    allow_headers=["Authorization", "Content-Type", "Accept", "Idempotency-Key"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "Idempotent-Replayed"],
 )
 
 # Agregar Audit Middleware (después de CORS)
@@ -130,7 +166,8 @@ def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "read_replica": replica_status()
     }
 
 if __name__ == "__main__":
@@ -12,7 +12,11 @@ from .order import (
     OrderItemCreate,
     OrderWithDetails,
     OrderStatus,
-    OrderType
+    OrderType,
+    LiveBoardSnapshot,
+    PhoneLineStatus,
+    OrderBatchCreate,
+    OrderBatchResponse
 )
 from .table import Table, TableCreate, TableUpdate
 from .modifier import Modifier, ModifierCreate, ModifierUpdate
@@ -43,6 +47,10 @@ __all__ = [
     "OrderWithDetails",
     "OrderStatus",
     "OrderType",
+    "LiveBoardSnapshot",
+    "PhoneLineStatus",
+    "OrderBatchCreate",
+    "OrderBatchResponse",
     
     # Tables
     "Table",
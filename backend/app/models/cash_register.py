@@ -7,6 +7,9 @@ from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 
+# Máximo de pagos por POST /api/cash/payments/batch
+MAX_BATCH_PAYMENTS = 50
+
 
 class CashSessionStatus(str, Enum):
     """Estados de sesión de caja"""
@@ -71,6 +74,11 @@ class PaymentCreate(BaseModel):
     tip_amount: Decimal = Field(ge=0, default=Decimal("0.00"))
 
 
+class PaymentBatchCreate(BaseModel):
+    """Pagos parciales de una cuenta dividida (una o varias órdenes)"""
+    payments: List[PaymentCreate] = Field(min_length=1, max_length=MAX_BATCH_PAYMENTS)
+
+
 class PaymentResponse(BaseModel):
     """Respuesta de pago con cambio calculado"""
     id: int
@@ -87,13 +95,51 @@ class PaymentResponse(BaseModel):
         from_attributes = True
 
 
+class OrderBalance(BaseModel):
+    """Saldo de una orden después del lote de pagos"""
+    order_id: int
+    total: Decimal
+    paid: Decimal
+    remaining: Decimal
+
+
+class PaymentBatchResponse(BaseModel):
+    """Pagos registrados, en el mismo orden que los enviados, y saldo por orden"""
+    payments: List[PaymentResponse]
+    orders: List[OrderBalance]
+
+
+class PaymentTypeTotal(BaseModel):
+    """Totales de un tipo de pago en la sesión"""
+    payment_type: str
+    payments: int
+    total_amount: Decimal
+    tip_amount: Decimal
+
+
+class ProductTotal(BaseModel):
+    """Producto vendido en la sesión"""
+    product_id: Optional[int] = None
+    product_name: str
+    quantity: int
+    revenue: Decimal
+
+
 class CashSessionSummary(BaseModel):
-    """Resumen de caja para cierre"""
+    """Resumen de caja para cierre (informe Z congelado si la sesión está cerrada)"""
     session_id: int
+    status: Optional[str] = None
     opening_amount: Decimal
+    closing_amount: Optional[Decimal] = None
+    difference: Optional[Decimal] = None
     total_cash_sales: Decimal
     total_card_sales: Decimal
+    total_sales: Decimal = Decimal("0.00")
     total_tips: Decimal
     expected_cash: Decimal  # opening + cash_sales + tips
     orders_count: int
+    opened_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+    payment_types: List[PaymentTypeTotal] = []
+    top_products: List[ProductTotal] = []
     payments: List[PaymentResponse] = []
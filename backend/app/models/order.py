@@ -6,6 +6,10 @@ from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
+from uuid import UUID
+
+# Máximo de órdenes por POST /api/orders/batch
+MAX_BATCH_ORDERS = 300
 
 class OrderType(str, Enum):
     """Tipos de orden"""
@@ -73,6 +77,14 @@ class OrderCreate(BaseModel):
     status: Optional[OrderStatus] = None
     user_id: Optional[int] = None
 
+class OrderBatchItem(OrderCreate):
+    """Orden encolada por un till offline, con su id generado en el cliente"""
+    client_order_id: UUID
+
+class OrderBatchCreate(BaseModel):
+    """Lote de órdenes a registrar de una vez"""
+    orders: List[OrderBatchItem] = Field(min_length=1, max_length=MAX_BATCH_ORDERS)
+
 class OrderUpdate(BaseModel):
     """Modelo para actualizar orden"""
     status: Optional[OrderStatus] = None
@@ -111,3 +123,33 @@ class Order(OrderBase):
 class OrderWithDetails(Order):
     """Orden con items"""
     items: List[OrderItem]
+
+class OrderBatchResult(BaseModel):
+    """Resultado de una orden del lote: created, duplicate (ya registrada) o error"""
+    client_order_id: UUID
+    status: str
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+class OrderBatchResponse(BaseModel):
+    """Resultados del lote, en el mismo orden que las órdenes enviadas"""
+    created: int
+    duplicates: int
+    errors: int
+    results: List[OrderBatchResult]
+
+class PhoneLineStatus(BaseModel):
+    """Ocupación de una línea telefónica"""
+    line: int
+    occupied: bool
+    order_id: Optional[int] = None
+    order_number: Optional[str] = None
+    customer_name: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class LiveBoardSnapshot(BaseModel):
+    """Tablero de cocina (órdenes en curso). `version` es None si se leyó de la base de datos"""
+    version: Optional[str] = None
+    up_to_date: bool = False
+    orders: List[OrderWithDetails] = []
@@ -0,0 +1,253 @@
+"""
+Repositorio de sesiones de caja.
+
+Conexión psycopg2 (get_db o pooled_connection): lo usan las rutas síncronas
+de caja y el dashboard de reportes.
+
+Sesión activa = la abierta más recientemente (empates por id). Las rutas
+calientes leen solo su id de core.active_session, con la misma regla.
+
+Totales (migración 012): los pagos se suman en contadores repartidos
+(cash_session_totals) para que las cajas no se bloqueen entre sí. Se leen
+siempre de la vista cash_session_balances; al cerrar la sesión se pliegan
+en cash_sessions (fold_totals).
+
+Informe Z (migración 013): al cerrar, el resumen de la sesión se guarda
+como un documento JSONB en cash_session_reports; el resumen de una sesión
+cerrada es una lectura por clave primaria.
+"""
+import json
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+SESSION_COLUMNS = """
+    id, user_id, status, opening_amount, closing_amount,
+    expected_amount, difference, total_cash_sales, total_card_sales,
+    total_sales, total_tips, orders_count, opened_at, closed_at, notes
+"""
+
+ACTIVE_SESSION_SQL = f"""
+    SELECT {SESSION_COLUMNS}
+    FROM cash_session_balances
+    WHERE status = 'open'
+"""
+
+ACTIVE_SESSION_ORDER = " ORDER BY opened_at DESC, id DESC LIMIT 1"
+
+ACTIVE_SESSION_ID_SQL = "SELECT id FROM cash_sessions WHERE status = 'open'" + ACTIVE_SESSION_ORDER
+
+Z_REPORT_TOP_PRODUCTS = 10
+
+
+class CashRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_active_session(self, user_id: Optional[int] = None) -> Optional[dict]:
+        """Sesión abierta más reciente (del usuario indicado, si se pasa)"""
+        query, params = ACTIVE_SESSION_SQL, []
+        if user_id:
+            query += " AND user_id = %s"
+            params.append(user_id)
+        query += ACTIVE_SESSION_ORDER
+
+        cursor = self.conn.cursor()
+        cursor.execute(query, params if params else None)
+        return cursor.fetchone()
+
+    def fold_totals(self, session_id: int) -> dict:
+        """
+        Pasa los contadores de la sesión a cash_sessions y los borra.
+        Llamar con la fila de la sesión bloqueada (FOR UPDATE): así ningún
+        pago de esa sesión queda a medias mientras tanto.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            WITH folded AS (
+                DELETE FROM cash_session_totals
+                WHERE cash_session_id = %(id)s
+                RETURNING total_cash_sales, total_card_sales, total_sales, total_tips, orders_count
+            ), sums AS (
+                SELECT COALESCE(SUM(total_cash_sales), 0) AS cash_sales,
+                       COALESCE(SUM(total_card_sales), 0) AS card_sales,
+                       COALESCE(SUM(total_sales), 0) AS sales,
+                       COALESCE(SUM(total_tips), 0) AS tips,
+                       COALESCE(SUM(orders_count), 0) AS orders
+                FROM folded
+            )
+            UPDATE cash_sessions s
+            SET total_cash_sales = COALESCE(s.total_cash_sales, 0) + sums.cash_sales,
+                total_card_sales = COALESCE(s.total_card_sales, 0) + sums.card_sales,
+                total_sales      = COALESCE(s.total_sales, 0) + sums.sales,
+                total_tips       = COALESCE(s.total_tips, 0) + sums.tips,
+                orders_count     = COALESCE(s.orders_count, 0) + sums.orders
+            FROM sums
+            WHERE s.id = %(id)s
+            RETURNING s.total_cash_sales, s.total_card_sales, s.total_sales,
+                      s.total_tips, s.orders_count
+        """, {"id": session_id})
+        return cursor.fetchone()
+
+    def lock_order_balances(self, order_ids: List[int]) -> Dict[int, dict]:
+        """
+        {order_id: {'id', 'total', 'status', 'paid'}} de las órdenes, bloqueadas
+        hasta el commit (en orden de id) para que dos cajas no cobren el mismo
+        saldo a la vez. paid = suma de los pagos ya registrados.
+
+        Dos sentencias a propósito: en READ COMMITTED, una consulta que espera
+        el bloqueo solo vuelve a leer la fila bloqueada, así que una suma de
+        pagos en la misma sentencia saldría de antes de la espera. La suma va
+        después, con el bloqueo ya tomado, y ve los pagos de la otra caja.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, total, status
+            FROM orders
+            WHERE id = ANY(%s)
+            ORDER BY id
+            FOR UPDATE
+        """, (order_ids,))
+        orders = {row['id']: {**row, 'paid': Decimal("0")} for row in cursor.fetchall()}
+        if not orders:
+            return orders
+
+        cursor.execute("""
+            SELECT order_id, SUM(total_amount) AS paid
+            FROM payments
+            WHERE order_id = ANY(%s)
+            GROUP BY order_id
+        """, (list(orders),))
+        for row in cursor.fetchall():
+            orders[row['order_id']]['paid'] = row['paid']
+        return orders
+
+    def insert_payments(self, session_id: Optional[int], payments: List[dict]) -> List[dict]:
+        """Inserta los pagos con una sola sentencia (un único ajuste de los totales de la sesión)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO payments (
+                order_id, cash_session_id, payment_type,
+                total_amount, cash_amount, card_amount, tip_amount, change_amount
+            )
+            SELECT order_id, %s, payment_type, total_amount, cash_amount, card_amount, tip_amount, change_amount
+            FROM unnest(%s::int[], %s::varchar[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[])
+                WITH ORDINALITY AS p(order_id, payment_type, total_amount, cash_amount, card_amount,
+                                     tip_amount, change_amount, n)
+            ORDER BY n
+            RETURNING id, order_id, payment_type, total_amount, cash_amount,
+                      card_amount, tip_amount, change_amount, created_at
+        """, (
+            session_id,
+            [p['order_id'] for p in payments],
+            [p['payment_type'] for p in payments],
+            [p['total_amount'] for p in payments],
+            [p['cash_amount'] for p in payments],
+            [p['card_amount'] for p in payments],
+            [p['tip_amount'] for p in payments],
+            [p['change_amount'] for p in payments],
+        ))
+        # Los ids siguen el orden de inserción (ORDER BY n)
+        return sorted(cursor.fetchall(), key=lambda row: row['id'])
+
+    def set_payment_method(self, order_ids: List[int]):
+        """
+        payment_method de órdenes ya saldadas: el tipo de sus pagos, o 'mixed'
+        si son varios. No llamar con órdenes a medio pagar: el tablero y el
+        frontend toman payment_method como "pagada".
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            UPDATE orders o
+            SET payment_method = m.payment_method
+            FROM (
+                SELECT order_id,
+                       CASE WHEN COUNT(DISTINCT payment_type) > 1 THEN 'mixed'
+                            ELSE MIN(payment_type) END AS payment_method
+                FROM payments
+                WHERE order_id = ANY(%s)
+                GROUP BY order_id
+            ) m
+            WHERE o.id = m.order_id
+        """, (order_ids,))
+
+    def build_z_report(self, session_id: int) -> Optional[dict]:
+        """
+        Resumen de la sesión calculado en el momento (CashSessionSummary +
+        user_id): totales, desglose por tipo de pago, productos más vendidos
+        y la lista de pagos. None si la sesión no existe.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {SESSION_COLUMNS} FROM cash_session_balances WHERE id = %s", (session_id,))
+        session = cursor.fetchone()
+        if not session:
+            return None
+
+        cursor.execute("""
+            SELECT id, order_id, payment_type, total_amount, cash_amount,
+                   card_amount, tip_amount, change_amount, created_at
+            FROM payments
+            WHERE cash_session_id = %s
+            ORDER BY created_at DESC
+        """, (session_id,))
+        payments = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT oi.product_id, COALESCE(p.name, 'Producto eliminado') AS product_name,
+                   SUM(oi.quantity) AS quantity, SUM(oi.subtotal) AS revenue
+            FROM order_items oi
+            LEFT JOIN products p ON p.id = oi.product_id
+            WHERE oi.order_id IN (SELECT order_id FROM payments WHERE cash_session_id = %s)
+            GROUP BY oi.product_id, p.name
+            ORDER BY quantity DESC, revenue DESC
+            LIMIT %s
+        """, (session_id, Z_REPORT_TOP_PRODUCTS))
+        top_products = cursor.fetchall()
+
+        by_type = defaultdict(lambda: {"payments": 0, "total_amount": Decimal("0"), "tip_amount": Decimal("0")})
+        for payment in payments:
+            totals = by_type[payment['payment_type']]
+            totals["payments"] += 1
+            totals["total_amount"] += Decimal(str(payment['total_amount']))
+            totals["tip_amount"] += Decimal(str(payment['tip_amount'] or 0))
+
+        expected_cash = (
+            Decimal(str(session['opening_amount'])) +
+            Decimal(str(session['total_cash_sales'])) +
+            Decimal(str(session['total_tips']))
+        )
+        return {
+            "session_id": session['id'],
+            "user_id": session['user_id'],
+            "status": session['status'],
+            "opening_amount": session['opening_amount'],
+            "closing_amount": session['closing_amount'],
+            "difference": session['difference'],
+            "total_cash_sales": session['total_cash_sales'],
+            "total_card_sales": session['total_card_sales'],
+            "total_sales": session['total_sales'],
+            "total_tips": session['total_tips'],
+            "expected_cash": expected_cash,
+            "orders_count": session['orders_count'],
+            "opened_at": session['opened_at'],
+            "closed_at": session['closed_at'],
+            "payment_types": [{"payment_type": t, **totals} for t, totals in sorted(by_type.items())],
+            "top_products": top_products,
+            "payments": payments,
+        }
+
+    def get_z_report(self, session_id: int) -> Optional[dict]:
+        """Informe Z guardado al cerrar la sesión (None si no lo hay)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT report FROM cash_session_reports WHERE cash_session_id = %s", (session_id,))
+        row = cursor.fetchone()
+        return row['report'] if row else None
+
+    def save_z_report(self, session_id: int, report: dict):
+        """Guarda el informe Z de una sesión cerrada; el primero que se guarda no cambia"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO cash_session_reports (cash_session_id, report)
+            VALUES (%s, %s::jsonb)
+            ON CONFLICT (cash_session_id) DO NOTHING
+        """, (session_id, json.dumps(report, default=str, separators=(",", ":"))))
@@ -0,0 +1,400 @@
+"""
+Repositorio de órdenes en base de datos.
+
+Todas las operaciones son por conjuntos: una consulta para todos los productos,
+una para todos los modificadores, un único INSERT para items + modificadores,
+un único UPDATE de inventario y una sola consulta para leer órdenes completas
+(items y modificadores incluidos). El número de sentencias no crece con el
+tamaño de la orden.
+"""
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from ..core import business_day
+from ..core.catalog_cache import catalog_cache
+
+# Los parámetros son arrays (unnest / ANY), que psycopg adapta igual que listas
+# de Python, así que las mismas sentencias sirven para cualquier tamaño de orden.
+
+PRODUCTS_BY_IDS_SQL = """
+    SELECT id, name, price, is_available
+    FROM products
+    WHERE id = ANY(%s)
+"""
+
+ACTIVE_MODIFIERS_BY_IDS_SQL = """
+    SELECT id, name, price
+    FROM modifiers
+    WHERE id = ANY(%s) AND is_active = TRUE
+"""
+
+# Los ids de order_items se reservan dentro del CTE (materializado una sola vez)
+# para poder enlazar cada modificador con su item por posición (ord). Cada item
+# lleva su order_id, así que la misma sentencia sirve para una orden o un lote.
+INSERT_ITEMS_SQL = """
+    WITH new_items AS MATERIALIZED (
+        SELECT
+            nextval(pg_get_serial_sequence('order_items', 'id')) AS id,
+            t.ord, t.order_id, t.product_id, t.quantity, t.unit_price, t.subtotal,
+            t.special_instructions
+        FROM unnest(%s::int[], %s::int[], %s::int[], %s::numeric[], %s::numeric[], %s::text[])
+             WITH ORDINALITY AS t(order_id, product_id, quantity, unit_price, subtotal,
+                                  special_instructions, ord)
+    ), inserted AS (
+        INSERT INTO order_items (
+            id, order_id, product_id, quantity,
+            unit_price, subtotal, special_instructions
+        )
+        SELECT id, order_id, product_id, quantity, unit_price, subtotal, special_instructions
+        FROM new_items
+        ORDER BY ord
+        RETURNING id
+    )
+    INSERT INTO order_item_modifiers (order_item_id, modifier_id, price)
+    SELECT ni.id, m.modifier_id, m.price
+    FROM unnest(%s::bigint[], %s::int[], %s::numeric[])
+         WITH ORDINALITY AS m(item_ord, modifier_id, price, ord)
+    JOIN new_items ni ON ni.ord = m.item_ord
+    ORDER BY m.ord
+"""
+
+# Orden + items + modificadores en un solo viaje: los items y sus modificadores
+# se agregan como JSON con subconsultas LATERAL. Los importes van como texto
+# para que lleguen como Decimal exacto (json los convertiría a float).
+ORDER_DETAILS_SELECT = """
+    SELECT
+        o.id, o.order_number, o.customer_name, o.order_type, o.status,
+        o.subtotal, o.tax, o.delivery_fee, o.discount, o.total,
+        o.payment_method, o.notes, o.table_id, o.phone_line,
+        o.created_at, o.completed_at, o.user_id,
+        u.full_name as waiter_name,
+        COALESCE((SELECT SUM(p.total_amount) FROM payments p WHERE p.order_id = o.id) >= o.total, FALSE) as has_payment,
+        COALESCE(i.items, '[]'::json) as items
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+            'id', oi.id,
+            'order_id', oi.order_id,
+            'product_id', oi.product_id,
+            'quantity', oi.quantity,
+            'unit_price', oi.unit_price::text,
+            'subtotal', oi.subtotal::text,
+            'special_instructions', oi.special_instructions,
+            'created_at', oi.created_at,
+            'product_name', p.name,
+            'modifiers', COALESCE(m.modifiers, '[]'::json)
+        ) ORDER BY oi.id) as items
+        FROM order_items oi
+        JOIN products p ON oi.product_id = p.id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
+                'id', oim.id,
+                'modifier_id', oim.modifier_id,
+                'additional_price', oim.price::text,
+                'modifier_name', md.name
+            ) ORDER BY oim.id) as modifiers
+            FROM order_item_modifiers oim
+            JOIN modifiers md ON oim.modifier_id = md.id
+            WHERE oim.order_item_id = oi.id
+        ) m ON TRUE
+        WHERE oi.order_id = o.id
+    ) i ON TRUE
+"""
+
+ORDER_DETAILS_SQL = ORDER_DETAILS_SELECT + """
+    WHERE o.id = ANY(%s)
+    ORDER BY array_position(%s::int[], o.id)
+"""
+
+# Órdenes en curso (tablero de cocina), de la más antigua a la más nueva
+ACTIVE_ORDERS_DETAILS_SQL = ORDER_DETAILS_SELECT + """
+    WHERE o.status NOT IN ('completed', 'cancelled')
+    ORDER BY o.created_at, o.id
+"""
+
+# Reserva `count` números consecutivos y devuelve el último. La fila queda
+# bloqueada hasta el commit: tills concurrentes esperan en vez de duplicar.
+ALLOCATE_ORDER_NUMBERS_SQL = """
+    INSERT INTO order_number_counters (counter_key, last_number)
+    VALUES (%s, %s)
+    ON CONFLICT (counter_key)
+    DO UPDATE SET last_number = order_number_counters.last_number + EXCLUDED.last_number
+    RETURNING last_number
+"""
+
+ORDER_RETURNING_COLUMNS = """
+    id, order_number, customer_name, order_type, status,
+    subtotal, tax, delivery_fee, discount, total,
+    payment_method, notes, table_id, phone_line,
+    created_at, completed_at, user_id, client_order_id
+"""
+
+# Alta de varias órdenes en un solo INSERT (POST /api/orders/batch). El orden
+# de inserción sigue al de los arrays (ids ascendentes); RETURNING no garantiza
+# orden, por eso se devuelve client_order_id para emparejar.
+INSERT_ORDERS_SQL = """
+    INSERT INTO orders (
+        order_number, customer_name, order_type, status,
+        subtotal, tax, delivery_fee, discount, total,
+        payment_method, notes, table_id, cash_session_id, user_id, phone_line,
+        client_order_id
+    )
+    SELECT
+        t.order_number, t.customer_name, t.order_type, t.status,
+        t.subtotal, t.tax, t.delivery_fee, t.discount, t.total,
+        t.payment_method, t.notes, t.table_id, %s, t.user_id, t.phone_line,
+        t.client_order_id
+    FROM unnest(
+        %s::text[], %s::text[], %s::text[], %s::text[],
+        %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[],
+        %s::text[], %s::text[], %s::int[], %s::int[], %s::int[], %s::uuid[]
+    ) WITH ORDINALITY AS t(
+        order_number, customer_name, order_type, status,
+        subtotal, tax, delivery_fee, discount, total,
+        payment_method, notes, table_id, user_id, phone_line, client_order_id, ord
+    )
+    ORDER BY t.ord
+    RETURNING """ + ORDER_RETURNING_COLUMNS
+
+ORDERS_BY_CLIENT_IDS_SQL = """
+    SELECT """ + ORDER_RETURNING_COLUMNS + """
+    FROM orders
+    WHERE client_order_id = ANY(%s::uuid[])
+"""
+
+DECREMENT_STOCK_SQL = """
+    UPDATE products p
+    SET stock_quantity = GREATEST(0, p.stock_quantity - d.quantity)
+    FROM unnest(%s::int[], %s::int[]) AS d(product_id, quantity)
+    WHERE p.id = d.product_id
+"""
+
+
+def order_counter_key(cash_session_id: Optional[int]) -> str:
+    """Contador por sesión de caja; sin sesión abierta, uno por día de negocio."""
+    if cash_session_id:
+        return f"session:{cash_session_id}"
+    return f"day:{business_day.today().isoformat()}"
+
+
+def format_order_number(cash_session_id: Optional[int], number: int) -> str:
+    """#001 dentro de una sesión de caja, ORD-001 sin sesión."""
+    if cash_session_id:
+        return f"#{number:03d}"
+    return f"ORD-{number:03d}"
+
+
+def _pick(rows_by_id: dict, ids: List[int], active_only: bool = False) -> dict:
+    """Subconjunto de una tabla del catálogo en caché, igual que `WHERE id = ANY(...)`."""
+    return {
+        i: rows_by_id[i] for i in ids
+        if i in rows_by_id and (not active_only or rows_by_id[i]['is_active'])
+    }
+
+
+def items_insert_params(order_id: int, priced_items: List[dict]) -> tuple:
+    """Parámetros (arrays por columna) para INSERT_ITEMS_SQL."""
+    return orders_items_insert_params([(order_id, priced_items)])
+
+
+def orders_items_insert_params(orders_items: List[Tuple[int, List[dict]]]) -> tuple:
+    """Parámetros de INSERT_ITEMS_SQL para los items de varias órdenes [(order_id, items)]."""
+    order_ids, product_ids, quantities, unit_prices, subtotals, instructions = [], [], [], [], [], []
+    mod_item_ords, mod_ids, mod_prices = [], [], []
+    for order_id, priced_items in orders_items:
+        for item in priced_items:
+            order_ids.append(order_id)
+            product_ids.append(item['product_id'])
+            quantities.append(item['quantity'])
+            unit_prices.append(item['unit_price'])
+            subtotals.append(item['subtotal'])
+            instructions.append(item['special_instructions'])
+            for mod in item.get('modifiers') or []:
+                mod_item_ords.append(len(order_ids))
+                mod_ids.append(mod['id'])
+                mod_prices.append(mod['price'])
+
+    return (
+        order_ids,
+        product_ids,
+        quantities,
+        unit_prices,
+        subtotals,
+        instructions,
+        mod_item_ords,
+        mod_ids,
+        mod_prices,
+    )
+
+
+def orders_insert_params(cash_session_id: Optional[int], orders: List[dict]) -> tuple:
+    """Parámetros (arrays por columna) para INSERT_ORDERS_SQL."""
+    columns = (
+        'order_number', 'customer_name', 'order_type', 'status',
+        'subtotal', 'tax', 'delivery_fee', 'discount', 'total',
+        'payment_method', 'notes', 'table_id', 'user_id', 'phone_line', 'client_order_id',
+    )
+    return (cash_session_id, *([order[c] for order in orders] for c in columns))
+
+
+def stock_decrement_params(priced_items: List[dict]) -> tuple:
+    """
+    Parámetros para DECREMENT_STOCK_SQL. Agrupa por producto porque
+    UPDATE ... FROM solo aplica una fila de origen por fila destino.
+    """
+    quantities = defaultdict(int)
+    for item in priced_items:
+        quantities[item['product_id']] += item['quantity']
+    product_ids = sorted(quantities)
+    return product_ids, [quantities[pid] for pid in product_ids]
+
+
+class OrderRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_with_details(self, order_id: int) -> Optional[dict]:
+        """Obtener una orden con items y modificadores (una sola consulta)"""
+        orders = self.get_many_with_details([order_id])
+        return orders[0] if orders else None
+
+    def get_many_with_details(self, order_ids: List[int]) -> List[dict]:
+        """Obtener varias órdenes completas, en el orden de `order_ids`"""
+        if not order_ids:
+            return []
+        cursor = self.conn.cursor()
+        cursor.execute(ORDER_DETAILS_SQL, (list(order_ids), list(order_ids)))
+        return cursor.fetchall()
+
+    def get_products_by_ids(self, product_ids: List[int]) -> dict:
+        """Obtener productos indexados por id (caché del catálogo o una sola consulta)"""
+        if not product_ids:
+            return {}
+        catalog = catalog_cache.get(self.conn)
+        if catalog is not None:
+            return _pick(catalog.products, product_ids)
+        cursor = self.conn.cursor()
+        cursor.execute(PRODUCTS_BY_IDS_SQL, (list(product_ids),))
+        return {row['id']: row for row in cursor.fetchall()}
+
+    def get_active_modifiers_by_ids(self, modifier_ids: List[int]) -> dict:
+        """Obtener modificadores activos indexados por id (caché del catálogo o una sola consulta)"""
+        if not modifier_ids:
+            return {}
+        catalog = catalog_cache.get(self.conn)
+        if catalog is not None:
+            return _pick(catalog.modifiers, modifier_ids, active_only=True)
+        cursor = self.conn.cursor()
+        cursor.execute(ACTIVE_MODIFIERS_BY_IDS_SQL, (list(modifier_ids),))
+        return {row['id']: row for row in cursor.fetchall()}
+
+    def insert_items(self, order_id: int, priced_items: List[dict]) -> None:
+        """Insertar items y sus modificadores en una sola sentencia"""
+        if not priced_items:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute(INSERT_ITEMS_SQL, items_insert_params(order_id, priced_items))
+
+    def decrement_stock(self, priced_items: List[dict]) -> None:
+        """Reducir el inventario de todos los productos de la orden en un UPDATE"""
+        if not priced_items:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute(DECREMENT_STOCK_SQL, stock_decrement_params(priced_items))
+
+
+class AsyncOrderRepository:
+    """Misma interfaz que OrderRepository sobre una conexión async (get_async_db)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def get_with_details(self, order_id: int) -> Optional[dict]:
+        """Obtener una orden con items y modificadores (una sola consulta)"""
+        orders = await self.get_many_with_details([order_id])
+        return orders[0] if orders else None
+
+    async def get_many_with_details(self, order_ids: List[int]) -> List[dict]:
+        """Obtener varias órdenes completas, en el orden de `order_ids`"""
+        if not order_ids:
+            return []
+        cursor = self.conn.cursor()
+        await cursor.execute(ORDER_DETAILS_SQL, (list(order_ids), list(order_ids)))
+        return await cursor.fetchall()
+
+    async def get_active_with_details(self) -> List[dict]:
+        """Todas las órdenes no completadas ni canceladas, completas (una sola consulta)"""
+        cursor = self.conn.cursor()
+        await cursor.execute(ACTIVE_ORDERS_DETAILS_SQL)
+        return await cursor.fetchall()
+
+    async def allocate_order_number(self, cash_session_id: Optional[int]) -> str:
+        """Siguiente número de orden de la sesión (O(1), sin huecos ni duplicados)"""
+        return (await self.allocate_order_numbers(cash_session_id, 1))[0]
+
+    async def allocate_order_numbers(self, cash_session_id: Optional[int], count: int) -> List[str]:
+        """Reservar `count` números consecutivos de la sesión en una sola sentencia"""
+        cursor = self.conn.cursor()
+        await cursor.execute(ALLOCATE_ORDER_NUMBERS_SQL, (order_counter_key(cash_session_id), count))
+        last = (await cursor.fetchone())['last_number']
+        return [format_order_number(cash_session_id, n) for n in range(last - count + 1, last + 1)]
+
+    async def get_by_client_order_ids(self, client_order_ids: List) -> dict:
+        """Órdenes ya registradas con esos client_order_id, indexadas por client_order_id"""
+        if not client_order_ids:
+            return {}
+        cursor = self.conn.cursor()
+        await cursor.execute(ORDERS_BY_CLIENT_IDS_SQL, (list(client_order_ids),))
+        return {row['client_order_id']: row for row in await cursor.fetchall()}
+
+    async def insert_orders(self, cash_session_id: Optional[int], orders: List[dict]) -> List[dict]:
+        """Insertar varias órdenes (sin items) en un solo INSERT"""
+        if not orders:
+            return []
+        cursor = self.conn.cursor()
+        await cursor.execute(INSERT_ORDERS_SQL, orders_insert_params(cash_session_id, orders))
+        return await cursor.fetchall()
+
+    async def insert_items_for_orders(self, orders_items: List[Tuple[int, List[dict]]]) -> None:
+        """Insertar los items (y modificadores) de varias órdenes en una sola sentencia"""
+        if not any(items for _, items in orders_items):
+            return
+        cursor = self.conn.cursor()
+        await cursor.execute(INSERT_ITEMS_SQL, orders_items_insert_params(orders_items))
+
+    async def get_products_by_ids(self, product_ids: List[int]) -> dict:
+        """Obtener productos indexados por id (caché del catálogo o una sola consulta)"""
+        if not product_ids:
+            return {}
+        catalog = await catalog_cache.aget(self.conn)
+        if catalog is not None:
+            return _pick(catalog.products, product_ids)
+        cursor = self.conn.cursor()
+        await cursor.execute(PRODUCTS_BY_IDS_SQL, (list(product_ids),))
+        return {row['id']: row for row in await cursor.fetchall()}
+
+    async def get_active_modifiers_by_ids(self, modifier_ids: List[int]) -> dict:
+        """Obtener modificadores activos indexados por id (caché del catálogo o una sola consulta)"""
+        if not modifier_ids:
+            return {}
+        catalog = await catalog_cache.aget(self.conn)
+        if catalog is not None:
+            return _pick(catalog.modifiers, modifier_ids, active_only=True)
+        cursor = self.conn.cursor()
+        await cursor.execute(ACTIVE_MODIFIERS_BY_IDS_SQL, (list(modifier_ids),))
+        return {row['id']: row for row in await cursor.fetchall()}
+
+    async def insert_items(self, order_id: int, priced_items: List[dict]) -> None:
+        """Insertar items y sus modificadores en una sola sentencia"""
+        if not priced_items:
+            return
+        cursor = self.conn.cursor()
+        await cursor.execute(INSERT_ITEMS_SQL, items_insert_params(order_id, priced_items))
+
+    async def decrement_stock(self, priced_items: List[dict]) -> None:
+        """Reducir el inventario de todos los productos de la orden en un UPDATE"""
+        if not priced_items:
+            return
+        cursor = self.conn.cursor()
+        await cursor.execute(DECREMENT_STOCK_SQL, stock_decrement_params(priced_items))
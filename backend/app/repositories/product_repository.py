@@ -4,6 +4,7 @@ Repositorio para manejo de productos en base de datos
 from typing import List, Optional, Tuple
 from decimal import Decimal
 import psycopg2
+from ..core.catalog_cache import catalog_cache, notify_catalog_changed
 from ..schemas.product import ProductCreate, ProductUpdate
 
 class ProductRepository:
@@ -18,6 +19,14 @@ class ProductRepository:
 
     def get_all(self, category_id: Optional[int] = None, available_only: bool = True) -> List[dict]:
         """Obtener todos los productos, opcionalmente filtrados por categoría y disponibilidad"""
+        catalog = catalog_cache.get(self.conn)
+        if catalog is not None:
+            return [
+                p for p in catalog.products.values()
+                if (not available_only or p['is_available'])
+                and (not category_id or p['category_id'] == category_id)
+            ]
+
         cursor = self.conn.cursor()
         
         query_parts = [
@@ -48,6 +57,10 @@ class ProductRepository:
 
     def get_by_id(self, product_id: int) -> Optional[dict]:
         """Obtener un producto por su ID"""
+        catalog = catalog_cache.get(self.conn)
+        if catalog is not None:
+            return catalog.products.get(product_id)
+
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT 
@@ -78,6 +91,7 @@ class ProductRepository:
             product.description, product.image_url, 
             product.is_available, product.sort_order, product.stock_quantity
         ))
+        notify_catalog_changed(self.conn, "products")
         return cursor.fetchone()
 
     def update(self, product_id: int, product: ProductUpdate) -> Optional[dict]:
@@ -134,7 +148,10 @@ class ProductRepository:
         """
         
         cursor.execute(query, values)
-        return cursor.fetchone()
+        updated = cursor.fetchone()
+        if updated:
+            notify_catalog_changed(self.conn, "products")
+        return updated
 
     def delete(self, product_id: int) -> bool:
         """Soft delete de un producto"""
@@ -146,4 +163,7 @@ class ProductRepository:
             RETURNING id
         """, (product_id,))
         
-        return cursor.fetchone() is not None
+        if cursor.fetchone() is None:
+            return False
+        notify_catalog_changed(self.conn, "products")
+        return True
@@ -0,0 +1,196 @@
+"""
+Repositorio de reportes de ventas.
+
+Lee de las tablas de rollup (sales_daily, sales_daily_products y
+sales_hourly, migraciones 006/007/009, por día de negocio), que solo contienen órdenes
+terminadas. Las órdenes activas (pocas, índices parciales de la migración
+004) se suman en vivo para que los reportes del día incluyan lo que aún está
+en cocina, como antes. Sobre orders se filtra siempre con rangos semiabiertos
+de created_at (ver core.business_day), nunca con DATE(created_at).
+Los tiempos de preparación salen de los histogramas de la migración 011.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+from ..core.business_day import day_bounds, range_bounds
+
+# Órdenes aún no terminadas (mismo predicado que los índices parciales de la migración 004)
+ACTIVE_ORDERS_FILTER = "status NOT IN ('completed', 'cancelled')"
+
+DAILY_SALES_SQL = f"""
+    SELECT order_type, status, orders_count, total_sales, total_tax
+    FROM sales_daily
+    WHERE business_date = %(day)s
+    UNION ALL
+    SELECT order_type, 'active', COUNT(*), SUM(total), SUM(tax)
+    FROM orders
+    WHERE {ACTIVE_ORDERS_FILTER}
+      AND created_at >= %(start)s AND created_at < %(end)s
+    GROUP BY order_type
+"""
+
+# Columnas de agrupación para revenue-by-period
+PERIOD_EXPRESSIONS = {
+    "day":   "business_date",
+    "week":  "DATE_TRUNC('week', business_date::timestamp)",
+    "month": "DATE_TRUNC('month', business_date::timestamp)",
+}
+
+
+# Agrupaciones de prep-times: (tabla, columnas de agrupación, joins)
+PREP_TIME_GROUPS = {
+    "total":      ("prep_time_hourly", [], ""),
+    "order_type": ("prep_time_hourly", ["h.order_type"], ""),
+    "hour":       ("prep_time_hourly", ["h.hour"], ""),
+    "product":    ("prep_time_products", ["h.product_id", "p.name as product_name"],
+                   "JOIN products p ON p.id = h.product_id"),
+}
+
+
+class ReportRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_daily_sales(self, report_date: date) -> tuple[dict, List[dict]]:
+        """(resumen, ventas por tipo de orden) de un día; excluye canceladas salvo en su contador"""
+        cursor = self.conn.cursor()
+        start, end = day_bounds(report_date)
+        cursor.execute(DAILY_SALES_SQL, {"day": report_date, "start": start, "end": end})
+        rows = cursor.fetchall()
+
+        summary = {
+            "total_orders": 0, "total_sales": Decimal("0"), "average_ticket": Decimal("0"),
+            "total_tax": Decimal("0"), "completed_orders": 0, "cancelled_orders": 0,
+        }
+        by_type: dict[str, dict] = {}
+        for row in rows:
+            if row['status'] == 'cancelled':
+                summary["cancelled_orders"] += row['orders_count']
+                continue
+            if row['status'] == 'completed':
+                summary["completed_orders"] += row['orders_count']
+            summary["total_orders"] += row['orders_count']
+            summary["total_sales"] += row['total_sales']
+            summary["total_tax"] += row['total_tax']
+            entry = by_type.setdefault(row['order_type'], {"order_type": row['order_type'], "count": 0, "total": Decimal("0")})
+            entry["count"] += row['orders_count']
+            entry["total"] += row['total_sales']
+
+        if summary["total_orders"]:
+            summary["average_ticket"] = summary["total_sales"] / summary["total_orders"]
+        return summary, [by_type[t] for t in sorted(by_type) if by_type[t]["count"]]
+
+    def get_top_products(self, date_from: Optional[date], date_to: Optional[date], limit: int) -> List[dict]:
+        """Productos más vendidos (órdenes no canceladas) en el rango, ambos extremos incluidos"""
+        rollup_filters, live_filters = ["TRUE"], [ACTIVE_ORDERS_FILTER.replace("status", "o.status")]
+        start, end = range_bounds(date_from, date_to)
+        params = {"limit": limit, "date_from": date_from, "date_to": date_to, "start": start, "end": end}
+        if date_from:
+            rollup_filters.append("business_date >= %(date_from)s")
+            live_filters.append("o.created_at >= %(start)s")
+        if date_to:
+            rollup_filters.append("business_date <= %(date_to)s")
+            live_filters.append("o.created_at < %(end)s")
+
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            WITH sales AS (
+                SELECT product_id, times_ordered, total_quantity, total_revenue
+                FROM sales_daily_products
+                WHERE {' AND '.join(rollup_filters)}
+                UNION ALL
+                SELECT oi.product_id, COUNT(*), SUM(oi.quantity), SUM(oi.subtotal)
+                FROM orders o
+                JOIN order_items oi ON oi.order_id = o.id
+                WHERE {' AND '.join(live_filters)}
+                GROUP BY oi.product_id
+            )
+            SELECT
+                p.id,
+                p.name,
+                c.name as category,
+                SUM(s.times_ordered)::bigint as times_ordered,
+                SUM(s.total_quantity)::bigint as total_quantity,
+                SUM(s.total_revenue) as total_revenue
+            FROM sales s
+            JOIN products p ON s.product_id = p.id
+            JOIN categories c ON p.category_id = c.id
+            GROUP BY p.id, p.name, c.name
+            HAVING SUM(s.times_ordered) > 0
+            ORDER BY total_quantity DESC
+            LIMIT %(limit)s
+        """, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_revenue_by_period(self, date_from: date, date_to: date, group_by: str) -> List[dict]:
+        """Ingresos de órdenes completadas agrupados por día, semana o mes"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT
+                {PERIOD_EXPRESSIONS[group_by]} as period,
+                SUM(orders_count)::bigint as orders_count,
+                SUM(total_sales) as total_revenue,
+                SUM(total_sales) / NULLIF(SUM(orders_count), 0) as average_ticket
+            FROM sales_daily
+            WHERE status = 'completed'
+              AND business_date BETWEEN %s AND %s
+            GROUP BY period
+            HAVING SUM(orders_count) > 0
+            ORDER BY period
+        """, (date_from, date_to))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_heatmap(self, date_from: date, date_to: date, by_order_type: bool = False) -> List[dict]:
+        """Órdenes completadas e ingresos por (día de la semana ISO, hora local), opcionalmente por tipo"""
+        group = ", order_type" if by_order_type else ""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT
+                EXTRACT(ISODOW FROM business_date)::int as weekday,
+                hour{group},
+                SUM(orders_count)::bigint as orders_count,
+                SUM(total_sales) as total_revenue
+            FROM sales_hourly
+            WHERE business_date BETWEEN %s AND %s
+            GROUP BY weekday, hour{group}
+            HAVING SUM(orders_count) > 0
+            ORDER BY weekday, hour{group}
+        """, (date_from, date_to))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_forecast(self, date_from: date, date_to: date, product_id: Optional[int] = None) -> tuple[List[dict], List[dict]]:
+        """Previsión guardada (migración 010): (órdenes por hora, cantidad por hora y producto)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT business_date, hour, expected_orders, generated_at
+            FROM demand_forecast_hourly
+            WHERE business_date BETWEEN %s AND %s
+            ORDER BY business_date, hour
+        """, (date_from, date_to))
+        hourly = [dict(row) for row in cursor.fetchall()]
+
+        product_filter = "AND f.product_id = %(product_id)s" if product_id else ""
+        cursor.execute(f"""
+            SELECT f.business_date, f.hour, f.product_id, p.name as product_name, f.expected_quantity
+            FROM demand_forecast_products f
+            JOIN products p ON p.id = f.product_id
+            WHERE f.business_date BETWEEN %(date_from)s AND %(date_to)s {product_filter}
+            ORDER BY f.business_date, f.hour, f.expected_quantity DESC
+        """, {"date_from": date_from, "date_to": date_to, "product_id": product_id})
+        return hourly, [dict(row) for row in cursor.fetchall()]
+
+    def get_prep_time_buckets(self, date_from: date, date_to: date, group_by: str) -> List[dict]:
+        """Histograma de tiempos de preparación (migración 011) por grupo y bucket, ordenado por grupo y bucket"""
+        table, columns, joins = PREP_TIME_GROUPS[group_by]
+        group = ", ".join([c.split(" as ")[0] for c in columns] + ["h.bucket"])
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT {", ".join(columns + ["h.bucket"])}, SUM(h.orders)::bigint as orders
+            FROM {table} h
+            {joins}
+            WHERE h.business_date BETWEEN %s AND %s
+            GROUP BY {group}
+            ORDER BY {group}
+        """, (date_from, date_to))
+        return [dict(row) for row in cursor.fetchall()]
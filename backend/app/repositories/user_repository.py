@@ -1,5 +1,8 @@
 """
-Repositorio para usuarios
+Repositorio para usuarios.
+
+Trabaja sobre una conexión async (get_async_db): sus únicos consumidores son
+el login y la dependencia de autenticación, que corren en el event loop.
 """
 from typing import Optional
 from datetime import datetime
@@ -10,51 +13,51 @@ class UserRepository:
     def __init__(self, conn):
         self.conn = conn
 
-    def get_by_username(self, username: str) -> Optional[dict]:
+    async def get_by_username(self, username: str) -> Optional[dict]:
         cursor = self.conn.cursor()
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, username, email, hashed_password, full_name, role, is_active, created_at, last_login
             FROM users
             WHERE username = %s
         """, (username,))
-        return cursor.fetchone()
+        return await cursor.fetchone()
     
-    def get_by_email(self, email: str) -> Optional[dict]:
+    async def get_by_email(self, email: str) -> Optional[dict]:
         """Buscar usuario por email"""
         cursor = self.conn.cursor()
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, username, email, hashed_password, full_name, role, is_active, created_at, last_login
             FROM users
             WHERE email = %s
         """, (email,))
-        return cursor.fetchone()
+        return await cursor.fetchone()
     
-    def get_by_id(self, user_id: int) -> Optional[dict]:
+    async def get_by_id(self, user_id: int) -> Optional[dict]:
         """Buscar usuario por ID"""
         cursor = self.conn.cursor()
-        cursor.execute("""
+        await cursor.execute("""
             SELECT id, username, email, hashed_password, full_name, role, is_active, created_at, last_login
             FROM users
             WHERE id = %s
         """, (user_id,))
-        return cursor.fetchone()
+        return await cursor.fetchone()
     
-    def update_last_login(self, user_id: int) -> None:
+    async def update_last_login(self, user_id: int) -> None:
         """Actualizar fecha de último acceso"""
         cursor = self.conn.cursor()
-        cursor.execute("""
+        await cursor.execute("""
             UPDATE users
             SET last_login = %s
             WHERE id = %s
         """, (datetime.utcnow(), user_id))
-        self.conn.commit()
+        await self.conn.commit()
 
-    def create(self, user: UserCreate) -> dict:
+    async def create(self, user: UserCreate) -> dict:
         cursor = self.conn.cursor()
         hashed_password = hashear_password(user.password)
-        cursor.execute("""
+        await cursor.execute("""
             INSERT INTO users (username, email, hashed_password, full_name, role)
             VALUES (%s, %s, %s, %s, %s)
             RETURNING id, username, email, full_name, role, is_active, created_at
         """, (user.username, user.email, hashed_password, user.full_name, user.role))
-        return cursor.fetchone()
+        return await cursor.fetchone()
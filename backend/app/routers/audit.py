@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, Query
 from ..security import verificar_rol
 from typing import Optional
 
-from ..database import get_db
+from ..database import get_read_db
 
 router = APIRouter(tags=["Audit"])
 
@@ -15,10 +15,10 @@ def list_audit_logs(
     event: Optional[str] = Query(None, description="Filter by event type"),
     username: Optional[str] = Query(None, description="Filter by username", max_length=100),
     limit: int = Query(50, ge=1, le=500),
-    conn=Depends(get_db),
+    conn=Depends(get_read_db),
     usuario=Depends(verificar_rol("admin")),
 ):
-    """Return audit log entries, most recent first."""
+    """Return audit log entries, most recent first (read replica when available)."""
     cursor = conn.cursor()
 
     conditions = []
@@ -5,9 +5,10 @@ Sistema completo de login, perfil y verificación
 import hashlib
 from datetime import datetime, timezone, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..schemas.user import (
     LoginRequest, LoginResponse, UsuarioResponse, User,
     PinLoginRequest, RefreshTokenRequest, LogoutRequest
@@ -31,48 +32,49 @@ router = APIRouter()
 # ============================================
 # HELPERS: Tabla refresh_tokens
 # ============================================
+# Todos sus consumidores son rutas async, así que usan la conexión async.
 
 def _hash_token(token: str) -> str:
     """SHA-256 del token JWT (no almacenamos el token completo)."""
     return hashlib.sha256(token.encode()).hexdigest()
 
 
-def _store_refresh_token(conn, user_id: int, token: str) -> None:
+async def _store_refresh_token(conn, user_id: int, token: str) -> None:
     """Guarda el hash del refresh token en la tabla refresh_tokens."""
     expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     cursor = conn.cursor()
-    cursor.execute(
+    await cursor.execute(
         """INSERT INTO refresh_tokens (user_id, token_hash, expires_at)
            VALUES (%s, %s, %s)""",
         (user_id, _hash_token(token), expires_at)
     )
-    conn.commit()
+    await conn.commit()
 
 
-def _revoke_refresh_token(conn, token: str) -> bool:
+async def _revoke_refresh_token(conn, token: str) -> bool:
     """Marca el refresh token como revocado. Devuelve True si existía."""
     cursor = conn.cursor()
-    cursor.execute(
+    await cursor.execute(
         """UPDATE refresh_tokens
            SET revoked_at = NOW()
            WHERE token_hash = %s AND revoked_at IS NULL""",
         (_hash_token(token),)
     )
-    conn.commit()
+    await conn.commit()
     return cursor.rowcount > 0
 
 
-def _is_refresh_token_valid(conn, token: str) -> bool:
+async def _is_refresh_token_valid(conn, token: str) -> bool:
     """Comprueba que el token existe, no está revocado y no ha expirado."""
     cursor = conn.cursor()
-    cursor.execute(
+    await cursor.execute(
         """SELECT 1 FROM refresh_tokens
            WHERE token_hash = %s
              AND revoked_at IS NULL
              AND expires_at > NOW()""",
         (_hash_token(token),)
     )
-    return cursor.fetchone() is not None
+    return await cursor.fetchone() is not None
 
 
 # ============================================
@@ -83,7 +85,7 @@ def _is_refresh_token_valid(conn, token: str) -> bool:
 async def login(
     request: Request,
     datos: LoginRequest,
-    conn = Depends(get_db)
+    conn = Depends(get_async_db)
 ):
     """
     Iniciar sesion con username o email.
@@ -114,7 +116,7 @@ async def login(
     rate_limiter.record_login_attempt(client_ip)
 
     # Autenticar usuario
-    usuario = autenticar_usuario(conn, datos.username_or_email, datos.password)
+    usuario = await autenticar_usuario(conn, datos.username_or_email, datos.password)
 
     if not usuario:
         # Record failed login for account lockout
@@ -161,7 +163,7 @@ async def login(
     refresh_token = crear_refresh_token(usuario)
 
     # Registrar refresh token en la base de datos para poder revocarlo
-    _store_refresh_token(conn, usuario['id'], refresh_token)
+    await _store_refresh_token(conn, usuario['id'], refresh_token)
 
     usuario_response = UsuarioResponse(
         id=usuario['id'],
@@ -239,7 +241,7 @@ def listar_usuarios_login(
 async def login_con_pin(
     request: Request,
     datos: PinLoginRequest,
-    conn = Depends(get_db)
+    conn = Depends(get_async_db)
 ):
     """
     Login usando PIN.
@@ -258,15 +260,15 @@ async def login_con_pin(
     rate_limiter.record_login_attempt(client_ip)
 
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = %s AND is_active = TRUE", (datos.user_id,))
-    usuario = cursor.fetchone()
+    await cursor.execute("SELECT * FROM users WHERE id = %s AND is_active = TRUE", (datos.user_id,))
+    usuario = await cursor.fetchone()
 
-    # Verificar PIN hasheado con bcrypt
+    # Verificar PIN hasheado con bcrypt (en el threadpool, no bloquea el event loop)
     is_valid_pin = False
     if usuario and usuario.get('pin'):
         pin_hash = usuario['pin']
         if str(pin_hash).startswith("$2"):
-            is_valid_pin = verificar_password(datos.pin, pin_hash)
+            is_valid_pin = await run_in_threadpool(verificar_password, datos.pin, pin_hash)
 
     if not usuario or not is_valid_pin:
         rate_limiter.record_failed_login(f"pin_user_{datos.user_id}")
@@ -300,7 +302,7 @@ async def login_con_pin(
     # Generar tokens y registrar refresh token en DB
     token = crear_token(usuario)
     refresh_token = crear_refresh_token(usuario)
-    _store_refresh_token(conn, usuario['id'], refresh_token)
+    await _store_refresh_token(conn, usuario['id'], refresh_token)
 
     usuario_response = UsuarioResponse(
         id=usuario['id'],
@@ -323,7 +325,7 @@ async def login_con_pin(
 @router.post("/refresh", response_model=LoginResponse)
 async def refresh_access_token(
     datos: RefreshTokenRequest,
-    conn = Depends(get_db)
+    conn = Depends(get_async_db)
 ):
     """
     Renovar access token usando un refresh token válido.
@@ -336,15 +338,15 @@ async def refresh_access_token(
         usuario_id = payload.get("usuario_id")
 
         # Verificar que el token no fue revocado por logout
-        if not _is_refresh_token_valid(conn, datos.refresh_token):
+        if not await _is_refresh_token_valid(conn, datos.refresh_token):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Refresh token revocado o no encontrado"
             )
 
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = %s AND is_active = TRUE", (usuario_id,))
-        usuario = cursor.fetchone()
+        await cursor.execute("SELECT * FROM users WHERE id = %s AND is_active = TRUE", (usuario_id,))
+        usuario = await cursor.fetchone()
 
         if not usuario:
             raise HTTPException(
@@ -353,10 +355,10 @@ async def refresh_access_token(
             )
 
         # Rotar: revocar el token usado y emitir uno nuevo
-        _revoke_refresh_token(conn, datos.refresh_token)
+        await _revoke_refresh_token(conn, datos.refresh_token)
         token = crear_token(usuario)
         refresh_token = crear_refresh_token(usuario)
-        _store_refresh_token(conn, usuario['id'], refresh_token)
+        await _store_refresh_token(conn, usuario['id'], refresh_token)
 
         usuario_response = UsuarioResponse(
             id=usuario['id'],
@@ -386,7 +388,7 @@ async def refresh_access_token(
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
 async def logout(
     datos: LogoutRequest,
-    conn = Depends(get_db),
+    conn = Depends(get_async_db),
     usuario = Depends(obtener_usuario_actual)
 ):
     """
@@ -394,7 +396,7 @@ async def logout(
     El access token expira solo (60 min), pero el refresh queda inválido
     de inmediato, impidiendo que se generen nuevos access tokens.
     """
-    _revoke_refresh_token(conn, datos.refresh_token)
+    await _revoke_refresh_token(conn, datos.refresh_token)
 
     await mq.publish_auth_event(
         event="logout",
@@ -1,21 +1,28 @@
 """
 Router para sistema de caja y pagos
 """
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status, BackgroundTasks
 from ..security import obtener_usuario_actual, verificar_rol
 from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
 
 from ..database import get_db
+from ..repositories.cash_repository import CashRepository, SESSION_COLUMNS
+from ..core.live_board import live_board, notify_orders_changed
+from ..core.etag import etag_guard, notify_resources_changed
+from ..core.active_session import active_session
+from ..core.idempotency import idempotency
+from ..services.payment_split import allocate_payments
 import logging
 logger = logging.getLogger(__name__)
 from ..models.cash_register import (
     CashSessionCreate, CashSessionClose, CashSession, CashSessionSummary,
-    PaymentCreate, PaymentResponse, CashSessionStatus
+    PaymentCreate, PaymentResponse, CashSessionStatus,
+    PaymentBatchCreate, PaymentBatchResponse
 )
 
-router = APIRouter()
+router = APIRouter(dependencies=[etag_guard("cash_sessions", "orders")])
 
 
 # ============================================
@@ -51,7 +58,9 @@ def open_cash_session(session_data: CashSessionCreate, conn = Depends(get_db), u
         """, (session_data.user_id, session_data.opening_amount, session_data.notes))
         
         new_session = cursor.fetchone()
+        notify_resources_changed(conn, "cash_sessions")
         conn.commit()
+        active_session.set(new_session['id'])
         
         return new_session
     
@@ -67,27 +76,7 @@ def open_cash_session(session_data: CashSessionCreate, conn = Depends(get_db), u
 @router.get("/sessions/active", response_model=Optional[CashSession])
 def get_active_session(user_id: Optional[int] = None, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener sesión de caja activa (abierta)"""
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT id, user_id, status, opening_amount, closing_amount,
-               expected_amount, difference, total_cash_sales, total_card_sales,
-               total_sales, total_tips, orders_count, opened_at, closed_at, notes
-        FROM cash_sessions
-        WHERE status = 'open'
-    """
-    params = []
-    
-    if user_id:
-        query += " AND user_id = %s"
-        params.append(user_id)
-    
-    query += " ORDER BY opened_at DESC LIMIT 1"
-    
-    cursor.execute(query, params if params else None)
-    session = cursor.fetchone()
-    
-    return session
+    return CashRepository(conn).get_active_session(user_id)
 
 
 @router.get("/sessions/{session_id}", response_model=CashSession)
@@ -95,11 +84,9 @@ def get_session(session_id: int, conn = Depends(get_db), usuario = Depends(obten
     """Obtener detalles de una sesión de caja"""
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, user_id, status, opening_amount, closing_amount,
-               expected_amount, difference, total_cash_sales, total_card_sales,
-               total_sales, total_tips, orders_count, opened_at, closed_at, notes
-        FROM cash_sessions
+    cursor.execute(f"""
+        SELECT {SESSION_COLUMNS}
+        FROM cash_session_balances
         WHERE id = %s
     """, (session_id,))
     
@@ -113,57 +100,37 @@ def get_session(session_id: int, conn = Depends(get_db), usuario = Depends(obten
 
 @router.get("/sessions/{session_id}/summary", response_model=CashSessionSummary)
 def get_session_summary(session_id: int, conn = Depends(get_db), usuario = Depends(verificar_rol("admin", "manager"))):
-    """Obtener resumen financiero de sesión. Requiere rol admin o manager."""
-    cursor = conn.cursor()
-
-    # Obtener sesión
-    cursor.execute("""
-        SELECT id, opening_amount, total_cash_sales, total_card_sales,
-               COALESCE(total_tips, 0) as total_tips, orders_count, user_id
-        FROM cash_sessions
-        WHERE id = %s
-    """, (session_id,))
+    """
+    Obtener resumen financiero de sesión. Requiere rol admin o manager.
+    Sesión cerrada: el informe Z guardado al cerrarla. Sesión abierta: se
+    calcula en el momento.
+    """
+    repo = CashRepository(conn)
 
-    session = cursor.fetchone()
+    try:
+        summary = repo.get_z_report(session_id)
+        if summary is None:
+            summary = repo.build_z_report(session_id)
+            # Cerrada antes de la migración 013: se congela ahora
+            if summary and summary['status'] == 'closed':
+                repo.save_z_report(session_id, summary)
+                conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
 
-    if not session:
+    if not summary:
         raise HTTPException(status_code=404, detail="Sesión no encontrada")
 
     # Solo el dueño de la sesión o admin puede ver el resumen financiero
-    if usuario.get('role') != 'admin' and session['user_id'] != usuario.get('id'):
+    if usuario.get('role') != 'admin' and summary['user_id'] != usuario.get('id'):
         raise HTTPException(
             status_code=403,
             detail="No tienes permiso para ver el resumen de esta sesión"
         )
-    
-    # Obtener pagos de esta sesión
-    cursor.execute("""
-        SELECT id, order_id, payment_type, total_amount, cash_amount,
-               card_amount, tip_amount, change_amount, created_at
-        FROM payments
-        WHERE cash_session_id = %s
-        ORDER BY created_at DESC
-    """, (session_id,))
-    
-    payments = cursor.fetchall()
-    
-    # Calcular efectivo esperado
-    expected_cash = (
-        Decimal(str(session['opening_amount'])) + 
-        Decimal(str(session['total_cash_sales'])) +
-        Decimal(str(session['total_tips']))
-    )
-    
-    return {
-        "session_id": session['id'],
-        "opening_amount": session['opening_amount'],
-        "total_cash_sales": session['total_cash_sales'],
-        "total_card_sales": session['total_card_sales'],
-        "total_tips": session['total_tips'],
-        "expected_cash": expected_cash,
-        "orders_count": session['orders_count'],
-        "payments": payments
-    }
+
+    return summary
 
 
 @router.post("/sessions/{session_id}/close", response_model=CashSession)
@@ -177,12 +144,13 @@ def close_cash_session(
     cursor = conn.cursor()
 
     try:
-        # Obtener sesión actual
+        # Obtener sesión actual. FOR UPDATE espera a los pagos en curso de
+        # esta sesión y frena los nuevos hasta el commit (clave foránea)
         cursor.execute("""
-            SELECT opening_amount, total_cash_sales, COALESCE(total_tips, 0) as total_tips,
-                   user_id
+            SELECT opening_amount, user_id
             FROM cash_sessions
             WHERE id = %s AND status = 'open'
+            FOR UPDATE
         """, (session_id,))
 
         session = cursor.fetchone()
@@ -200,16 +168,20 @@ def close_cash_session(
                 detail="Solo puedes cerrar tu propia sesión de caja"
             )
         
+        # Plegar los contadores en la sesión: sus totales quedan fijos
+        repo = CashRepository(conn)
+        totals = repo.fold_totals(session_id)
+
         # Calcular monto esperado y diferencia
         expected = (
             Decimal(str(session['opening_amount'])) + 
-            Decimal(str(session['total_cash_sales'])) +
-            Decimal(str(session['total_tips']))
+            Decimal(str(totals['total_cash_sales'])) +
+            Decimal(str(totals['total_tips']))
         )
         difference = close_data.closing_amount - expected
         
         # Cerrar sesión
-        cursor.execute("""
+        cursor.execute(f"""
             UPDATE cash_sessions
             SET status = 'closed',
                 closing_amount = %s,
@@ -218,13 +190,18 @@ def close_cash_session(
                 closed_at = CURRENT_TIMESTAMP,
                 notes = COALESCE(notes || ' | ', '') || COALESCE(%s, '')
             WHERE id = %s
-            RETURNING id, user_id, status, opening_amount, closing_amount,
-                      expected_amount, difference, total_cash_sales, total_card_sales,
-                      total_sales, total_tips, orders_count, opened_at, closed_at, notes
+            RETURNING {SESSION_COLUMNS}
         """, (close_data.closing_amount, expected, difference, close_data.notes, session_id))
         
         closed_session = cursor.fetchone()
+
+        # Informe Z congelado, en la misma transacción que el cierre
+        repo.save_z_report(session_id, repo.build_z_report(session_id))
+
+        notify_resources_changed(conn, "cash_sessions")
         conn.commit()
+        # Puede quedar otra sesión abierta: se recarga en el siguiente uso
+        active_session.invalidate()
         
         return closed_session
     
@@ -242,107 +219,59 @@ def close_cash_session(
 # ============================================
 
 @router.post("/payments", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
-def create_payment(payment_data: PaymentCreate, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
-    """Registrar un pago para una orden"""
-    cursor = conn.cursor()
+def create_payment(
+    payment_data: PaymentCreate,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    conn = Depends(get_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Registrar el pago que salda una orden (o lo que le falte, si ya tiene
+    pagos parciales de POST /payments/batch). Con cabecera Idempotency-Key,
+    un reintento devuelve el pago ya registrado (ver core.idempotency).
+    """
+    repo = CashRepository(conn)
     
     try:
-        # Obtener la orden y verificar que existe
-        cursor.execute("""
-            SELECT id, total, status FROM orders WHERE id = %s
-        """, (payment_data.order_id,))
-        
-        order = cursor.fetchone()
-        
-        if not order:
-            raise HTTPException(status_code=404, detail="Orden no encontrada")
-        
-        if order['status'] == 'completed':
-            raise HTTPException(status_code=400, detail="Esta orden ya está pagada")
-        
-        # Calcular total pagado y cambio
-        total_paid = payment_data.cash_amount + payment_data.card_amount
-        order_total = Decimal(str(order['total']))
+        claim = idempotency.claim(conn, "payments", idempotency_key, usuario, payment_data)
+        if claim and claim.replay:
+            return claim.replay
+
+        # Bloquear la orden y leer lo ya pagado, igual que el pago dividido:
+        # 404 si no existe, 400 si ya está pagada. Lo entregado de más es
+        # cambio aunque venga de la tarjeta, como siempre en esta ruta
+        orders = repo.lock_order_balances([payment_data.order_id])
+        rows, balances = allocate_payments([payment_data], orders, card_change=True)
         
-        if total_paid < order_total:
+        # Este pago debe saldar la orden
+        if balances[0]['remaining'] > 0:
+            pending = balances[0]['remaining'] + rows[0]['total_amount']
+            tendered = payment_data.cash_amount + payment_data.card_amount
             raise HTTPException(
                 status_code=400, 
-                detail=f"Monto insuficiente. Total: {order_total}, Pagado: {total_paid}"
+                detail=f"Monto insuficiente. Total: {pending}, Pagado: {tendered}"
             )
         
-        change_amount = total_paid - order_total
+        # Sesión de caja activa (opcional; registro en memoria, ver core.active_session)
+        session_id = active_session.get_id(conn)
         
-        # Obtener sesión de caja activa (opcional)
-        cursor.execute("""
-            SELECT id FROM cash_sessions WHERE status = 'open' LIMIT 1
-        """)
-        active_session = cursor.fetchone()
-        session_id = active_session['id'] if active_session else None
-        
-        # Crear registro de pago
-        cursor.execute("""
-            INSERT INTO payments (
-                order_id, cash_session_id, payment_type,
-                total_amount, cash_amount, card_amount, tip_amount, change_amount
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, order_id, payment_type, total_amount, cash_amount,
-                      card_amount, tip_amount, change_amount, created_at
-        """, (
-            payment_data.order_id,
-            session_id,
-            payment_data.payment_type.value,
-            order_total,
-            payment_data.cash_amount,
-            payment_data.card_amount,
-            payment_data.tip_amount,
-            change_amount
-        ))
-        
-        new_payment = cursor.fetchone()
+        # Crear registro de pago. Los totales de la sesión salen de este
+        # registro (trigger de la migración 012, sin bloquear la fila de la
+        # sesión): cash_sales / card_sales son la venta, no lo entregado
+        new_payment = repo.insert_payments(session_id, rows)[0]
 
         # Marcar método de pago pero NO cambiar el estado de preparación/cocina.
         # Esto mantiene la orden visible en cocina aunque ya esté pagada.
-        cursor.execute("""
-            UPDATE orders
-            SET payment_method = %s
-            WHERE id = %s
-        """, (payment_data.payment_type.value, payment_data.order_id))
-
-        # ── Actualizar totales de la sesión de caja activa ──────────────
-        # cash_sales = real sale value paid in cash (NOT the amount handed by customer)
-        # For pure cash: cash_sales = order_total (customer paid €70, but sale is €60)
-        # For mixed: cash_sales = min(cash_amount, order_total - card_amount)
-        # For card: cash_sales = 0
-        if session_id:
-            ptype = payment_data.payment_type.value
-            if ptype == "cash":
-                real_cash_sales = order_total
-                real_card_sales = Decimal("0.00")
-            elif ptype == "card":
-                real_cash_sales = Decimal("0.00")
-                real_card_sales = order_total
-            else:  # mixed
-                real_card_sales = payment_data.card_amount
-                real_cash_sales = order_total - real_card_sales
-
-            cursor.execute("""
-                UPDATE cash_sessions SET
-                    total_cash_sales  = total_cash_sales  + %s,
-                    total_card_sales  = total_card_sales  + %s,
-                    total_sales       = total_sales       + %s,
-                    total_tips        = total_tips        + %s,
-                    orders_count      = orders_count      + 1
-                WHERE id = %s
-            """, (
-                real_cash_sales,
-                real_card_sales,
-                order_total,
-                payment_data.tip_amount,
-                session_id
-            ))
+        repo.set_payment_method([payment_data.order_id])
+
+        # El tablero de cocina muestra si la orden está pagada
+        notify_orders_changed(conn, [payment_data.order_id])
+        idempotency.save(conn, claim, status.HTTP_201_CREATED, PaymentResponse, new_payment)
 
         conn.commit()
+        idempotency.remember(claim)
+        background_tasks.add_task(live_board.refresh, [payment_data.order_id])
 
         return new_payment
     
@@ -355,6 +284,61 @@ def create_payment(payment_data: PaymentCreate, conn = Depends(get_db), usuario
         raise HTTPException(status_code=400, detail="Error procesando la solicitud")
 
 
+@router.post("/payments/batch", response_model=PaymentBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_payments_batch(
+    batch: PaymentBatchCreate,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    conn = Depends(get_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Registrar los pagos parciales de una cuenta dividida (una o varias
+    órdenes, p. ej. mesas unidas) en una sola transacción. Devuelve los pagos
+    y el saldo pendiente de cada orden. Si un pago no es válido no se
+    registra ninguno. Admite Idempotency-Key, como POST /payments.
+    """
+    repo = CashRepository(conn)
+
+    try:
+        claim = idempotency.claim(conn, "payments_batch", idempotency_key, usuario, batch)
+        if claim and claim.replay:
+            return claim.replay
+
+        order_ids = sorted({payment.order_id for payment in batch.payments})
+        orders = repo.lock_order_balances(order_ids)
+        rows, balances = allocate_payments(batch.payments, orders)
+
+        # Sesión de caja activa (opcional; registro en memoria, ver core.active_session)
+        session_id = active_session.get_id(conn)
+        new_payments = repo.insert_payments(session_id, rows)
+
+        # Método de pago solo en las órdenes que quedan saldadas: las que
+        # tienen saldo pendiente siguen sin pagar en el tablero
+        settled = [balance['order_id'] for balance in balances if balance['remaining'] <= 0]
+        if settled:
+            repo.set_payment_method(settled)
+
+        # El tablero de cocina muestra si la orden está pagada
+        notify_orders_changed(conn, order_ids)
+        result = {"payments": new_payments, "orders": balances}
+        idempotency.save(conn, claim, status.HTTP_201_CREATED, PaymentBatchResponse, result)
+
+        conn.commit()
+        idempotency.remember(claim)
+        background_tasks.add_task(live_board.refresh, order_ids)
+
+        return result
+
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
+
+
 @router.get("/payments/order/{order_id}", response_model=Optional[PaymentResponse])
 def get_payment_by_order(order_id: int, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener pago de una orden específica"""
@@ -383,11 +367,9 @@ def get_sessions(
     """Listar todas las sesiones de caja. Requiere rol admin o manager."""
     cursor = conn.cursor()
     
-    query = """
-        SELECT id, user_id, status, opening_amount, closing_amount,
-               expected_amount, difference, total_cash_sales, total_card_sales,
-               total_sales, total_tips, orders_count, opened_at, closed_at, notes
-        FROM cash_sessions
+    query = f"""
+        SELECT {SESSION_COLUMNS}
+        FROM cash_session_balances
         WHERE 1=1
     """
     params = []
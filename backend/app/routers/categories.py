@@ -10,12 +10,18 @@ from ..database import get_db
 import logging
 logger = logging.getLogger(__name__)
 from ..models.category import Category, CategoryCreate, CategoryUpdate
+from ..core.catalog_cache import catalog_cache, notify_catalog_changed
+from ..core.etag import etag_guard
 
-router = APIRouter()
+router = APIRouter(dependencies=[etag_guard("catalog")])
 
 @router.get("", response_model=List[Category])
 def get_categories(conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener todas las categorías"""
+    catalog = catalog_cache.get(conn)
+    if catalog is not None:
+        return list(catalog.categories.values())
+
     cursor = conn.cursor()
     cursor.execute("""
         SELECT id, name, description, created_at
@@ -28,6 +34,13 @@ def get_categories(conn = Depends(get_db), usuario = Depends(obtener_usuario_act
 @router.get("/{category_id}", response_model=Category)
 def get_category(category_id: int, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener categoría por ID"""
+    catalog = catalog_cache.get(conn)
+    if catalog is not None:
+        category = catalog.categories.get(category_id)
+        if not category:
+            raise HTTPException(status_code=404, detail="Categoría no encontrada")
+        return category
+
     cursor = conn.cursor()
     cursor.execute("""
         SELECT id, name, description, created_at
@@ -54,7 +67,9 @@ def create_category(category: CategoryCreate, conn = Depends(get_db), usuario =
         """, (category.name, category.description))
         
         new_category = cursor.fetchone()
+        notify_catalog_changed(conn, "categories")
         conn.commit()
+        catalog_cache.invalidate()
         return new_category
     
     except psycopg2.IntegrityError:
@@ -101,7 +116,9 @@ def update_category(category_id: int, category: CategoryUpdate, conn = Depends(g
         if not updated_category:
             raise HTTPException(status_code=404, detail="Categoría no encontrada")
         
+        notify_catalog_changed(conn, "categories")
         conn.commit()
+        catalog_cache.invalidate()
         return updated_category
     
     except psycopg2.IntegrityError:
@@ -127,5 +144,7 @@ def delete_category(category_id: int, conn = Depends(get_db), usuario = Depends(
     if not deleted:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
+    notify_catalog_changed(conn, "categories")
     conn.commit()
+    catalog_cache.invalidate()
     return {"message": "Categoría eliminada correctamente", "id": category_id}
\ No newline at end of file
@@ -8,12 +8,18 @@ import psycopg2
 
 from ..database import get_db
 from ..models import Modifier, ModifierCreate
+from ..core.catalog_cache import catalog_cache, notify_catalog_changed
+from ..core.etag import etag_guard
 
-router = APIRouter()
+router = APIRouter(dependencies=[etag_guard("catalog")])
 
 @router.get("", response_model=List[Modifier])
 def get_modifiers(conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener todos los modificadores"""
+    catalog = catalog_cache.get(conn)
+    if catalog is not None:
+        return list(catalog.modifiers.values())
+
     cursor = conn.cursor()
     cursor.execute("SELECT id, name, price, is_active FROM modifiers ORDER BY name")
     modifiers = cursor.fetchall()
@@ -28,5 +34,7 @@ def create_modifier(modifier: ModifierCreate, conn = Depends(get_db), usuario =
         (modifier.name, modifier.price)
     )
     new_modifier = cursor.fetchone()
+    notify_catalog_changed(conn, "modifiers")
     conn.commit()
+    catalog_cache.invalidate()
     return new_modifier
@@ -1,25 +1,67 @@
 """
 Router para gestión de órdenes
 """
-from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
-from ..security import obtener_usuario_actual
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, status, BackgroundTasks
+from ..security import obtener_usuario_actual, verificar_rol
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
+import base64
+import psycopg
 import psycopg2
 
-from ..database import get_db
+from ..database import get_db, get_async_db, get_read_db
+from ..repositories.order_repository import OrderRepository, AsyncOrderRepository
+from ..services.order_pricing import (
+    collect_catalog_ids, delivery_fee_for, price_items, split_tax_inclusive
+)
+from ..core import business_day
+from ..core.live_board import live_board, notify_orders_changed, anotify_orders_changed
+from ..core.etag import etag_guard
+from ..core.active_session import active_session
+from ..core.idempotency import idempotency
 import logging
 logger = logging.getLogger(__name__)
 from ..models.order import (
     Order, OrderCreate, OrderWithDetails, OrderItem,
-    OrderItemCreate, OrderStatus, OrderUpdate
+    OrderItemCreate, OrderStatus, OrderUpdate, LiveBoardSnapshot, PhoneLineStatus,
+    OrderBatchCreate, OrderBatchResponse
 )
 from pydantic import BaseModel
-from .geocoding import calculate_delivery_fee
 from app.config import settings
 
-router = APIRouter()
+# cash_sessions: ?only_active_session=true cambia al abrir o cerrar la caja.
+# /history lee de la réplica y queda fuera: su ETag podría ser más nuevo que los datos
+router = APIRouter(dependencies=[etag_guard("orders", "catalog", "cash_sessions", exclude=["get_order_history"])])
+
+# Líneas telefónicas del local (OrderCreate.phone_line: 1-4)
+PHONE_LINES = range(1, 5)
+
+# Órdenes por transacción en POST /batch: acota cuánto tiempo queda bloqueado
+# el contador de números de la sesión y el tamaño de cada INSERT
+BATCH_CHUNK_SIZE = 50
+
+# Estados en los que una orden ya no ocupa línea telefónica ni mesa
+FINISHED_STATUSES = ('completed', 'cancelled')
+
+# Tope de GET /details para que un request no arrastre medio historial
+MAX_BULK_ORDER_DETAILS = 100
+
+# Filas por página de GET /orders: un limit mayor se corta aquí y el resto
+# sale con X-Next-Cursor
+MAX_ORDERS_PAGE = 500
+
+ORDERS_LIST_SELECT = """
+    SELECT 
+        o.id, o.order_number, o.customer_name, o.order_type, o.status,
+        o.subtotal, o.tax, o.delivery_fee, o.discount, o.total,
+        o.payment_method, o.notes, o.table_id, o.cash_session_id, o.phone_line,
+        o.created_at, o.completed_at, o.user_id,
+        u.full_name as waiter_name,
+        COALESCE((SELECT SUM(p.total_amount) FROM payments p WHERE p.order_id = o.id) >= o.total, FALSE) as has_payment
+    FROM orders o
+    LEFT JOIN users u ON o.user_id = u.id
+"""
 
 # Import WebSocket manager para notificaciones en tiempo real
 try:
@@ -28,120 +70,53 @@ try:
 except:
     WEBSOCKET_AVAILABLE = False
 
-def generate_order_number():
-    """Generar número de orden único"""
-    return f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
 class OrderItemsUpdate(BaseModel):
     """Payload para agregar / quitar items a una orden existente"""
     add_items: list[OrderItemCreate] = []
     remove_item_ids: list[int] = []
 
 @router.post("", response_model=Order, status_code=status.HTTP_201_CREATED)
-async def create_order(order_data: OrderCreate, background_tasks: BackgroundTasks, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
-    """Crear nueva orden con items vinculada a la sesión de caja activa"""
+async def create_order(
+    order_data: OrderCreate,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    conn = Depends(get_async_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Crear nueva orden con items vinculada a la sesión de caja activa.
+    Con cabecera Idempotency-Key, un reintento devuelve la orden ya creada
+    (ver core.idempotency).
+    """
     cursor = conn.cursor()
     
     try:
+        claim = await idempotency.aclaim(conn, "orders", idempotency_key, usuario, order_data)
+        if claim and claim.replay:
+            return claim.replay
+
         # 1. Obtener sesión de caja activa
-        cursor.execute("""
-            SELECT id FROM cash_sessions 
-            WHERE status = 'open' 
-            ORDER BY id DESC LIMIT 1
-        """)
-        active_session = cursor.fetchone()
-        cash_session_id = active_session['id'] if active_session else None
+        cash_session_id = await active_session.aget_id(conn)
         
-        # 2. Generar número de orden
-        if cash_session_id:
-            # Si hay sesión, contar órdenes de esta sesión
-            cursor.execute("""
-                SELECT COUNT(*) as count 
-                FROM orders 
-                WHERE cash_session_id = %s
-            """, (cash_session_id,))
-            result = cursor.fetchone()
-            count = result['count'] if result else 0
-            # Formato: #001
-            order_number = f"#{count + 1:03d}"
-        else:
-            # Fallback si no hay sesión (usar timestamp)
-            order_number = f"ORD-{datetime.now().strftime('%H%M%S')}"
-
-        # 3. Calcular totales
-        total = Decimal("0.00")
-        order_items_data = []
-        
-        for item in order_data.items:
-            # Obtener producto y verificar disponibilidad
-            cursor.execute("""
-                SELECT id, name, price, is_available 
-                FROM products 
-                WHERE id = %s
-            """, (item.product_id,))
-            
-            product = cursor.fetchone()
-            
-            if not product:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"Producto {item.product_id} no encontrado"
-                )
-            
-            if not product['is_available']:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Producto {product['name']} no está disponible"
-                )
-            
-            # Calcular modificadores si hay
-            modifiers_total = Decimal("0.00")
-            item_modifiers_data = []
-            
-            if hasattr(item, 'modifier_ids') and item.modifier_ids:
-                for mod_id in item.modifier_ids:
-                    cursor.execute("SELECT id, name, price FROM modifiers WHERE id = %s AND is_active = TRUE", (mod_id,))
-                    mod = cursor.fetchone()
-                    if mod:
-                        modifiers_total += Decimal(str(mod['price']))
-                        item_modifiers_data.append(mod)
-
-            # En modelo Tax-Inclusive, el precio del producto es el precio final
-            unit_price = Decimal(str(product['price'])) + modifiers_total
-            item_total = unit_price * item.quantity
-            total += item_total
-            
-            # Guardamos el item_total como subtotal del item
-            order_items_data.append({
-                'product_id': product['id'],
-                'quantity': item.quantity,
-                'unit_price': unit_price,
-                'subtotal': item_total,
-                'special_instructions': item.special_instructions,
-                'modifiers': item_modifiers_data
-            })
+        # 2. Calcular totales: una consulta para todos los productos y otra
+        #    para todos los modificadores, sin importar el tamaño de la orden
+        repo = AsyncOrderRepository(conn)
+        product_ids, modifier_ids = collect_catalog_ids(order_data.items)
+        order_items_data, total = price_items(
+            order_data.items,
+            await repo.get_products_by_ids(product_ids),
+            await repo.get_active_modifiers_by_ids(modifier_ids)
+        )
         
         # Back-calculate Subtotal and Tax from Total (Tax Inclusive)
-        # Total = Subtotal * (1 + TAX_RATE)
-        tax_multiplier = Decimal(str(1 + settings.TAX_RATE))
-        subtotal = total / tax_multiplier
-        
-        # Tax = Total - Subtotal
-        tax = total - subtotal
+        subtotal, tax = split_tax_inclusive(total)
         
         # Delivery Fee
-        delivery_fee = Decimal("0.00")
-        if order_data.order_type.value == "delivery":
-            if order_data.customer_id:
-                cursor.execute("SELECT latitude, longitude FROM customers WHERE id = %s", (order_data.customer_id,))
-                cust_coords = cursor.fetchone()
-                if cust_coords and cust_coords['latitude'] and cust_coords['longitude']:
-                    fee = calculate_delivery_fee(float(cust_coords['latitude']), float(cust_coords['longitude']))
-                    delivery_fee = Decimal(str(fee))
-                else:
-                    delivery_fee = Decimal("3.00")  # Default fee if no coords
-            else:
-                delivery_fee = Decimal("3.00")  # Default fee if no customer_id provided
+        cust_coords = None
+        if order_data.order_type.value == "delivery" and order_data.customer_id:
+            await cursor.execute("SELECT latitude, longitude FROM customers WHERE id = %s", (order_data.customer_id,))
+            cust_coords = await cursor.fetchone()
+        delivery_fee = delivery_fee_for(order_data.order_type.value, cust_coords)
                 
         # Discount (0 por ahora)
         discount = Decimal("0.00")
@@ -151,19 +126,25 @@ async def create_order(order_data: OrderCreate, background_tasks: BackgroundTask
         
         # Validar línea telefónica
         if order_data.phone_line is not None:
-            cursor.execute("""
+            # Índice parcial de órdenes activas: no depende del tamaño del historial
+            await cursor.execute("""
                 SELECT id FROM orders 
                 WHERE phone_line = %s 
                   AND status NOT IN ('completed', 'cancelled')
+                LIMIT 1
             """, (order_data.phone_line,))
-            if cursor.fetchone():
+            if await cursor.fetchone():
                 raise HTTPException(
                     status_code=400, 
                     detail=f"La línea telefónica {order_data.phone_line} ya está en uso por otra orden activa"
                 )
 
+        # 3. Asignar número de orden justo antes de insertar: el contador de la
+        #    sesión queda bloqueado hasta el commit, así que cuanto más tarde mejor
+        order_number = await repo.allocate_order_number(cash_session_id)
+
         # 4. Crear orden con cash_session_id
-        cursor.execute("""
+        await cursor.execute("""
             INSERT INTO orders (
                 order_number, customer_name, order_type, status,
                 subtotal, tax, delivery_fee, discount, total,
@@ -192,49 +173,24 @@ async def create_order(order_data: OrderCreate, background_tasks: BackgroundTask
             order_data.phone_line
         ))
         
-        new_order = cursor.fetchone()
+        new_order = await cursor.fetchone()
         order_id = new_order['id']
         
         # Actualizar estado de mesa si es para comer ahí
         if order_data.table_id:
-            cursor.execute("UPDATE tables SET is_occupied = TRUE WHERE id = %s", (order_data.table_id,))
+            await cursor.execute("UPDATE tables SET is_occupied = TRUE WHERE id = %s", (order_data.table_id,))
         
-        # Crear items de la orden y actualizar inventario
-        for item_data in order_items_data:
-            cursor.execute("""
-                INSERT INTO order_items (
-                    order_id, product_id, quantity,
-                    unit_price, subtotal, special_instructions
-                )
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                order_id,
-                item_data['product_id'],
-                item_data['quantity'],
-                item_data['unit_price'],
-                item_data['subtotal'],
-                item_data['special_instructions']
-            ))
-            
-            order_item_id = cursor.fetchone()['id']
-            
-            # Insertar modificadores si existen
-            if 'modifiers' in item_data and item_data['modifiers']:
-                for mod in item_data['modifiers']:
-                    cursor.execute("""
-                        INSERT INTO order_item_modifiers (order_item_id, modifier_id, price)
-                        VALUES (%s, %s, %s)
-                    """, (order_item_id, mod['id'], mod['price']))
-            
-            # Reducir el inventario del producto
-            cursor.execute("""
-                UPDATE products 
-                SET stock_quantity = GREATEST(0, stock_quantity - %s) 
-                WHERE id = %s
-            """, (item_data['quantity'], item_data['product_id']))
+        # Crear items (con sus modificadores) y actualizar inventario en bloque
+        await repo.insert_items(order_id, order_items_data)
+        await repo.decrement_stock(order_items_data)
+        await anotify_orders_changed(conn, [order_id])
+        await idempotency.asave(conn, claim, status.HTTP_201_CREATED, Order, new_order)
         
-        conn.commit()
+        await conn.commit()
+        idempotency.remember(claim)
+
+        # Tablero de cocina primero, así ya está al día cuando llega el aviso WebSocket
+        background_tasks.add_task(live_board.refresh, [order_id])
 
         # Notificar via WebSocket en background
         if WEBSOCKET_AVAILABLE:
@@ -243,134 +199,431 @@ async def create_order(order_data: OrderCreate, background_tasks: BackgroundTask
         return new_order
 
     except HTTPException:
-        conn.rollback()
+        await conn.rollback()
         raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         import traceback
         traceback.print_exc()
         print(f"Error creating order: {str(e)}")
         logger.error("Error interno: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail="Error procesando la solicitud")
 
+@router.post("/batch", response_model=OrderBatchResponse)
+async def create_orders_batch(
+    batch: OrderBatchCreate,
+    background_tasks: BackgroundTasks,
+    conn = Depends(get_async_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Registrar un lote de órdenes encoladas por un till offline.
+
+    Cada orden trae su client_order_id (UUID): las que ya estaban registradas
+    vuelven como `duplicate`, así que reenviar el lote es seguro. Sesión de
+    caja, catálogo, clientes y líneas telefónicas se consultan una vez por
+    lote; las órdenes válidas se insertan por tramos de BATCH_CHUNK_SIZE, cada
+    uno en su propia transacción. Una orden inválida no afecta a las demás.
+
+    A diferencia de POST /api/orders, la línea telefónica solo se valida para
+    órdenes que llegan activas (las ya completadas no la ocupan).
+    """
+    cursor = conn.cursor()
+    repo = AsyncOrderRepository(conn)
+    results = [None] * len(batch.orders)
+    created_ids = []
+
+    try:
+        # 1. Sesión de caja activa (una vez para todo el lote)
+        cash_session_id = await active_session.aget_id(conn)
+
+        # 2. Reenvíos: órdenes del lote que ya se registraron
+        existing = await repo.get_by_client_order_ids(
+            list({order_data.client_order_id for order_data in batch.orders})
+        )
+        pending = []
+        seen = set()
+        for i, order_data in enumerate(batch.orders):
+            cid = order_data.client_order_id
+            if cid in existing:
+                results[i] = {"client_order_id": cid, "status": "duplicate", "order": existing[cid]}
+            elif cid in seen:
+                results[i] = {"client_order_id": cid, "status": "error", "error": "client_order_id repetido en el lote"}
+            else:
+                seen.add(cid)
+                pending.append((i, order_data))
+
+        # 3. Catálogo, coordenadas de clientes y líneas ocupadas: una consulta cada uno
+        product_ids, modifier_ids = collect_catalog_ids(
+            item for _, order_data in pending for item in order_data.items
+        )
+        products = await repo.get_products_by_ids(product_ids)
+        modifiers = await repo.get_active_modifiers_by_ids(modifier_ids)
+
+        customer_ids = sorted({
+            o.customer_id for _, o in pending if o.order_type.value == "delivery" and o.customer_id
+        })
+        coords = {}
+        if customer_ids:
+            await cursor.execute(
+                "SELECT id, latitude, longitude FROM customers WHERE id = ANY(%s)", (customer_ids,)
+            )
+            coords = {row['id']: row for row in await cursor.fetchall()}
+
+        await cursor.execute("""
+            SELECT DISTINCT phone_line FROM orders
+            WHERE phone_line IS NOT NULL
+              AND status NOT IN ('completed', 'cancelled')
+        """)
+        busy_lines = {row['phone_line'] for row in await cursor.fetchall()}
+        await conn.rollback()  # solo lecturas; cada tramo abre su transacción
+
+        # 4. Validar y calcular precios en memoria
+        valid = []
+        for i, order_data in pending:
+            cid = order_data.client_order_id
+            try:
+                priced_items, total = price_items(order_data.items, products, modifiers)
+            except HTTPException as e:
+                results[i] = {"client_order_id": cid, "status": "error", "error": e.detail}
+                continue
+
+            order_status = order_data.status.value if order_data.status else OrderStatus.PENDING.value
+            active = order_status not in FINISHED_STATUSES
+            if active and order_data.phone_line is not None:
+                if order_data.phone_line in busy_lines:
+                    results[i] = {
+                        "client_order_id": cid, "status": "error",
+                        "error": f"La línea telefónica {order_data.phone_line} ya está en uso por otra orden activa"
+                    }
+                    continue
+                busy_lines.add(order_data.phone_line)
+
+            subtotal, tax = split_tax_inclusive(total)
+            delivery_fee = delivery_fee_for(order_data.order_type.value, coords.get(order_data.customer_id))
+            valid.append((i, {
+                'client_order_id': cid,
+                'customer_name': order_data.customer_name,
+                'order_type': order_data.order_type.value,
+                'status': order_status,
+                'subtotal': subtotal,
+                'tax': tax,
+                'delivery_fee': delivery_fee,
+                'discount': Decimal("0.00"),
+                'total': total + delivery_fee,
+                'payment_method': order_data.payment_method.value if order_data.payment_method else None,
+                'notes': order_data.notes,
+                'table_id': order_data.table_id,
+                'user_id': order_data.user_id,
+                'phone_line': order_data.phone_line,
+            }, priced_items))
+
+    except Exception as e:
+        await conn.rollback()
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
+
+    # 5. Insertar por tramos, una transacción por tramo
+    for start in range(0, len(valid), BATCH_CHUNK_SIZE):
+        chunk = valid[start:start + BATCH_CHUNK_SIZE]
+        try:
+            created_ids += await _insert_batch_chunk(conn, cash_session_id, chunk, results)
+        except Exception as e:
+            await conn.rollback()
+            logger.error("Error interno: %s", e, exc_info=True)
+            for i, order, _ in chunk:
+                results[i] = {"client_order_id": order['client_order_id'], "status": "error",
+                              "error": "Error procesando la solicitud"}
+
+    # 6. Un solo aviso para todo el lote
+    if created_ids:
+        background_tasks.add_task(live_board.refresh, created_ids)
+        if WEBSOCKET_AVAILABLE:
+            background_tasks.add_task(
+                notify_order_change, {"order_ids": created_ids, "count": len(created_ids)}, 'orders_batch_created'
+            )
+
+    return {
+        "created": sum(1 for r in results if r['status'] == "created"),
+        "duplicates": sum(1 for r in results if r['status'] == "duplicate"),
+        "errors": sum(1 for r in results if r['status'] == "error"),
+        "results": results,
+    }
+
+async def _insert_batch_chunk(conn, cash_session_id, chunk, results) -> List[int]:
+    """
+    Insertar un tramo del lote en una transacción: números de orden, órdenes,
+    items, inventario y mesas con una sentencia cada uno. Si otro request
+    registró alguna de estas órdenes a la vez (reenvío concurrente), se
+    revierte, se marcan como duplicate y se reintenta con el resto.
+    """
+    repo = AsyncOrderRepository(conn)
+    cursor = conn.cursor()
+
+    for attempt in range(2):
+        try:
+            numbers = await repo.allocate_order_numbers(cash_session_id, len(chunk))
+            for (_, order, _), number in zip(chunk, numbers):
+                order['order_number'] = number
+
+            rows = await repo.insert_orders(cash_session_id, [order for _, order, _ in chunk])
+            by_client_id = {row['client_order_id']: row for row in rows}
+
+            await repo.insert_items_for_orders([
+                (by_client_id[order['client_order_id']]['id'], priced_items)
+                for _, order, priced_items in chunk
+            ])
+            await repo.decrement_stock([item for _, _, priced_items in chunk for item in priced_items])
+
+            table_ids = sorted({
+                order['table_id'] for _, order, _ in chunk
+                if order['table_id'] and order['status'] not in FINISHED_STATUSES
+            })
+            if table_ids:
+                await cursor.execute("UPDATE tables SET is_occupied = TRUE WHERE id = ANY(%s)", (table_ids,))
+
+            await anotify_orders_changed(conn, [row['id'] for row in rows])
+            await conn.commit()
+        except psycopg.errors.UniqueViolation:
+            await conn.rollback()
+            if attempt:
+                raise
+            existing = await repo.get_by_client_order_ids([order['client_order_id'] for _, order, _ in chunk])
+            for i, order, _ in chunk:
+                if order['client_order_id'] in existing:
+                    results[i] = {"client_order_id": order['client_order_id'], "status": "duplicate",
+                                  "order": existing[order['client_order_id']]}
+            chunk = [entry for entry in chunk if entry[1]['client_order_id'] not in existing]
+            if not chunk:
+                return []
+            continue
+
+        for i, order, _ in chunk:
+            results[i] = {"client_order_id": order['client_order_id'], "status": "created",
+                          "order": by_client_id[order['client_order_id']]}
+        return [row['id'] for row in rows]
+
+@router.get("/board", response_model=LiveBoardSnapshot)
+async def get_live_board(
+    version: Optional[str] = Query(None, description="Versión que ya tiene el cliente"),
+    conn = Depends(get_async_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Tablero de cocina: todas las órdenes en curso con items y modificadores,
+    servido desde memoria. Si `version` coincide con la actual, responde
+    `up_to_date: true` sin órdenes.
+    """
+    current_version, orders = await live_board.snapshot(conn)
+    if version is not None and version == current_version:
+        return {"version": current_version, "up_to_date": True, "orders": []}
+    return {"version": current_version, "up_to_date": False, "orders": orders}
+
+@router.get("/phone-lines", response_model=List[PhoneLineStatus])
+async def get_phone_lines(conn = Depends(get_async_db), usuario = Depends(obtener_usuario_actual)):
+    """
+    Ocupación de las líneas telefónicas: para cada línea, la orden activa que
+    la usa (si hay). Solo lee órdenes activas vía índice parcial.
+    """
+    cursor = conn.cursor()
+    await cursor.execute("""
+        SELECT DISTINCT ON (phone_line)
+            phone_line, id, order_number, customer_name, status, created_at
+        FROM orders
+        WHERE phone_line IS NOT NULL
+          AND status NOT IN ('completed', 'cancelled')
+        ORDER BY phone_line, created_at DESC
+    """)
+    active = {row['phone_line']: row for row in await cursor.fetchall()}
+
+    lines = []
+    for line in PHONE_LINES:
+        row = active.get(line)
+        lines.append({
+            "line": line,
+            "occupied": row is not None,
+            "order_id": row['id'] if row else None,
+            "order_number": row['order_number'] if row else None,
+            "customer_name": row['customer_name'] if row else None,
+            "status": row['status'] if row else None,
+            "created_at": row['created_at'] if row else None,
+        })
+    return lines
+
+@router.get("/details", response_model=List[OrderWithDetails])
+def get_orders_details(
+    ids: str = Query(..., description="IDs de órdenes separados por coma, p. ej. 1,2,3"),
+    conn = Depends(get_db),
+    usuario = Depends(obtener_usuario_actual)
+):
+    """
+    Obtener varias órdenes completas en un solo request (KDS, historial).
+
+    Devuelve las órdenes en el orden pedido; los IDs inexistentes se omiten.
+    """
+    try:
+        order_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids debe ser una lista de enteros separados por coma")
+
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un ID de orden")
+    if len(order_ids) > MAX_BULK_ORDER_DETAILS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_BULK_ORDER_DETAILS} órdenes por request"
+        )
+
+    return OrderRepository(conn).get_many_with_details(order_ids)
+
+@router.get("/history", response_model=List[Order])
+def get_order_history(
+    response: Response,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[str] = None,
+    order_type: Optional[str] = None,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    conn = Depends(get_read_db),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """
+    Historial de órdenes de los días de negocio date_from..date_to (sin límite
+    si se omiten), con la misma paginación que GET /orders. Requiere rol admin
+    o manager.
+
+    Lee de la réplica si hay una al día (get_read_db): puede ir hasta
+    DATABASE_REPLICA_MAX_LAG_SECONDS por detrás del último cambio, así que
+    no lleva ETag (la versión del ETag sigue al primario).
+    """
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
+
+    conditions, params = [], []
+    start, end = business_day.range_bounds(date_from, date_to)
+    if start:
+        conditions.append("o.created_at >= %s")
+        params.append(start)
+    if end:
+        conditions.append("o.created_at < %s")
+        params.append(end)
+
+    if status:
+        conditions.append("o.status = %s")
+        params.append(status)
+
+    if order_type:
+        conditions.append("o.order_type = %s")
+        params.append(order_type)
+
+    return _list_orders(conn, response, conditions, params, limit, cursor)
+
 @router.get("/{order_id}", response_model=OrderWithDetails)
 def get_order(order_id: int, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
-    """Obtener orden con todos sus detalles"""
-    cursor = conn.cursor()
-    
-    # Obtener orden
-    # Obtener orden con mesero
-    cursor.execute("""
-        SELECT 
-            o.id, o.order_number, o.customer_name, o.order_type, o.status,
-            o.subtotal, o.tax, o.delivery_fee, o.discount, o.total,
-            o.payment_method, o.notes, o.table_id, o.phone_line,
-            o.created_at, o.completed_at, o.user_id,
-            u.full_name as waiter_name,
-            EXISTS (SELECT 1 FROM payments p WHERE p.order_id = o.id) as has_payment
-        FROM orders o
-        LEFT JOIN users u ON o.user_id = u.id
-        WHERE o.id = %s
-    """, (order_id,))
-    
-    order = cursor.fetchone()
-    
+    """Obtener orden con todos sus detalles (una sola consulta)"""
+    order = OrderRepository(conn).get_with_details(order_id)
+
     if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
-    # Obtener items de la orden
-    cursor.execute("""
-        SELECT 
-            oi.id, oi.order_id, oi.product_id, oi.quantity,
-            oi.unit_price, oi.subtotal, oi.special_instructions,
-            oi.created_at,
-            p.name as product_name
-        FROM order_items oi
-        JOIN products p ON oi.product_id = p.id
-        WHERE oi.order_id = %s
-    """, (order_id,))
-    
-    items = cursor.fetchall()
-    
-    # Obtener modificadores para cada item
-    for item in items:
-        cursor.execute("""
-            SELECT 
-                oim.id, oim.modifier_id, oim.price as additional_price,
-                m.name as modifier_name
-            FROM order_item_modifiers oim
-            JOIN modifiers m ON oim.modifier_id = m.id
-            WHERE oim.order_item_id = %s
-        """, (item['id'],))
-        item['modifiers'] = cursor.fetchall()
-    
-    # Construir respuesta
-    order_dict = dict(order)
-    order_dict['items'] = items
-    
-    return order_dict
+
+    return order
+
+def _encode_cursor(created_at: datetime, order_id: int) -> str:
+    """Cursor opaco para la página siguiente: posición (created_at, id) de la última fila."""
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor_token: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor_token + "=" * (-len(cursor_token) % 4)
+        created_at, order_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _list_orders(conn, response: Response, conditions: list, params: list, limit: int, cursor: Optional[str]) -> list:
+    """
+    Una página de órdenes que cumplen `conditions`, de la más reciente a la más
+    antigua (ver GET /orders para el cursor y el tope de página).
+    """
+    limit = min(limit, MAX_ORDERS_PAGE)
+    query = ORDERS_LIST_SELECT
+
+    if cursor:
+        conditions.append("(o.created_at, o.id) < (%s, %s)")
+        params.extend(_decode_cursor(cursor))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    # Una fila de más para saber si hay página siguiente
+    query += " ORDER BY o.created_at DESC, o.id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    db_cursor = conn.cursor()
+    db_cursor.execute(query, params)
+    orders = db_cursor.fetchall()
+
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(orders[-1]['created_at'], orders[-1]['id'])
+
+    return orders
 
 @router.get("", response_model=List[Order])
 def get_orders(
+    response: Response,
     status: Optional[str] = None,
     order_type: Optional[str] = None,
     only_active_session: bool = False,
-    limit: int = 50,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
     conn = Depends(get_db),
     usuario = Depends(obtener_usuario_actual)
 ):
-    """Obtener órdenes con filtros opcionales"""
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT 
-            o.id, o.order_number, o.customer_name, o.order_type, o.status,
-            o.subtotal, o.tax, o.delivery_fee, o.discount, o.total,
-            o.payment_method, o.notes, o.table_id, o.cash_session_id, o.phone_line,
-            o.created_at, o.completed_at, o.user_id,
-            u.full_name as waiter_name,
-            EXISTS (SELECT 1 FROM payments p WHERE p.order_id = o.id) as has_payment
-        FROM orders o
-        LEFT JOIN users u ON o.user_id = u.id
-        WHERE 1=1
     """
-    
-    params = []
+    Obtener órdenes con filtros opcionales, de la más reciente a la más antigua.
+
+    Paginación por cursor: si hay más resultados, la respuesta trae el header
+    `X-Next-Cursor`; pasarlo como `?cursor=` devuelve la página siguiente.
+    Cada página es un rango del índice (created_at, id), así que la página 100
+    cuesta lo mismo que la primera (no hay OFFSET). Un `limit` mayor que
+    MAX_ORDERS_PAGE devuelve MAX_ORDERS_PAGE órdenes y el cursor del resto.
+
+    Lee del primario: el KDS y las cajas recargan con esta ruta tras cada
+    evento y la orden anunciada tiene que estar. El historial va por
+    GET /orders/history (réplica).
+    """
+    conditions, params = [], []
     
     # Filtro por sesión activa
     if only_active_session:
-        # Buscar la sesión abierta más reciente
-        cursor.execute("SELECT id FROM cash_sessions WHERE status = 'open' ORDER BY id DESC LIMIT 1")
-        active_session = cursor.fetchone()
+        # Sesión abierta más reciente (registro en memoria, ver core.active_session)
+        active_session_id = active_session.get_id(conn)
         
-        if active_session:
-            query += " AND cash_session_id = %s"
-            params.append(active_session['id'])
+        if active_session_id:
+            conditions.append("o.cash_session_id = %s")
+            params.append(active_session_id)
         else:
             # Si no hay sesión activa y se pide filtro, no devolver nada (o manejar según lógica de negocio)
             # Retornar lista vacía ya que no hay 'órdenes de la sesión activa'
             return []
     
     if status:
-        query += " AND status = %s"
+        conditions.append("o.status = %s")
         params.append(status)
     
     if order_type:
-        query += " AND order_type = %s"
+        conditions.append("o.order_type = %s")
         params.append(order_type)
-    
-    query += " ORDER BY created_at DESC LIMIT %s"
-    params.append(limit)
-    
-    cursor.execute(query, params)
-    orders = cursor.fetchall()
-    
-    return orders
+
+    return _list_orders(conn, response, conditions, params, limit, cursor)
 
 @router.post("/{order_id}/items", response_model=OrderWithDetails)
 def update_order_items(
     order_id: int,
     items_data: OrderItemsUpdate, # Renamed payload to items_data
+    background_tasks: BackgroundTasks,
     conn = Depends(get_db),
     usuario = Depends(obtener_usuario_actual) # Added usuario param
 ):
@@ -399,57 +652,15 @@ def update_order_items(
             )
 
         # Agregar nuevos items
-        for item in items_data.add_items:
-            cursor.execute("""
-                SELECT id, name, price, is_available 
-                FROM products 
-                WHERE id = %s
-            """, (item.product_id,))
-            product = cursor.fetchone()
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Producto {item.product_id} no encontrado")
-            if not product['is_available']:
-                raise HTTPException(status_code=400, detail=f"Producto {product['name']} no está disponible")
-
-            # Calcular modificadores si hay
-            modifiers_total = Decimal("0.00")
-            item_modifiers_data = []
-            
-            if hasattr(item, 'modifier_ids') and item.modifier_ids:
-                for mod_id in item.modifier_ids:
-                    cursor.execute("SELECT id, name, price FROM modifiers WHERE id = %s AND is_active = TRUE", (mod_id,))
-                    mod = cursor.fetchone()
-                    if mod:
-                        modifiers_total += Decimal(str(mod['price']))
-                        item_modifiers_data.append(mod)
-
-            unit_price = Decimal(str(product['price'])) + modifiers_total
-            item_total = unit_price * item.quantity
-
-            cursor.execute("""
-                INSERT INTO order_items (
-                    order_id, product_id, quantity,
-                    unit_price, subtotal, special_instructions
-                )
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                order_id,
-                product['id'],
-                item.quantity,
-                unit_price,
-                item_total,
-                item.special_instructions
-            ))
-            
-            order_item_id = cursor.fetchone()['id']
-            
-            # Insertar modificadores si existen
-            for mod in item_modifiers_data:
-                cursor.execute("""
-                    INSERT INTO order_item_modifiers (order_item_id, modifier_id, price)
-                    VALUES (%s, %s, %s)
-                """, (order_item_id, mod['id'], mod['price']))
+        if items_data.add_items:
+            repo = OrderRepository(conn)
+            product_ids, modifier_ids = collect_catalog_ids(items_data.add_items)
+            new_items, _ = price_items(
+                items_data.add_items,
+                repo.get_products_by_ids(product_ids),
+                repo.get_active_modifiers_by_ids(modifier_ids)
+            )
+            repo.insert_items(order_id, new_items)
 
         # Recalcular totales
         cursor.execute("""
@@ -477,7 +688,9 @@ def update_order_items(
             WHERE id = %s
         """, (subtotal, tax, total, order_id))
 
+        notify_orders_changed(conn, [order_id])
         conn.commit()
+        background_tasks.add_task(live_board.refresh, [order_id])
 
         # Devolver orden con detalles
         return get_order(order_id, conn, usuario)
@@ -495,7 +708,7 @@ async def update_order_status(
     order_id: int,
     new_status: OrderStatus,
     background_tasks: BackgroundTasks,
-    conn = Depends(get_db),
+    conn = Depends(get_async_db),
     usuario = Depends(obtener_usuario_actual)
 ):
     """Actualizar estado de una orden"""
@@ -503,14 +716,14 @@ async def update_order_status(
     
     try:
         # Traer orden actual para validar transiciones/pagos
-        cursor.execute("SELECT id, status, payment_method FROM orders WHERE id = %s", (order_id,))
-        current = cursor.fetchone()
+        await cursor.execute("SELECT id, status, payment_method FROM orders WHERE id = %s", (order_id,))
+        current = await cursor.fetchone()
         if not current:
             raise HTTPException(status_code=404, detail="Orden no encontrada")
 
         # Si el estado es READY o COMPLETED, registrar timestamp
         if new_status in (OrderStatus.READY, OrderStatus.COMPLETED):
-            cursor.execute("""
+            await cursor.execute("""
                 UPDATE orders
                 SET status = %s, completed_at = CURRENT_TIMESTAMP
                 WHERE id = %s
@@ -520,7 +733,7 @@ async def update_order_status(
                           created_at, completed_at
             """, (new_status.value, order_id))
         else:
-            cursor.execute("""
+            await cursor.execute("""
                 UPDATE orders
                 SET status = %s
                 WHERE id = %s
@@ -530,7 +743,7 @@ async def update_order_status(
                           created_at, completed_at
             """, (new_status.value, order_id))
         
-        updated_order = cursor.fetchone()
+        updated_order = await cursor.fetchone()
         
         # Ya validamos existencia arriba, pero mantenemos chequeo defensivo
         if not updated_order:
@@ -538,9 +751,11 @@ async def update_order_status(
             
         # Liberar mesa si la orden se completa
         if new_status == OrderStatus.COMPLETED and updated_order['table_id']:
-            cursor.execute("UPDATE tables SET is_occupied = FALSE WHERE id = %s", (updated_order['table_id'],))
+            await cursor.execute("UPDATE tables SET is_occupied = FALSE WHERE id = %s", (updated_order['table_id'],))
 
-        conn.commit()
+        await anotify_orders_changed(conn, [order_id])
+        await conn.commit()
+        background_tasks.add_task(live_board.refresh, [order_id])
 
         # Notificar via WebSocket
         if WEBSOCKET_AVAILABLE:
@@ -549,6 +764,6 @@ async def update_order_status(
         return updated_order
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error("Error interno: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail="Error procesando la solicitud")
@@ -10,8 +10,10 @@ import logging
 logger = logging.getLogger(__name__)
 from ..schemas.product import Product, ProductCreate, ProductUpdate, ProductWithCategory
 from ..repositories.product_repository import ProductRepository
+from ..core.catalog_cache import catalog_cache
+from ..core.etag import etag_guard
 
-router = APIRouter()
+router = APIRouter(dependencies=[etag_guard("catalog", exclude=["get_catalog_cache_stats"])])
 
 @router.get("", response_model=List[ProductWithCategory])
 def get_products(
@@ -24,6 +26,11 @@ def get_products(
     repo = ProductRepository(conn)
     return repo.get_all(category_id, available_only)
 
+@router.get("/cache/stats")
+def get_catalog_cache_stats(usuario = Depends(verificar_rol("admin"))):
+    """Estadísticas de la caché del catálogo de este worker (hits, misses, invalidaciones)"""
+    return catalog_cache.get_stats()
+
 @router.get("/{product_id}", response_model=ProductWithCategory)
 def get_product(product_id: int, conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener producto por ID"""
@@ -47,6 +54,7 @@ def create_product(product: ProductCreate, conn = Depends(get_db), usuario = Dep
     try:
         new_product = repo.create(product)
         conn.commit()
+        catalog_cache.invalidate()
         return new_product
     
     except Exception as e:
@@ -75,6 +83,7 @@ def update_product(product_id: int, product: ProductUpdate, conn = Depends(get_d
             raise HTTPException(status_code=400, detail="No hay campos para actualizar")
         
         conn.commit()
+        catalog_cache.invalidate()
         return updated_product
     
     except HTTPException:
@@ -93,4 +102,5 @@ def delete_product(product_id: int, conn = Depends(get_db), usuario = Depends(ve
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
     conn.commit()
+    catalog_cache.invalidate()
     return {"message": "Producto desactivado correctamente", "id": product_id}
\ No newline at end of file
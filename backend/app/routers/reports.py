@@ -1,150 +1,384 @@
 """
 Router para reportes y analytics
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
+import logging
+import time
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from psycopg2.pool import PoolError
 from ..security import verificar_rol
-from typing import Optional
-from datetime import date
+from typing import List, Literal, Optional
+from datetime import date, timedelta
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, get_read_db, pooled_read_connection, read_staleness
+from ..core import business_day
+from ..core.report_cache import notify_reports_changed, report_cache
+from ..services.order_export import MEDIA_TYPES, stream_orders_export
+from ..services import sales_cube as cube
+from ..services import demand_forecast, prep_time
+from ..repositories.cash_repository import CashRepository
+from ..repositories.report_repository import ReportRepository, PERIOD_EXPRESSIONS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/daily-sales")
-def get_daily_sales(report_date: Optional[date] = None, conn = Depends(get_db), usuario = Depends(verificar_rol("admin", "manager"))):
-    """Reporte de ventas diarias. Requiere rol admin o manager."""
-    cursor = conn.cursor()
+# Columnas de cada fila de /prep-times según group_by
+PREP_TIME_KEYS = {"order_type": ["order_type"], "hour": ["hour"], "product": ["product_id", "product_name"]}
 
-    if not report_date:
-        report_date = date.today()
-
-    cursor.execute(
-        """SELECT
-            COUNT(CASE WHEN status <> 'cancelled' THEN 1 END) as total_orders,
-            COALESCE(SUM(CASE WHEN status <> 'cancelled' THEN total ELSE 0 END), 0) as total_sales,
-            COALESCE(AVG(CASE WHEN status <> 'cancelled' THEN total ELSE NULL END), 0) as average_ticket,
-            COALESCE(SUM(CASE WHEN status <> 'cancelled' THEN tax ELSE 0 END), 0) as total_tax,
-            COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_orders,
-            COUNT(CASE WHEN status = 'cancelled' THEN 1 END) as cancelled_orders
-           FROM orders
-           WHERE DATE(created_at) = %s""",
-        (report_date,)
+# Conexiones ocupadas a la vez por las secciones de todos los dashboards de
+# este worker: el pool psycopg2 no espera (PoolError si se agota)
+dashboard_slots = asyncio.Semaphore(settings.DASHBOARD_MAX_CONNECTIONS)
+
+
+# Cuerpos de los reportes, compartidos por sus endpoints y el dashboard
+def _daily_sales(conn, report_date: date) -> dict:
+    def compute():
+        summary, by_type = ReportRepository(conn).get_daily_sales(report_date)
+        return {
+            "date": report_date,
+            "summary": summary,
+            "by_order_type": by_type
+        }
+
+    return report_cache.get_or_compute(
+        "daily-sales", {"report_date": report_date}, report_date, report_date, compute,
+        staleness=read_staleness(conn)
     )
-    result = cursor.fetchone()
-
-    # Obtener ventas por tipo de orden
-    cursor.execute(
-        """SELECT order_type, COUNT(*) as count, COALESCE(SUM(total), 0) as total
-           FROM orders
-           WHERE DATE(created_at) = %s AND status <> 'cancelled'
-           GROUP BY order_type""",
-        (report_date,)
+
+def _top_products(conn, date_from: Optional[date], date_to: Optional[date], limit: int) -> dict:
+    def compute():
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "top_products": ReportRepository(conn).get_top_products(date_from, date_to, limit)
+        }
+
+    return report_cache.get_or_compute(
+        "top-products", {"date_from": date_from, "date_to": date_to, "limit": limit},
+        date_from, date_to, compute, staleness=read_staleness(conn)
     )
-    by_type = cursor.fetchall()
 
-    return {
-        "date": report_date,
-        "summary": dict(result),
-        "by_order_type": [dict(row) for row in by_type]
-    }
+def _revenue_by_period(conn, date_from: date, date_to: date, group_by: str) -> dict:
+    def compute():
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "group_by": group_by,
+            "data": ReportRepository(conn).get_revenue_by_period(date_from, date_to, group_by)
+        }
+
+    return report_cache.get_or_compute(
+        "revenue-by-period", {"date_from": date_from, "date_to": date_to, "group_by": group_by},
+        date_from, date_to, compute, staleness=read_staleness(conn)
+    )
+
+@router.get("/daily-sales")
+def get_daily_sales(report_date: Optional[date] = None, conn = Depends(get_read_db), usuario = Depends(verificar_rol("admin", "manager"))):
+    """Reporte de ventas diarias. Requiere rol admin o manager."""
+    if not report_date:
+        report_date = business_day.today()
+
+    return _daily_sales(conn, report_date)
 
 @router.get("/top-products")
 def get_top_products(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     limit: int = Query(default=10, ge=1, le=100),
-    conn = Depends(get_db),
+    conn = Depends(get_read_db),
     usuario = Depends(verificar_rol("admin", "manager"))
 ):
     """Reporte de productos mas vendidos. Requiere rol admin o manager."""
     if date_from and date_to and date_from > date_to:
         raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
-    cursor = conn.cursor()
-
-    query = """
-        SELECT
-            p.id,
-            p.name,
-            c.name as category,
-            COUNT(oi.id) as times_ordered,
-            SUM(oi.quantity) as total_quantity,
-            SUM(oi.subtotal) as total_revenue
-        FROM order_items oi
-        JOIN products p ON oi.product_id = p.id
-        JOIN categories c ON p.category_id = c.id
-        JOIN orders o ON oi.order_id = o.id
-        WHERE o.status <> 'cancelled'
+
+    return _top_products(conn, date_from, date_to, limit)
+
+@router.get("/revenue-by-period")
+def get_revenue_by_period(
+    date_from: date,
+    date_to: date,
+    group_by: str = "day",  # 'day', 'week', 'month'
+    conn = Depends(get_read_db),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """Reporte de ingresos por periodo. Requiere rol admin o manager."""
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
+
+    if group_by not in PERIOD_EXPRESSIONS:
+        raise HTTPException(status_code=400, detail="group_by debe ser: day, week, o month")
+
+    return _revenue_by_period(conn, date_from, date_to, group_by)
+
+@router.get("/heatmap")
+def get_heatmap(
+    date_from: date,
+    date_to: date,
+    by_order_type: bool = False,
+    conn = Depends(get_read_db),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """
+    Órdenes completadas e ingresos por día de la semana (1 = lunes) y hora local,
+    de los días de negocio date_from..date_to. Requiere rol admin o manager.
+
+    Sale del rollup por hora (sales_hourly), no de orders: un año responde en
+    milisegundos. days_per_weekday permite calcular medias por turno.
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
+
+    def compute():
+        days_per_weekday = {weekday: 0 for weekday in range(1, 8)}
+        day = date_from
+        while day <= date_to and day < date_from + timedelta(days=7):
+            days_per_weekday[day.isoweekday()] = ((date_to - day).days // 7) + 1
+            day += timedelta(days=1)
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "by_order_type": by_order_type,
+            "days_per_weekday": days_per_weekday,
+            "cells": ReportRepository(conn).get_heatmap(date_from, date_to, by_order_type)
+        }
+
+    return report_cache.get_or_compute(
+        "heatmap", {"date_from": date_from, "date_to": date_to, "by_order_type": by_order_type},
+        date_from, date_to, compute, staleness=read_staleness(conn)
+    )
+
+@router.get("/prep-times")
+def get_prep_times(
+    date_from: date,
+    date_to: date,
+    group_by: Literal["order_type", "hour", "product"] = "order_type",
+    conn = Depends(get_read_db),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """
+    Tiempos de preparación (creación -> lista) p50/p90/p99 en segundos, por tipo
+    de orden, hora local o producto, de los días de negocio date_from..date_to.
+    Requiere rol admin o manager.
+
+    Sale de los histogramas de la migración 011 (ver services.prep_time): los
+    percentiles tienen un error de ~5% y el rango no cambia el coste.
     """
-    params = []
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
 
-    if date_from:
-        query += " AND DATE(o.created_at) >= %s"
-        params.append(date_from)
+    def compute():
+        repository = ReportRepository(conn)
+        totals = prep_time.summarize(repository.get_prep_time_buckets(date_from, date_to, "total"), [])
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "group_by": group_by,
+            "overall": totals[0] if totals else prep_time.percentiles([]),
+            "rows": prep_time.summarize(
+                repository.get_prep_time_buckets(date_from, date_to, group_by), PREP_TIME_KEYS[group_by]
+            ),
+        }
 
-    if date_to:
-        query += " AND DATE(o.created_at) <= %s"
-        params.append(date_to)
+    return report_cache.get_or_compute(
+        "prep-times", {"date_from": date_from, "date_to": date_to, "group_by": group_by},
+        date_from, date_to, compute, staleness=read_staleness(conn)
+    )
 
-    query += """
-        GROUP BY p.id, p.name, c.name
-        ORDER BY total_quantity DESC
-        LIMIT %s
+@router.get("/forecast")
+def get_forecast(
+    date_from: Optional[date] = None,
+    days: int = Query(default=1, ge=1, le=31),
+    product_id: Optional[int] = None,
+    conn = Depends(get_read_db),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
     """
-    params.append(limit)
+    Previsión de órdenes por hora y de cantidad por hora y producto para los días
+    de negocio date_from (por defecto hoy) .. date_from + days - 1. Requiere rol admin o manager.
 
-    cursor.execute(query, params)
-    products = cursor.fetchall()
+    Solo lee lo que guarda el job de previsión (ver services.demand_forecast).
+    """
+    if not date_from:
+        date_from = business_day.today()
+    date_to = date_from + timedelta(days=days - 1)
 
+    hourly, products = ReportRepository(conn).get_forecast(date_from, date_to, product_id)
     return {
         "date_from": date_from,
         "date_to": date_to,
-        "top_products": [dict(row) for row in products]
+        "generated_at": max((row["generated_at"] for row in hourly), default=None),
+        "hourly": [{k: v for k, v in row.items() if k != "generated_at"} for row in hourly],
+        "products": products,
     }
 
-@router.get("/revenue-by-period")
-def get_revenue_by_period(
-    date_from: date,
-    date_to: date,
-    group_by: str = "day",  # 'day', 'week', 'month'
-    conn = Depends(get_db),
+@router.post("/forecast/run")
+def run_forecast(conn = Depends(get_db), usuario = Depends(verificar_rol("admin"))):
+    """Recalcular la previsión ahora, sin esperar al job. Requiere rol admin."""
+    try:
+        result = demand_forecast.run(conn)
+    except Exception as e:
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
+    if result is None:
+        raise HTTPException(status_code=409, detail="La previsión ya se está calculando")
+    return result
+
+@router.get("/cube")
+def query_sales_cube(
+    group_by: List[str] = Query(default=[]),
+    filter: List[str] = Query(default=[]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
     usuario = Depends(verificar_rol("admin", "manager"))
 ):
-    """Reporte de ingresos por periodo. Requiere rol admin o manager."""
-    if date_from > date_to:
+    """
+    Agregación libre de líneas de órdenes completadas desde el cubo en memoria.
+    Requiere rol admin o manager.
+
+    - group_by: dimensiones (repetido o separado por comas): date, month, weekday,
+      hour, order_type, product_id, category_id, user_id
+    - filter: "dimensión:v1,v2" o "dimensión:desde..hasta" (repetible, se combinan con AND)
+    - order_by: orders, lines, quantity o revenue (descendente); por defecto, las dimensiones
+
+    No consulta la base: el cubo se refresca en segundo plano (ver services.sales_cube).
+    """
+    data = cube.sales_cube.data
+    if data is None:
+        raise HTTPException(status_code=503, detail="El cubo de ventas aún se está cargando")
+    if date_from and date_to and date_from > date_to:
         raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
 
-    cursor = conn.cursor()
+    dimensions = [name.strip() for value in group_by for name in value.split(",") if name.strip()]
+    filters = list(filter)
+    if date_from or date_to:
+        filters.append(f"date:{date_from or ''}..{date_to or ''}")
 
-    GROUP_BY_EXPRESSIONS = {
-        "day":   "DATE(created_at)",
-        "week":  "DATE_TRUNC('week', created_at)",
-        "month": "DATE_TRUNC('month', created_at)",
+    start = time.perf_counter()
+    try:
+        result = cube.query(data, dimensions, filters, order_by, limit)
+    except cube.CubeQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "group_by": dimensions,
+        "filters": filters,
+        **result,
+        "loaded_at": data.loaded_at,
+        "query_ms": round((time.perf_counter() - start) * 1000, 2),
     }
 
-    if group_by not in GROUP_BY_EXPRESSIONS:
-        raise HTTPException(status_code=400, detail="group_by debe ser: day, week, o month")
+@router.get("/cube/stats")
+def get_sales_cube_stats(usuario = Depends(verificar_rol("admin"))):
+    """Estado del cubo de ventas de este worker (filas, memoria, cargas)"""
+    return cube.sales_cube.get_stats()
 
-    date_expr = GROUP_BY_EXPRESSIONS[group_by]
+@router.get("/dashboard")
+async def get_dashboard(
+    response: Response,
+    report_date: Optional[date] = None,
+    top_limit: int = Query(default=5, ge=1, le=100),
+    revenue_days: int = Query(default=7, ge=1, le=366),
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """
+    Ventas del día, productos más vendidos del día, ingresos diarios de los
+    últimos revenue_days días y sesión de caja activa, en una sola llamada.
+    Requiere rol admin o manager.
+
+    Cada sección corre en el threadpool con su propia conexión (de la réplica
+    si la hay), en paralelo: el tiempo total es el de la sección más lenta, no la suma.
+    Entre todos los dashboards del worker ocupan como mucho
+    DASHBOARD_MAX_CONNECTIONS conexiones; las demás secciones esperan turno.
+    Si aun así el pool está agotado responde 503.
+    Los tiempos por sección van en timings_ms y en Server-Timing.
+    """
+    if not report_date:
+        report_date = business_day.today()
+    revenue_from = report_date - timedelta(days=revenue_days - 1)
 
-    query = """
-        SELECT
-            {date_expr} as period,
-            COUNT(*) as orders_count,
-            SUM(total) as total_revenue,
-            AVG(total) as average_ticket
-        FROM orders
-        WHERE status = 'completed'
-        AND DATE(created_at) BETWEEN %s AND %s
-        GROUP BY period
-        ORDER BY period
-    """.replace("{date_expr}", date_expr)
+    def run(fn, *args):
+        start = time.perf_counter()
+        with pooled_read_connection() as conn:
+            result = fn(conn, *args)
+        return result, (time.perf_counter() - start) * 1000
 
-    cursor.execute(query, (date_from, date_to))
-    results = cursor.fetchall()
+    async def section(fn, *args):
+        async with dashboard_slots:
+            return await run_in_threadpool(run, fn, *args)
 
+    sections = {
+        "daily_sales": section(_daily_sales, report_date),
+        "top_products": section(_top_products, report_date, report_date, top_limit),
+        "revenue": section(_revenue_by_period, revenue_from, report_date, "day"),
+        "cash_session": section(lambda conn: CashRepository(conn).get_active_session()),
+    }
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*sections.values())
+    except PoolError:
+        logger.warning("⚠️ Dashboard: pool de conexiones agotado")
+        raise HTTPException(status_code=503, detail="Base de datos ocupada, reintenta en unos segundos")
+    except Exception as e:
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
+
+    timings = {name: round(ms, 2) for name, (_, ms) in zip(sections, results)}
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
     return {
-        "date_from": date_from,
-        "date_to": date_to,
-        "group_by": group_by,
-        "data": [dict(row) for row in results]
+        "date": report_date,
+        **{name: result for name, (result, _) in zip(sections, results)},
+        "timings_ms": timings,
     }
+
+@router.get("/cache/stats")
+def get_report_cache_stats(usuario = Depends(verificar_rol("admin"))):
+    """Estadísticas de la caché de reportes de este worker (hits, misses, invalidaciones)"""
+    return report_cache.get_stats()
+
+@router.delete("/cache")
+def purge_report_cache(conn = Depends(get_db), usuario = Depends(verificar_rol("admin"))):
+    """
+    Vaciar la caché de reportes en todos los workers. Requiere rol admin.
+
+    Necesario solo si se corrigen datos a mano con los triggers deshabilitados;
+    los cambios normales de órdenes ya invalidan sus días.
+    """
+    try:
+        notify_reports_changed(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error("Error interno: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Error procesando la solicitud")
+    report_cache.invalidate()
+    return {"message": "Caché de reportes vaciada"}
+
+@router.get("/export")
+def export_orders(
+    date_from: date,
+    date_to: date,
+    format: Literal["csv", "ndjson"] = "csv",
+    usuario = Depends(verificar_rol("admin", "manager"))
+):
+    """
+    Exportar órdenes y líneas de los días de negocio date_from..date_to. Requiere rol admin o manager.
+
+    Se transmite en trozos desde un cursor de servidor: la memoria no crece con el rango.
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from no puede ser posterior a date_to")
+
+    start, end = business_day.range_bounds(date_from, date_to)
+    filename = f"orders_{date_from}_{date_to}.{format}"
+    return StreamingResponse(
+        stream_orders_export(format, start, end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
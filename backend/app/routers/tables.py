@@ -7,23 +7,32 @@ import psycopg2
 
 from ..database import get_db
 from ..models.table import Table, TableCreate, ActiveOrderInfo
+from ..core.etag import etag_guard, notify_resources_changed
 
-router = APIRouter()
+# time_elapsed ("12 Mins") cambia cada minuto sin que cambie ningún dato
+router = APIRouter(dependencies=[etag_guard("tables", "orders", per_minute=True)])
 
 @router.get("", response_model=List[Table])
 def get_tables(conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)):
     """Obtener todas las mesas con informacion de ocupacion"""
     cursor = conn.cursor()
 
-    # Query join tables with their ACTIVE order (not completed/cancelled)
-    # Seleccionamos la orden mas reciente que este activa para esa mesa
+    # Orden activa (no completada/cancelada) más reciente de cada mesa: la
+    # subconsulta LATERAL usa el índice parcial de órdenes activas
+    # (idx_orders_active_table), así que no recorre el historial.
     query = """
         SELECT
             t.id, t.table_number, t.is_occupied, t.x, t.y,
             o.id as order_id, o.customer_name, o.total, o.created_at as order_created_at
         FROM tables t
-        LEFT JOIN orders o ON o.table_id = t.id
-             AND o.status NOT IN ('completed', 'cancelled')
+        LEFT JOIN LATERAL (
+            SELECT o.id, o.customer_name, o.total, o.created_at
+            FROM orders o
+            WHERE o.table_id = t.id
+              AND o.status NOT IN ('completed', 'cancelled')
+            ORDER BY o.created_at DESC
+            LIMIT 1
+        ) o ON TRUE
         ORDER BY t.table_number
     """
     cursor.execute(query)
@@ -59,11 +68,7 @@ def get_tables(conn = Depends(get_db), usuario = Depends(obtener_usuario_actual)
             active_order=active_order
         ))
 
-    # Remove duplicates if any (due to join) - simplified approach
-    # Ideally use DISTINCT ON or group by
-    unique_tables = {t.id: t for t in tables_result}.values()
-
-    return list(unique_tables)
+    return tables_result
 
 @router.post("", response_model=Table, status_code=status.HTTP_201_CREATED)
 def create_table(table: TableCreate, conn = Depends(get_db), usuario = Depends(verificar_rol("admin"))):
@@ -75,6 +80,7 @@ def create_table(table: TableCreate, conn = Depends(get_db), usuario = Depends(v
             (table.table_number, table.is_occupied)
         )
         new_row = cursor.fetchone()
+        notify_resources_changed(conn, "tables")
         conn.commit()
         return Table(id=new_row['id'], table_number=new_row['table_number'], is_occupied=new_row['is_occupied'])
     except psycopg2.IntegrityError:
@@ -94,6 +100,7 @@ def update_table_status(table_id: int, is_occupied: bool, conn = Depends(get_db)
     if not updated_table:
         raise HTTPException(status_code=404, detail="Mesa no encontrada")
 
+    notify_resources_changed(conn, "tables")
     conn.commit()
     return Table(id=updated_table['id'], table_number=updated_table['table_number'], is_occupied=updated_table['is_occupied'])
 
@@ -118,6 +125,7 @@ def update_table_position(
     if not updated_table:
         raise HTTPException(status_code=404, detail="Mesa no encontrada")
 
+    notify_resources_changed(conn, "tables")
     conn.commit()
     return Table(
         id=updated_table['id'],
@@ -7,11 +7,12 @@ from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
 from typing import Annotated
 
 from .config import settings
-from .database import get_db
+from .database import async_connection
 
 # CONFIGURACIÓN
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -135,8 +136,7 @@ def decodificar_token(token: str) -> Dict[str, Any]:
 # ============================================
 
 async def obtener_usuario_actual(
-    token: Annotated[str, Depends(security)],
-    conn = Depends(get_db)
+    token: Annotated[str, Depends(security)]
 ):
     """
     Dependency para obtener el usuario autenticado actual
@@ -145,6 +145,11 @@ async def obtener_usuario_actual(
         async def mi_ruta(usuario = Depends(obtener_usuario_actual)):
             # usuario contiene los datos del usuario autenticado
     
+    La conexión async se toma solo para buscar al usuario y se devuelve
+    enseguida: si fuera una dependencia (get_async_db) quedaría ocupada
+    durante todo el request, también en las rutas síncronas que usan su
+    propia conexión psycopg2.
+    
     Returns:
         Dict con datos del usuario autenticado
     
@@ -173,8 +178,8 @@ async def obtener_usuario_actual(
     
     # Buscar usuario en base de datos
     from .repositories.user_repository import UserRepository
-    repo = UserRepository(conn)
-    usuario = repo.get_by_id(usuario_id)
+    async with async_connection() as conn:
+        usuario = await UserRepository(conn).get_by_id(usuario_id)
     
     if not usuario:
         raise HTTPException(
@@ -210,7 +215,8 @@ def verificar_rol(*roles_permitidos: str):
         *roles_permitidos: Roles que tienen permiso para acceder
     
     Returns:
-        Dependency function que valida el rol
+        Dependency function que valida el rol. Lleva los roles en
+        `roles_permitidos`: etag_guard la llama antes de responder un 304.
     """
     async def verificador(usuario = Depends(obtener_usuario_actual)):
         rol_usuario = usuario.get('role', '')
@@ -220,18 +226,19 @@ def verificar_rol(*roles_permitidos: str):
                 detail=f"Acceso denegado. Se requiere uno de estos roles: {', '.join(roles_permitidos)}"
             )
         return usuario
+    verificador.roles_permitidos = roles_permitidos
     return verificador
 
 # ============================================
 # FUNCIONES HELPER
 # ============================================
 
-def autenticar_usuario(conn, username_or_email: str, password: str) -> Optional[dict]:
+async def autenticar_usuario(conn, username_or_email: str, password: str) -> Optional[dict]:
     """
     Autenticar usuario por username o email
     
     Args:
-        conn: Conexión a base de datos
+        conn: Conexión async a base de datos (get_async_db)
         username_or_email: Username o email del usuario
         password: Password en texto plano
     
@@ -242,14 +249,15 @@ def autenticar_usuario(conn, username_or_email: str, password: str) -> Optional[
     repo = UserRepository(conn)
     
     # Intentar buscar por username primero
-    usuario = repo.get_by_username(username_or_email)
+    usuario = await repo.get_by_username(username_or_email)
     
     # Si no se encuentra, intentar por email
     if not usuario:
-        usuario = repo.get_by_email(username_or_email)
+        usuario = await repo.get_by_email(username_or_email)
     
-    # Si no existe el usuario o la contraseña es incorrecta
-    if not usuario or not verificar_password(password, usuario['hashed_password']):
+    # Si no existe el usuario o la contraseña es incorrecta.
+    # bcrypt es CPU intensivo: se verifica en el threadpool para no bloquear el event loop
+    if not usuario or not await run_in_threadpool(verificar_password, password, usuario['hashed_password']):
         return None
     
     # Verificar que el usuario esté activo
@@ -257,7 +265,7 @@ def autenticar_usuario(conn, username_or_email: str, password: str) -> Optional[
         return None
     
     # Actualizar último acceso
-    repo.update_last_login(usuario['id'])
+    await repo.update_last_login(usuario['id'])
     
     return usuario
 
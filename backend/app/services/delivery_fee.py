@@ -0,0 +1,37 @@
+"""
+Tarifa de envío según la distancia de la tienda al cliente.
+
+No hace consultas ni llamadas externas: la usan el cálculo de precios de las
+órdenes (services.order_pricing) y el router de geocoding.
+"""
+import math
+
+# Configuración de Costos de Delivery
+STORE_LATITUDE = 53.7145
+STORE_LONGITUDE = -6.3503
+BASE_DELIVERY_FEE = 3.00
+RATE_PER_KM = 1.00
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calcula la distancia en kilómetros entre dos coordenadas"""
+    R = 6371.0  # Radio de la Tierra en km
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+def calculate_delivery_fee(destination_lat: float, destination_lon: float) -> float:
+    """Calcula la tarifa de delivery según la distancia a la tienda."""
+    if not destination_lat or not destination_lon:
+        return BASE_DELIVERY_FEE  # Tarifa base si no hay coordenadas
+
+    distance_km = haversine_distance(STORE_LATITUDE, STORE_LONGITUDE, destination_lat, destination_lon)
+    
+    # Ejemplo de regla de negocio:
+    # 3.00 base por los primeros 2 km, + 1.00 por cada km adicional
+    if distance_km <= 2.0:
+        return BASE_DELIVERY_FEE
+    else:
+        extra_km = distance_km - 2.0
+        return round(BASE_DELIVERY_FEE + (extra_km * RATE_PER_KM), 2)
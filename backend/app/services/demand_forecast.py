@@ -0,0 +1,223 @@
+"""
+Demand forecast per hour and product (migration 010, GET /api/reports/forecast).
+
+For each of the next FORECAST_DAYS business days the forecast is a seasonal
+EWMA: the value of the same weekday and local hour in each of the last
+FORECAST_HISTORY_WEEKS complete weeks, weighted ALPHA * (1 - ALPHA)^age
+(age 0 = last week) and normalized. Weeks without sales count as zero.
+
+The history is loaded as two aggregated queries (orders per hour from the
+sales_hourly rollup, quantity per hour and product from orders/order_items)
+into NumPy arrays shaped (weeks, 7, 24[, products]); the whole forecast is
+one tensordot over the weeks axis.
+
+A background task in every worker wakes up every FORECAST_REFRESH_MINUTES.
+Only one worker computes (transaction-level advisory lock) and only if the
+stored forecast is older than the interval, so the workers don't repeat the
+job. Each run replaces the rows from the current business day onwards in one
+transaction; the request path only reads the tables. Run it by hand with
+
+    python -m app.services.demand_forecast
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+import psycopg2.extensions
+
+from ..config import settings
+from ..core import business_day
+from ..database import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+ALPHA = 0.3
+MIN_QUANTITY = 0.05  # por debajo no se guarda (ruido)
+
+# Clave de pg_try_advisory_xact_lock: un solo worker calcula a la vez
+LOCK_KEY = 0x464F5245  # "FORE"
+
+HOURLY_HISTORY_SQL = """
+    SELECT business_date - %(start)s, hour, SUM(orders_count)
+    FROM sales_hourly
+    WHERE business_date BETWEEN %(start)s AND %(end)s
+    GROUP BY 1, 2
+"""
+
+PRODUCTS_HISTORY_SQL = """
+    SELECT o.business_date - %(start)s, order_local_hour(o.created_at), oi.product_id, SUM(oi.quantity)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.status = 'completed'
+      AND o.business_date BETWEEN %(start)s AND %(end)s
+      AND oi.product_id IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+LAST_RUN_SQL = "SELECT MAX(generated_at) FROM demand_forecast_hourly WHERE business_date >= %s"
+
+DELETE_FROM_SQL = "DELETE FROM {table} WHERE business_date >= %s"
+
+INSERT_HOURLY_SQL = """
+    INSERT INTO demand_forecast_hourly (business_date, hour, expected_orders, generated_at)
+    SELECT d, h, v, %s FROM unnest(%s::date[], %s::smallint[], %s::numeric[]) AS t(d, h, v)
+"""
+
+INSERT_PRODUCTS_SQL = """
+    INSERT INTO demand_forecast_products (business_date, hour, product_id, expected_quantity, generated_at)
+    SELECT d, h, p, v, %s FROM unnest(%s::date[], %s::smallint[], %s::int[], %s::numeric[]) AS t(d, h, p, v)
+"""
+
+
+def seasonal_ewma(history: np.ndarray, alpha: float = ALPHA) -> np.ndarray:
+    """(weeks, 7, ...) oldest week first -> (7, ...) weighted towards recent weeks."""
+    weeks = history.shape[0]
+    weights = alpha * (1 - alpha) ** np.arange(weeks - 1, -1, -1, dtype=np.float64)
+    return np.tensordot(weights / weights.sum(), history, axes=(0, 0))
+
+
+def _history(cursor, query: str, start: date, end: date, columns: int) -> np.ndarray:
+    cursor.execute(query, {"start": start, "end": end})
+    return np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, columns)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def compute(cursor, today: date, weeks: int, days: int) -> tuple[list, list]:
+    """
+    Forecast rows for business days today..today+days-1:
+    ([(date, hour, expected_orders)], [(date, hour, product_id, expected_quantity)]).
+    """
+    # Semanas completas que terminan ayer; el slot de un día es (día - start) % 7
+    start = today - timedelta(days=weeks * 7)
+    end = today - timedelta(days=1)
+
+    hourly = _history(cursor, HOURLY_HISTORY_SQL, start, end, 3)
+    orders = np.zeros((weeks * 7, 24))
+    np.add.at(orders, (hourly[:, 0], hourly[:, 1]), hourly[:, 2])
+    orders_forecast = seasonal_ewma(orders.reshape(weeks, 7, 24))
+
+    products = _history(cursor, PRODUCTS_HISTORY_SQL, start, end, 4)
+    product_ids, product_index = np.unique(products[:, 2], return_inverse=True)
+    quantity = np.zeros((weeks * 7, 24, len(product_ids)))
+    np.add.at(quantity, (products[:, 0], products[:, 1], product_index), products[:, 3])
+    quantity_forecast = seasonal_ewma(quantity.reshape(weeks, 7, 24, len(product_ids)))
+
+    hourly_rows, product_rows = [], []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        slot = (day - start).days % 7
+        for hour in range(24):
+            hourly_rows.append((day, hour, round(float(orders_forecast[slot, hour]), 2)))
+        hours, columns = np.nonzero(quantity_forecast[slot] >= MIN_QUANTITY)
+        for hour, column in zip(hours, columns):
+            product_rows.append((day, int(hour), int(product_ids[column]), round(float(quantity_forecast[slot, hour, column]), 2)))
+    return hourly_rows, product_rows
+
+
+def run(conn, today: Optional[date] = None, weeks: Optional[int] = None, days: Optional[int] = None,
+        min_age: Optional[timedelta] = None) -> Optional[dict]:
+    """
+    Compute and store the forecast, then commit. Returns row counts, or None
+    if another worker holds the lock or the stored forecast is newer than min_age.
+    """
+    today = today or business_day.today()
+    weeks = weeks or settings.FORECAST_HISTORY_WEEKS
+    days = days or settings.FORECAST_DAYS
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_KEY,))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return None
+        if min_age is not None:
+            cursor.execute(LAST_RUN_SQL, (today,))
+            last_run = cursor.fetchone()[0]
+            if last_run is not None and _utcnow() - last_run < min_age:
+                conn.rollback()
+                return None
+
+        hourly_rows, product_rows = compute(cursor, today, weeks, days)
+        generated_at = _utcnow()
+        for table in ("demand_forecast_hourly", "demand_forecast_products"):
+            cursor.execute(DELETE_FROM_SQL.format(table=table), (today,))
+        cursor.execute(INSERT_HOURLY_SQL, (generated_at, *map(list, zip(*hourly_rows))))
+        if product_rows:
+            cursor.execute(INSERT_PRODUCTS_SQL, (generated_at, *map(list, zip(*product_rows))))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"hourly": len(hourly_rows), "products": len(product_rows), "generated_at": generated_at}
+
+
+class DemandForecastJob:
+    """Periodic run() in a thread, started from the lifespan."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def _run_once(self) -> Optional[dict]:
+        interval = timedelta(minutes=settings.FORECAST_REFRESH_MINUTES)
+        with pooled_connection() as conn:
+            # Margen para que el worker que calculó no se salte su propio turno
+            return run(conn, min_age=interval * 0.9)
+
+    async def _loop(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self._run_once)
+                if result:
+                    logger.info("📈 Previsión de demanda: %d filas por hora, %d por producto",
+                                result["hourly"], result["products"])
+            except Exception as e:
+                logger.error("Error calculando la previsión de demanda: %s", e, exc_info=True)
+            await asyncio.sleep(settings.FORECAST_REFRESH_MINUTES * 60)
+
+    async def start(self):
+        if not settings.FORECAST_ENABLED:
+            logger.warning("⚠️ Previsión de demanda deshabilitada (FORECAST_ENABLED=false)")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="demand-forecast")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+demand_forecast_job = DemandForecastJob()
+
+
+def main(argv=None):
+    import argparse
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description="Compute and store the demand forecast")
+    parser.add_argument("--weeks", type=int, help="Weeks of history (default FORECAST_HISTORY_WEEKS)")
+    parser.add_argument("--days", type=int, help="Days to forecast (default FORECAST_DAYS)")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(settings.DATABASE_URL)
+    try:
+        result = run(conn, weeks=args.weeks, days=args.days)
+    finally:
+        conn.close()
+    if result is None:
+        print("⏳ Another worker is computing the forecast")
+    else:
+        print(f"✅ Forecast stored: {result['hourly']} hourly rows, {result['products']} product rows")
+
+
+if __name__ == "__main__":
+    main()
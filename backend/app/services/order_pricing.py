@@ -0,0 +1,111 @@
+"""
+Cálculo de precios de items de orden a partir del catálogo ya cargado.
+
+No hace consultas: recibe los productos y modificadores indexados por id
+(ver OrderRepository.get_products_by_ids / get_active_modifiers_by_ids) y
+devuelve los items listos para insertar, con los mismos errores de validación
+que el flujo original producto a producto.
+"""
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..config import settings
+from .delivery_fee import calculate_delivery_fee
+
+# Tarifa de envío cuando el cliente no tiene coordenadas (o no hay cliente)
+DEFAULT_DELIVERY_FEE = Decimal("3.00")
+
+
+def collect_catalog_ids(items: Iterable) -> Tuple[List[int], List[int]]:
+    """Ids únicos de productos y modificadores referenciados por los items."""
+    product_ids = set()
+    modifier_ids = set()
+    for item in items:
+        product_ids.add(item.product_id)
+        if item.modifier_ids:
+            modifier_ids.update(item.modifier_ids)
+    return sorted(product_ids), sorted(modifier_ids)
+
+
+def price_items(items: Iterable, products: dict, modifiers: dict) -> Tuple[List[dict], Decimal]:
+    """
+    Validar y calcular precios de los items (modelo Tax-Inclusive).
+
+    Args:
+        items: Lista de OrderItemCreate
+        products: {product_id: fila de products}
+        modifiers: {modifier_id: fila de modifiers activos}
+
+    Returns:
+        (items con precios, total de los items)
+
+    Raises:
+        HTTPException: 404 si un producto no existe, 400 si no está disponible
+    """
+    total = Decimal("0.00")
+    priced_items = []
+
+    for item in items:
+        product = products.get(item.product_id)
+
+        if not product:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Producto {item.product_id} no encontrado"
+            )
+
+        if not product['is_available']:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Producto {product['name']} no está disponible"
+            )
+
+        # Los modificadores inexistentes o inactivos se ignoran, como antes
+        modifiers_total = Decimal("0.00")
+        item_modifiers_data = []
+        for mod_id in item.modifier_ids or []:
+            mod = modifiers.get(mod_id)
+            if mod:
+                modifiers_total += Decimal(str(mod['price']))
+                item_modifiers_data.append(mod)
+
+        # En modelo Tax-Inclusive, el precio del producto es el precio final
+        unit_price = Decimal(str(product['price'])) + modifiers_total
+        item_total = unit_price * item.quantity
+        total += item_total
+
+        priced_items.append({
+            'product_id': product['id'],
+            'quantity': item.quantity,
+            'unit_price': unit_price,
+            'subtotal': item_total,
+            'special_instructions': item.special_instructions,
+            'modifiers': item_modifiers_data
+        })
+
+    return priced_items, total
+
+
+def split_tax_inclusive(total: Decimal) -> Tuple[Decimal, Decimal]:
+    """(subtotal, impuesto) de un total con impuestos incluidos: Total = Subtotal * (1 + TAX_RATE)"""
+    tax_multiplier = Decimal(str(1 + settings.TAX_RATE))
+    subtotal = total / tax_multiplier
+    return subtotal, total - subtotal
+
+
+def delivery_fee_for(order_type: str, coords: Optional[dict]) -> Decimal:
+    """
+    Tarifa de envío de una orden.
+
+    Args:
+        order_type: Tipo de orden; solo "delivery" paga envío
+        coords: Fila del cliente con latitude/longitude, o None sin cliente
+    """
+    if order_type != "delivery":
+        return Decimal("0.00")
+    if coords and coords['latitude'] and coords['longitude']:
+        fee = calculate_delivery_fee(float(coords['latitude']), float(coords['longitude']))
+        return Decimal(str(fee))
+    return DEFAULT_DELIVERY_FEE
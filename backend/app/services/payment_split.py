@@ -0,0 +1,82 @@
+"""
+Reparto de los pagos parciales de una cuenta dividida entre sus órdenes.
+
+No hace consultas: recibe los pagos del lote (PaymentCreate) y el saldo de
+cada orden (ver CashRepository.lock_order_balances) y devuelve los pagos
+listos para insertar y el saldo final de cada orden.
+
+Cada pago cubre lo que entrega (efectivo + tarjeta) hasta el saldo
+pendiente de su orden; total_amount es esa parte de la venta, como en
+POST /cash/payments. Lo que sobra es cambio y solo puede salir del efectivo
+(POST /cash/payments, como siempre, lo acepta también de la tarjeta).
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException
+
+CENTS = Decimal("0.01")
+
+
+def allocate_payments(
+    payments: Iterable, orders: Dict[int, dict], card_change: bool = False
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Args:
+        payments: Lista de PaymentCreate, en el orden en que se cobran
+        orders: {order_id: {'total', 'status', 'paid'}} (paid = pagos ya registrados)
+        card_change: Aceptar cambio mayor que el efectivo entregado (pago único)
+
+    Returns:
+        (pagos con total_amount y change_amount, saldo por orden)
+
+    Raises:
+        HTTPException: 404 si una orden no existe, 400 si ya está pagada, si un
+        pago no cubre nada o si la tarjeta supera el saldo pendiente (sin card_change)
+    """
+    paid = {order_id: Decimal(str(order['paid'] or 0)) for order_id, order in orders.items()}
+
+    rows = []
+    for payment in payments:
+        order = orders.get(payment.order_id)
+        if not order:
+            raise HTTPException(status_code=404, detail=f"Orden {payment.order_id} no encontrada")
+
+        total = Decimal(str(order['total']))
+        remaining = total - paid[payment.order_id]
+        if order['status'] == 'completed' or remaining <= 0:
+            raise HTTPException(status_code=400, detail=f"La orden {payment.order_id} ya está pagada")
+
+        tendered = (payment.cash_amount + payment.card_amount).quantize(CENTS)
+        if tendered <= 0:
+            raise HTTPException(status_code=400, detail=f"Pago sin importe para la orden {payment.order_id}")
+
+        applied = min(tendered, remaining)
+        change = tendered - applied
+        if change > payment.cash_amount and not card_change:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El pago con tarjeta supera el saldo pendiente de la orden {payment.order_id} ({remaining})"
+            )
+
+        paid[payment.order_id] += applied
+        rows.append({
+            'order_id': payment.order_id,
+            'payment_type': payment.payment_type.value,
+            'total_amount': applied,
+            'cash_amount': payment.cash_amount,
+            'card_amount': payment.card_amount,
+            'tip_amount': payment.tip_amount,
+            'change_amount': change,
+        })
+
+    balances = [
+        {
+            'order_id': order_id,
+            'total': Decimal(str(orders[order_id]['total'])),
+            'paid': paid[order_id],
+            'remaining': Decimal(str(orders[order_id]['total'])) - paid[order_id],
+        }
+        for order_id in sorted({row['order_id'] for row in rows})
+    ]
+    return rows, balances
@@ -0,0 +1,53 @@
+"""
+Prep-time percentiles from the log-bucket histograms of migration 011.
+
+Every order that becomes ready adds 1 to bucket
+ceil(ln(ready_at - created_at in seconds) / ln(GAMMA)) of its business day,
+local hour and order_type (prep_time_hourly) and of each product on it
+(prep_time_products). Bucket b holds the times in (GAMMA^(b-1), GAMMA^b];
+reporting it as 2 * GAMMA^b / (GAMMA + 1) is off by at most
+(GAMMA - 1) / (GAMMA + 1) ~ 5% for any time, so a percentile over months
+is a walk over at most a few hundred summed counters per group, and the
+histograms of several days or groups merge by adding counts.
+"""
+from itertools import groupby
+from typing import Iterable, List, Sequence
+
+GAMMA = 1.1  # debe coincidir con prep_time_bucket() de la migración 011
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def bucket_seconds(bucket: int) -> float:
+    """Representative prep time of a bucket (bucket 0: one second or less)."""
+    if bucket <= 0:
+        return 1.0
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+def percentiles(buckets: Sequence[tuple[int, int]]) -> dict:
+    """[(bucket, orders)] sorted by bucket -> {"orders", "p50", "p90", "p99"} in seconds (nearest rank)."""
+    total = sum(count for _, count in buckets)
+    result = {"orders": total}
+    for name, q in QUANTILES.items():
+        rank, seen, value = q * total, 0, None
+        for bucket, count in buckets:
+            seen += count
+            if count > 0 and seen >= rank:
+                value = round(bucket_seconds(bucket), 1)
+                break
+        result[name] = value
+    return result
+
+
+def summarize(rows: Iterable[dict], keys: List[str]) -> List[dict]:
+    """
+    Rows with `keys` + bucket + orders, sorted by keys then bucket, to one
+    row per group: the keys, the order count and p50/p90/p99 in seconds.
+    Groups whose counts add up to zero (deleted orders) are left out.
+    """
+    summary = []
+    for group, group_rows in groupby(rows, key=lambda row: tuple(row[k] for k in keys)):
+        stats = percentiles([(row["bucket"], row["orders"]) for row in group_rows])
+        if stats["orders"] > 0:
+            summary.append({**dict(zip(keys, group)), **stats})
+    return summary
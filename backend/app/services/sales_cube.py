@@ -0,0 +1,376 @@
+"""
+In-memory columnar sales cube (GET /api/reports/cube).
+
+Each worker keeps every line item of completed orders as NumPy columns and
+answers arbitrary group-by / filter questions (by waiter, by hour, by
+category...) with vectorized sums, without sending a query to Postgres:
+
+    day (datetime64[D], business day)   hour (local)    order_type (code)
+    product_id   category_id   user_id   order_id   quantity   revenue (cents)
+
+Loading:
+- A background task (start/stop from the lifespan) refreshes the cube every
+  SALES_CUBE_REFRESH_SECONDS in a thread, off the event loop and off the
+  request path. The first refresh loads everything.
+- After that, refreshes are incremental by business day: reports_changed
+  NOTIFYs (migration 008) mark the days that changed, and only those days
+  are reloaded (one index range on orders.business_date) and swapped into
+  the columns. New orders land on the current day, so a refresh during
+  service reloads a few hundred rows.
+- "*" (rollup rebuilds, business-day changes), catalog changes (categories
+  are denormalized) and listener reconnects force a full reload. While the
+  listener is down only the current day is refreshed.
+- A refresh builds a new immutable CubeData and swaps the reference, so
+  queries never lock or see a half-applied update.
+
+Orders in progress are not in the cube (like the rollups); categories are
+the products' current ones.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+import psycopg2.extensions
+
+from ..config import settings
+from ..core import business_day
+from ..core.catalog_cache import CATALOG_CHANNEL
+from ..core.db_events import db_events
+from ..core.report_cache import PURGE_ALL, REPORTS_CHANNEL
+from ..database import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+FETCH_ROWS = 10000
+
+# Hora local como order_local_hour() (migración 009), con la zona leída una sola vez
+CUBE_SQL = """
+    SELECT o.business_date - DATE '1970-01-01',
+           EXTRACT(HOUR FROM (o.created_at AT TIME ZONE 'UTC') AT TIME ZONE c.timezone)::int,
+           o.order_type,
+           COALESCE(oi.product_id, -1), COALESCE(p.category_id, -1), COALESCE(o.user_id, -1), o.id,
+           oi.quantity, ROUND(oi.subtotal * 100)::bigint
+    FROM orders o
+    CROSS JOIN business_day_config c
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN products p ON p.id = oi.product_id
+    WHERE o.status = 'completed' {where}
+"""
+
+# Columnas en el orden de CUBE_SQL
+COLUMNS = ("day", "hour", "order_type", "product_id", "category_id", "user_id", "order_id", "quantity", "revenue")
+DTYPES = ("datetime64[D]", np.int8, np.int8, np.int32, np.int32, np.int32, np.int64, np.int32, np.int64)
+
+# Dimensiones de group_by / filter; weekday y month se derivan de day
+DIMENSIONS = ("date", "month", "weekday", "hour", "order_type", "product_id", "category_id", "user_id")
+MEASURES = ("orders", "lines", "quantity", "revenue")
+
+# Hasta este número de grupos posibles se agrega con bincount directo
+DENSE_GROUPS = 1 << 22
+
+
+class CubeQueryError(ValueError):
+    """Invalid group_by or filter (the route answers 400)."""
+
+
+class CubeData:
+    """Immutable snapshot of the columns."""
+
+    def __init__(self, columns: dict, order_types: tuple, loaded_at: datetime):
+        self.columns = columns
+        self.order_types = order_types  # código -> nombre
+        self.loaded_at = loaded_at
+
+    @property
+    def rows(self) -> int:
+        return len(self.columns["day"])
+
+    def dimension(self, name: str) -> np.ndarray:
+        day = self.columns["day"]
+        if name == "date":
+            return day
+        if name == "month":
+            return day.astype("datetime64[M]")
+        if name == "weekday":
+            # 1970-01-01 fue jueves (ISO 4)
+            return ((day.astype(np.int64) + 3) % 7 + 1).astype(np.int8)
+        return self.columns[name]
+
+    def decode(self, name: str, value: int):
+        """Value of dimension `name` from its integer form (days / months since 1970 for dates)."""
+        if name == "date":
+            return np.datetime64(int(value), "D").astype(date)
+        if name == "month":
+            return str(np.datetime64(int(value), "M"))
+        if name == "order_type":
+            return self.order_types[int(value)]
+        return int(value)
+
+
+def _parse_value(name: str, text: str, order_types: tuple):
+    if name in ("date", "month"):
+        try:
+            return np.datetime64(text, "D" if name == "date" else "M")
+        except ValueError:
+            raise CubeQueryError(f"Valor inválido para {name}: {text}")
+    if name == "order_type":
+        return order_types.index(text) if text in order_types else -1
+    try:
+        return int(text)
+    except ValueError:
+        raise CubeQueryError(f"Valor inválido para {name}: {text}")
+
+
+def _filter_value(column: np.ndarray, name: str, text: str, spec: str, order_types: tuple):
+    """Filter value as the column's dtype; integers outside it would wrap around or raise."""
+    value = _parse_value(name, text, order_types)
+    if np.issubdtype(column.dtype, np.integer):
+        info = np.iinfo(column.dtype)
+        if not info.min <= value <= info.max:
+            raise CubeQueryError(f"Valor fuera de rango en el filtro: {spec}")
+    return value
+
+
+def _filter_mask(cube: CubeData, filters: Iterable[str]) -> np.ndarray:
+    """Filters "dim:v1,v2" (any of) or "dim:lo..hi" (inclusive), ANDed."""
+    mask = np.ones(cube.rows, dtype=bool)
+    for spec in filters:
+        name, _, values = spec.partition(":")
+        if name not in DIMENSIONS or not values:
+            raise CubeQueryError(f"Filtro inválido: {spec}")
+        column = cube.dimension(name)
+        try:
+            if ".." in values:
+                low, _, high = values.partition("..")
+                if low:
+                    mask &= column >= _filter_value(column, name, low, spec, cube.order_types)
+                if high:
+                    mask &= column <= _filter_value(column, name, high, spec, cube.order_types)
+            else:
+                wanted = [_filter_value(column, name, v, spec, cube.order_types) for v in values.split(",")]
+                mask &= np.isin(column, np.array(wanted, dtype=column.dtype))
+        except OverflowError:
+            # Fechas fuera del rango de datetime64 (según la versión de NumPy)
+            raise CubeQueryError(f"Valor fuera de rango en el filtro: {spec}")
+    return mask
+
+
+def query(
+    cube: CubeData,
+    group_by: list[str],
+    filters: Iterable[str] = (),
+    order_by: Optional[str] = None,
+    limit: int = 1000,
+) -> dict:
+    """
+    Sum the measures of the rows matching `filters`, grouped by `group_by`.
+    Groups come sorted by their dimensions, or by `order_by` (a measure) descending.
+    """
+    for name in group_by:
+        if name not in DIMENSIONS:
+            raise CubeQueryError(f"Dimensión desconocida: {name}")
+    if len(set(group_by)) != len(group_by):
+        raise CubeQueryError("Dimensión repetida en group_by")
+    if order_by is not None and order_by not in MEASURES:
+        raise CubeQueryError(f"order_by debe ser una medida: {', '.join(MEASURES)}")
+
+    mask = _filter_mask(cube, filters)
+    order_id = cube.columns["order_id"][mask]
+    if not order_id.size:
+        return {"groups": 0, "rows_scanned": 0, "rows": []}
+
+    # Código por dimensión (valor - mínimo) y un código combinado por grupo
+    offsets, codes, shape = [], [], []
+    for name in group_by:
+        values = cube.dimension(name)[mask].astype(np.int64)
+        low = int(values.min())
+        offsets.append(low)
+        codes.append(values - low)
+        shape.append(int(values.max()) - low + 1)
+    try:
+        combined = np.ravel_multi_index(codes, shape) if codes else np.zeros(order_id.size, np.int64)
+    except ValueError:
+        # Producto de los rangos de las dimensiones mayor que un índice int64
+        raise CubeQueryError("Demasiadas combinaciones en group_by: filtra un rango menor")
+    size = int(np.prod(shape, dtype=np.float64)) if codes else 1
+    if size <= DENSE_GROUPS:
+        # Espacio de grupos pequeño: bincount directo, sin ordenar
+        lines = np.bincount(combined, minlength=size)
+        group_keys = np.flatnonzero(lines)
+        group = combined
+        width = size
+    else:
+        group_keys, group = np.unique(combined, return_inverse=True)
+        lines = None
+        width = len(group_keys)
+    groups = len(group_keys)
+
+    measures = {
+        "lines": np.bincount(group, minlength=width) if lines is None else lines,
+        "quantity": np.bincount(group, weights=cube.columns["quantity"][mask], minlength=width),
+        "revenue": np.bincount(group, weights=cube.columns["revenue"][mask], minlength=width),
+    }
+    # Órdenes distintas por grupo: claves (grupo, orden) únicas
+    stride = int(order_id.max()) + 1
+    measures["orders"] = np.bincount(np.unique(group * stride + order_id) // stride, minlength=width)
+    if lines is not None:
+        measures = {name: values[group_keys] for name, values in measures.items()}
+
+    if order_by is not None:
+        selected = np.argsort(-measures[order_by], kind="stable")[:limit]
+    else:
+        selected = np.arange(min(groups, limit))
+    positions = np.unravel_index(group_keys[selected], shape) if codes else ()
+
+    rows = []
+    for i, g in enumerate(selected):
+        row = {name: cube.decode(name, positions[d][i] + offsets[d]) for d, name in enumerate(group_by)}
+        row.update(
+            orders=int(measures["orders"][g]),
+            lines=int(measures["lines"][g]),
+            quantity=int(measures["quantity"][g]),
+            revenue=round(float(measures["revenue"][g]) / 100, 2),
+        )
+        rows.append(row)
+    return {"groups": groups, "rows_scanned": int(order_id.size), "rows": rows}
+
+
+class SalesCube:
+    """Loads and refreshes the CubeData of this worker."""
+
+    def __init__(self):
+        self._data: Optional[CubeData] = None
+        self._dirty_days: set[date] = set()
+        self._full_reload = True
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"full_loads": 0, "incremental_loads": 0, "last_load_ms": None, "days_reloaded": 0}
+
+    @property
+    def data(self) -> Optional[CubeData]:
+        return self._data
+
+    def mark_changed(self, payload: str = PURGE_ALL):
+        """reports_changed handler: ISO business date, or "*" for everything."""
+        with self._lock:
+            if payload in ("", PURGE_ALL):
+                self._full_reload = True
+                return
+            try:
+                self._dirty_days.add(date.fromisoformat(payload))
+            except ValueError:
+                self._full_reload = True
+
+    def _fetch(self, conn, days: Optional[list], order_types: list) -> dict:
+        """NumPy chunks per column; new order types are appended to `order_types`."""
+        where = "AND o.business_date = ANY(%s)" if days is not None else ""
+        cursor = conn.cursor(name="sales_cube", cursor_factory=psycopg2.extensions.cursor)
+        cursor.execute(CUBE_SQL.format(where=where), (days,) if days is not None else None)
+        chunks = {name: [] for name in COLUMNS}
+        type_codes = {t: i for i, t in enumerate(order_types)}
+        try:
+            while batch := cursor.fetchmany(FETCH_ROWS):
+                for name, dtype, values in zip(COLUMNS, DTYPES, zip(*batch)):
+                    if name == "order_type":
+                        values = [type_codes.setdefault(t, len(type_codes)) for t in values]
+                    elif name == "day":
+                        # Días desde 1970 (convertir objetos date es 100 veces más lento)
+                        values = np.array(values, dtype=np.int64)
+                    chunks[name].append(np.array(values, dtype=dtype))
+        finally:
+            cursor.close()
+        order_types[:] = list(type_codes)
+        return chunks
+
+    @staticmethod
+    def _build(chunks: dict, order_types: list, base: Optional[CubeData], keep: Optional[np.ndarray]) -> CubeData:
+        columns = {}
+        for name, dtype in zip(COLUMNS, DTYPES):
+            parts = ([base.columns[name][keep]] if base is not None else []) + chunks[name]
+            columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        return CubeData(columns, tuple(order_types), datetime.now(timezone.utc))
+
+    def refresh(self) -> CubeData:
+        """Reload what changed since the last refresh (everything the first time). Runs in a thread."""
+        with self._lock:
+            full = self._full_reload or self._data is None
+            days = sorted(self._dirty_days)
+            if not db_events.is_listening:
+                # Sin NOTIFY solo se sabe que el día actual recibe órdenes
+                days = sorted(set(days) | {business_day.today()})
+            self._full_reload = False
+            self._dirty_days = set()
+        if not full and not days:
+            return self._data
+
+        base = None if full else self._data
+        order_types = list(base.order_types) if base is not None else []
+        start = time.perf_counter()
+        try:
+            with pooled_connection() as conn:
+                chunks = self._fetch(conn, None if full else days, order_types)
+        except Exception:
+            with self._lock:
+                # Lo pendiente se reintenta en el siguiente ciclo
+                self._full_reload |= full
+                self._dirty_days.update(days)
+            raise
+
+        keep = None
+        if base is not None:
+            keep = ~np.isin(base.columns["day"], np.array(days, dtype="datetime64[D]"))
+        self._data = self._build(chunks, order_types, base, keep)
+
+        self._stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if full:
+            self._stats["full_loads"] += 1
+        else:
+            self._stats["incremental_loads"] += 1
+            self._stats["days_reloaded"] += len(days)
+        return self._data
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error("Error actualizando el cubo de ventas: %s", e, exc_info=True)
+            await asyncio.sleep(settings.SALES_CUBE_REFRESH_SECONDS)
+
+    async def start(self):
+        if not settings.SALES_CUBE_ENABLED:
+            logger.warning("⚠️ Cubo de ventas deshabilitado (SALES_CUBE_ENABLED=false)")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="sales-cube")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        data = self._data
+        return {
+            **self._stats,
+            "loaded": data is not None,
+            "loaded_at": data.loaded_at if data else None,
+            "rows": data.rows if data else 0,
+            "memory_bytes": sum(c.nbytes for c in data.columns.values()) if data else 0,
+            "pending_days": len(self._dirty_days),
+        }
+
+
+# Singleton instance (one cube per worker)
+sales_cube = SalesCube()
+db_events.subscribe(REPORTS_CHANNEL, sales_cube.mark_changed)
+db_events.subscribe(CATALOG_CHANNEL, lambda payload: sales_cube.mark_changed())
+db_events.on_reconnect(sales_cube.mark_changed)
@@ -0,0 +1,192 @@
+"""
+Rebuild of the sales rollups (sales_daily, sales_daily_products, sales_hourly)
+and of the prep-time histograms (prep_time_hourly, prep_time_products).
+
+The rollups are maintained by the triggers of migrations 006/007/009/011, keyed by
+orders.business_date. This module recomputes them from orders / order_items,
+for the whole history or for a range of business days, e.g. after fixing data
+by hand or restoring a backup:
+
+    python -m app.services.sales_rollup
+    python -m app.services.sales_rollup --from 2025-01-01 --to 2025-01-31
+
+After changing BUSINESS_TIMEZONE / BUSINESS_DAY_CUTOFF_HOUR, store them in
+the database and move every order to its new business day with
+
+    python -m app.services.sales_rollup --apply-business-day
+
+Order writes and other rebuilds wait while a rebuild runs (table lock until
+commit), so no order can finish between the delete and the re-insert. A full
+rebuild over years of history takes seconds; prefer a range during service
+hours.
+
+Both drop the report caches of every API worker (NOTIFY on commit).
+"""
+import argparse
+from datetime import date
+from typing import Optional
+
+from ..core.report_cache import notify_reports_changed
+
+LOCK_SQL = "LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE"
+
+DELETE_DAILY_SQL = "DELETE FROM sales_daily WHERE {range}"
+
+DELETE_PRODUCTS_SQL = "DELETE FROM sales_daily_products WHERE {range}"
+
+DELETE_HOURLY_SQL = "DELETE FROM sales_hourly WHERE {range}"
+
+DELETE_PREP_HOURLY_SQL = "DELETE FROM prep_time_hourly WHERE {range}"
+
+DELETE_PREP_PRODUCTS_SQL = "DELETE FROM prep_time_products WHERE {range}"
+
+INSERT_DAILY_SQL = """
+    INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+    SELECT business_date, order_type, status, COUNT(*), SUM(total), SUM(tax)
+    FROM orders
+    WHERE status IN ('completed', 'cancelled') AND {range}
+    GROUP BY 1, 2, 3
+"""
+
+INSERT_PRODUCTS_SQL = """
+    INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+    SELECT o.business_date, oi.product_id, COUNT(*), SUM(oi.quantity), SUM(oi.subtotal)
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    WHERE o.status = 'completed' AND {range}
+    GROUP BY 1, 2
+"""
+
+INSERT_HOURLY_SQL = """
+    INSERT INTO sales_hourly (business_date, hour, order_type, orders_count, total_sales)
+    SELECT business_date, order_local_hour(created_at), order_type, COUNT(*), SUM(total)
+    FROM orders
+    WHERE status = 'completed' AND {range}
+    GROUP BY 1, 2, 3
+"""
+
+INSERT_PREP_HOURLY_SQL = """
+    INSERT INTO prep_time_hourly (business_date, hour, order_type, bucket, orders)
+    SELECT business_date, order_local_hour(created_at), order_type, prep_time_bucket(ready_at, created_at), COUNT(*)
+    FROM orders
+    WHERE ready_at IS NOT NULL AND {range}
+    GROUP BY 1, 2, 3, 4
+"""
+
+INSERT_PREP_PRODUCTS_SQL = """
+    INSERT INTO prep_time_products (business_date, product_id, bucket, orders)
+    SELECT o.business_date, oi.product_id, prep_time_bucket(o.ready_at, o.created_at), COUNT(DISTINCT o.id)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.ready_at IS NOT NULL AND oi.product_id IS NOT NULL AND {range}
+    GROUP BY 1, 2, 3
+"""
+
+# Cambio de día de negocio: nueva configuración y business_date recalculado.
+# Sin triggers de usuario (updated_at no cambia; los rollups se reconstruyen).
+APPLY_CONFIG_SQL = "UPDATE business_day_config SET timezone = %s, cutoff_hour = %s"
+
+RECOMPUTE_BUSINESS_DATE_SQL = """
+    UPDATE orders SET business_date = order_business_date(created_at)
+    WHERE business_date IS DISTINCT FROM order_business_date(created_at)
+"""
+
+
+def _range(column: str, date_from: Optional[date], date_to: Optional[date]) -> str:
+    """Inclusive business_date range (index-friendly: no NULL-or tricks)."""
+    conditions = ["TRUE"]
+    if date_from:
+        conditions.append(f"{column} >= %(from)s")
+    if date_to:
+        conditions.append(f"{column} <= %(to)s")
+    return " AND ".join(conditions)
+
+
+def _rebuild(cursor, date_from: Optional[date], date_to: Optional[date]) -> dict:
+    params = {"from": date_from, "to": date_to}
+    cursor.execute(DELETE_DAILY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    cursor.execute(DELETE_PRODUCTS_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    cursor.execute(DELETE_HOURLY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    cursor.execute(DELETE_PREP_HOURLY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    cursor.execute(DELETE_PREP_PRODUCTS_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    cursor.execute(INSERT_DAILY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    daily_rows = cursor.rowcount
+    cursor.execute(INSERT_HOURLY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    hourly_rows = cursor.rowcount
+    cursor.execute(INSERT_PRODUCTS_SQL.format(range=_range("o.business_date", date_from, date_to)), params)
+    products_rows = cursor.rowcount
+    cursor.execute(INSERT_PREP_HOURLY_SQL.format(range=_range("business_date", date_from, date_to)), params)
+    prep_hourly_rows = cursor.rowcount
+    cursor.execute(INSERT_PREP_PRODUCTS_SQL.format(range=_range("o.business_date", date_from, date_to)), params)
+    return {
+        "sales_daily": daily_rows, "sales_daily_products": products_rows, "sales_hourly": hourly_rows,
+        "prep_time_hourly": prep_hourly_rows, "prep_time_products": cursor.rowcount,
+    }
+
+
+def rebuild(conn, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """Recompute the rollups for business days [date_from, date_to] and commit. Returns row counts."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LOCK_SQL)
+        counts = _rebuild(cursor, date_from, date_to)
+        notify_reports_changed(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return counts
+
+
+def apply_business_day(conn, timezone: str, cutoff_hour: int) -> dict:
+    """Store the business-day model in the database, recompute every business_date and rebuild the rollups."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LOCK_SQL)
+        cursor.execute(APPLY_CONFIG_SQL, (timezone, cutoff_hour))
+        cursor.execute("ALTER TABLE orders DISABLE TRIGGER USER")
+        cursor.execute(RECOMPUTE_BUSINESS_DATE_SQL)
+        moved = cursor.rowcount
+        cursor.execute("ALTER TABLE orders ENABLE TRIGGER USER")
+        counts = _rebuild(cursor, None, None)
+        notify_reports_changed(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"orders_moved": moved, **counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day (YYYY-MM-DD)")
+    parser.add_argument(
+        "--apply-business-day", action="store_true",
+        help="Store BUSINESS_TIMEZONE / BUSINESS_DAY_CUTOFF_HOUR in the database, "
+             "recompute orders.business_date and rebuild everything",
+    )
+    args = parser.parse_args(argv)
+    if args.date_from and args.date_to and args.date_from > args.date_to:
+        parser.error("--from cannot be after --to")
+
+    import psycopg2
+    from ..config import settings
+
+    conn = psycopg2.connect(settings.DATABASE_URL)
+    try:
+        if args.apply_business_day:
+            counts = apply_business_day(conn, settings.BUSINESS_TIMEZONE, settings.BUSINESS_DAY_CUTOFF_HOUR)
+            print(f"✅ Business day: {settings.BUSINESS_TIMEZONE}, cutoff {settings.BUSINESS_DAY_CUTOFF_HOUR}:00 "
+                  f"({counts['orders_moved']} orders moved)")
+        else:
+            counts = rebuild(conn, args.date_from, args.date_to)
+    finally:
+        conn.close()
+    print(f"✅ Rollups rebuilt: {counts['sales_daily']} daily rows, "
+          f"{counts['sales_daily_products']} product rows, {counts['sales_hourly']} hourly rows, "
+          f"{counts['prep_time_hourly'] + counts['prep_time_products']} prep-time rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark: escritura de órdenes por fila vs. por conjuntos.
+
+Mide cuántas sentencias SQL y cuánto tiempo cuesta escribir los items de una
+orden (lookup de productos y modificadores, INSERT de items y modificadores,
+UPDATE de inventario) según el tamaño de la orden, comparando el flujo antiguo
+(una sentencia por item / modificador) con OrderRepository.
+
+Todo corre en una sola transacción que nunca se confirma: la orden
+"contenedor" se inserta sin commit, cada medición se revierte a un savepoint
+y al final se revierte todo. Se puede ejecutar contra una base con datos
+reales sin modificarla (los triggers de orders no llegan a confirmarse y
+los NOTIFY no se envían).
+
+Uso (desde backend/):
+    DATABASE_URL=postgresql://... python benchmarks/order_write_benchmark.py
+    python benchmarks/order_write_benchmark.py --sizes 1 5 20 --rtt-ms 0.5
+
+--rtt-ms añade una latencia artificial por sentencia para simular la red entre
+el backend y Postgres (p. ej. contenedores distintos o la Raspberry Pi).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import settings
+from app.models.order import OrderItemCreate
+from app.repositories.order_repository import OrderRepository
+from app.services.order_pricing import collect_catalog_ids, price_items
+
+
+class CountingCursor:
+    """Cursor que cuenta sentencias y opcionalmente simula latencia de red."""
+
+    def __init__(self, cursor, stats, rtt_seconds):
+        self._cursor = cursor
+        self._stats = stats
+        self._rtt = rtt_seconds
+
+    def execute(self, query, params=None):
+        self._stats['statements'] += 1
+        if self._rtt:
+            time.sleep(self._rtt)
+        return self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn, rtt_seconds=0.0):
+        self._conn = conn
+        self._rtt = rtt_seconds
+        self.stats = {'statements': 0}
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self.stats, self._rtt)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def write_items_legacy(conn, order_id, items):
+    """Flujo anterior: una sentencia por producto, modificador, item e inventario."""
+    cursor = conn.cursor()
+    priced = []
+    for item in items:
+        cursor.execute(
+            "SELECT id, name, price, is_available FROM products WHERE id = %s",
+            (item.product_id,)
+        )
+        product = cursor.fetchone()
+        mods = []
+        for mod_id in item.modifier_ids or []:
+            cursor.execute(
+                "SELECT id, name, price FROM modifiers WHERE id = %s AND is_active = TRUE",
+                (mod_id,)
+            )
+            mod = cursor.fetchone()
+            if mod:
+                mods.append(mod)
+        unit_price = Decimal(str(product['price'])) + sum((m['price'] for m in mods), Decimal("0"))
+        priced.append((item, unit_price, mods))
+
+    for item, unit_price, mods in priced:
+        cursor.execute("""
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, subtotal, special_instructions)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (order_id, item.product_id, item.quantity, unit_price,
+              unit_price * item.quantity, item.special_instructions))
+        order_item_id = cursor.fetchone()['id']
+        for mod in mods:
+            cursor.execute(
+                "INSERT INTO order_item_modifiers (order_item_id, modifier_id, price) VALUES (%s, %s, %s)",
+                (order_item_id, mod['id'], mod['price'])
+            )
+        cursor.execute(
+            "UPDATE products SET stock_quantity = GREATEST(0, stock_quantity - %s) WHERE id = %s",
+            (item.quantity, item.product_id)
+        )
+
+
+def write_items_batched(conn, order_id, items):
+    """Flujo actual de create_order (OrderRepository)."""
+    repo = OrderRepository(conn)
+    product_ids, modifier_ids = collect_catalog_ids(items)
+    priced, _ = price_items(
+        items,
+        repo.get_products_by_ids(product_ids),
+        repo.get_active_modifiers_by_ids(modifier_ids)
+    )
+    repo.insert_items(order_id, priced)
+    repo.decrement_stock(priced)
+
+
+def build_items(size, product_ids, modifier_ids, modifiers_per_item):
+    return [
+        OrderItemCreate(
+            product_id=product_ids[i % len(product_ids)],
+            quantity=1 + i % 3,
+            special_instructions=None if i % 2 else "sin cebolla",
+            modifier_ids=[modifier_ids[(i + j) % len(modifier_ids)] for j in range(modifiers_per_item)]
+            if modifier_ids else [],
+        )
+        for i in range(size)
+    ]
+
+
+def measure(raw_conn, writer, order_id, items, rtt_seconds, repeats):
+    """Devuelve (sentencias, mediana en ms) de escribir los items `repeats` veces."""
+    timings = []
+    statements = 0
+    for _ in range(repeats):
+        conn = CountingConnection(raw_conn, rtt_seconds)
+        start = time.perf_counter()
+        writer(conn, order_id, items)
+        timings.append((time.perf_counter() - start) * 1000)
+        statements = conn.stats['statements']
+        raw_conn.cursor().execute("ROLLBACK TO SAVEPOINT measure")
+    return statements, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--modifiers-per-item", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(settings.DATABASE_URL, cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM products WHERE is_available = TRUE ORDER BY id LIMIT 20")
+    product_ids = [r['id'] for r in cursor.fetchall()]
+    cursor.execute("SELECT id FROM modifiers WHERE is_active = TRUE ORDER BY id LIMIT 10")
+    modifier_ids = [r['id'] for r in cursor.fetchall()]
+    if not product_ids:
+        print("❌ No hay productos disponibles en la base de datos")
+        sys.exit(1)
+
+    # Orden "contenedor" para los items; no se confirma nunca (rollback al final)
+    cursor.execute("""
+        INSERT INTO orders (order_number, order_type, status, subtotal, tax, total)
+        VALUES ('BENCH', 'takeout', 'pending', 0, 0, 0)
+        RETURNING id
+    """)
+    order_id = cursor.fetchone()['id']
+    cursor.execute("SAVEPOINT measure")
+
+    rtt = args.rtt_ms / 1000
+    print(f"Modificadores por item: {args.modifiers_per_item} | RTT simulado: {args.rtt_ms} ms | repeticiones: {args.repeats}")
+    print(f"{'items':>6} {'sent. fila':>11} {'sent. bloque':>13} {'ms fila':>9} {'ms bloque':>10} {'x':>6}")
+    try:
+        for size in args.sizes:
+            items = build_items(size, product_ids, modifier_ids, args.modifiers_per_item)
+            legacy_stmts, legacy_ms = measure(conn, write_items_legacy, order_id, items, rtt, args.repeats)
+            batched_stmts, batched_ms = measure(conn, write_items_batched, order_id, items, rtt, args.repeats)
+            speedup = legacy_ms / batched_ms if batched_ms else float("inf")
+            print(f"{size:>6} {legacy_stmts:>11} {batched_stmts:>13} {legacy_ms:>9.2f} {batched_ms:>10.2f} {speedup:>6.1f}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark: pagos concurrentes contra la fila de la sesión vs. libro de pagos.
+
+Varias cajas (un hilo y una conexión cada una) registran pagos en la misma
+sesión de caja abierta durante unos segundos, con las sentencias de
+POST /cash/payments:
+
+  fila   flujo anterior: INSERT del pago + UPDATE cash_sessions SET total_* =
+         total_* + ... sobre la fila de la sesión, que queda bloqueada hasta
+         el commit, así que las cajas pagan de una en una
+  libro  flujo actual: solo el INSERT; el trigger de la migración 012 suma en
+         cash_session_totals, en el contador de la conexión
+
+Al final comprueba que cash_session_balances cuadra con los pagos
+insertados. Crea su propia sesión y una orden por caja, y las borra al
+terminar (con sus pagos).
+
+Uso (desde backend/, con la migración 012 aplicada):
+    DATABASE_URL=postgresql://... python benchmarks/payment_concurrency_benchmark.py
+    python benchmarks/payment_concurrency_benchmark.py --tills 1 4 8 --seconds 5 --rtt-ms 0.5
+
+--rtt-ms añade una latencia artificial por sentencia para simular la red entre
+el backend y Postgres: es el tiempo que el flujo anterior tiene la fila
+bloqueada por cada pago.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from decimal import Decimal
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config import settings
+from app.repositories.cash_repository import ACTIVE_SESSION_SQL
+
+ORDER_TOTAL = Decimal("12.50")
+TIP = Decimal("0.50")
+
+
+def pay_row(cursor, session_id, order_id, rtt):
+    """Flujo anterior: pago + UPDATE de la fila de la sesión."""
+    cursor.execute("""
+        INSERT INTO payments (order_id, cash_session_id, payment_type,
+                              total_amount, cash_amount, card_amount, tip_amount, change_amount)
+        VALUES (%s, %s, 'cash', %s, %s, 0, %s, 0)
+    """, (order_id, session_id, ORDER_TOTAL, ORDER_TOTAL, TIP))
+    time.sleep(rtt)
+    cursor.execute("""
+        UPDATE cash_sessions SET
+            total_cash_sales = total_cash_sales + %s,
+            total_sales      = total_sales      + %s,
+            total_tips       = total_tips       + %s,
+            orders_count     = orders_count     + 1
+        WHERE id = %s
+    """, (ORDER_TOTAL, ORDER_TOTAL, TIP, session_id))
+    time.sleep(rtt)
+    cursor.execute("UPDATE orders SET payment_method = 'cash' WHERE id = %s", (order_id,))
+    time.sleep(rtt)
+
+
+def pay_ledger(cursor, session_id, order_id, rtt):
+    """Flujo actual: solo el pago (los totales los suma el trigger)."""
+    cursor.execute("""
+        INSERT INTO payments (order_id, cash_session_id, payment_type,
+                              total_amount, cash_amount, card_amount, tip_amount, change_amount)
+        VALUES (%s, %s, 'cash', %s, %s, 0, %s, 0)
+    """, (order_id, session_id, ORDER_TOTAL, ORDER_TOTAL, TIP))
+    time.sleep(rtt)
+    cursor.execute("UPDATE orders SET payment_method = 'cash' WHERE id = %s", (order_id,))
+    time.sleep(rtt)
+
+
+def till(writer, session_id, order_id, rtt, deadline, start, latencies, errors):
+    conn = psycopg2.connect(settings.DATABASE_URL)
+    try:
+        cursor = conn.cursor()
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            began = time.perf_counter()
+            try:
+                writer(cursor, session_id, order_id, rtt)
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                errors.append(str(e))
+                continue
+            latencies.append((time.perf_counter() - began) * 1000)
+    finally:
+        conn.close()
+
+
+def run(conn, writer, tills, seconds, rtt):
+    """Devuelve (pagos/s, p50 ms, p99 ms, errores, pagos, cuadra)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+    user_id = cursor.fetchone()['id']
+    cursor.execute("""
+        INSERT INTO cash_sessions (user_id, opening_amount, notes, status)
+        VALUES (%s, 0, 'BENCH', 'open')
+        RETURNING id
+    """, (user_id,))
+    session_id = cursor.fetchone()['id']
+    order_ids = []
+    for i in range(tills):
+        cursor.execute("""
+            INSERT INTO orders (order_number, order_type, status, subtotal, tax, total)
+            VALUES (%s, 'takeout', 'pending', %s, 0, %s)
+            RETURNING id
+        """, (f"BENCH-{i}", ORDER_TOTAL, ORDER_TOTAL))
+        order_ids.append(cursor.fetchone()['id'])
+    conn.commit()
+
+    latencies, errors = [], []
+    start = threading.Barrier(tills + 1)
+    deadline = [float("inf")]
+    threads = [
+        threading.Thread(target=till, args=(writer, session_id, order_id, rtt, deadline, start, latencies, errors))
+        for order_id in order_ids
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        deadline[0] = began + seconds
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        cursor.execute("SELECT COUNT(*) AS payments FROM payments WHERE cash_session_id = %s", (session_id,))
+        payments = cursor.fetchone()['payments']
+        cursor.execute(ACTIVE_SESSION_SQL + " AND id = %s", (session_id,))
+        balance = cursor.fetchone()
+        # Solo tiene sentido en modo libro (en modo fila el UPDATE suma otra vez)
+        balanced = balance['orders_count'] == payments
+        conn.commit()
+    finally:
+        cursor.execute("DELETE FROM payments WHERE cash_session_id = %s", (session_id,))
+        cursor.execute("DELETE FROM cash_sessions WHERE id = %s", (session_id,))
+        cursor.execute("DELETE FROM orders WHERE id = ANY(%s)", (order_ids,))
+        conn.commit()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    p50 = statistics.median(latencies) if latencies else 0.0
+    return len(latencies) / elapsed, p50, p99, len(errors), payments, balanced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tills", type=int, nargs="+", default=[1, 2, 4, 6, 8])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(settings.DATABASE_URL, cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('cash_session_totals') AS ledger, EXISTS (SELECT 1 FROM users) AS users")
+    row = cursor.fetchone()
+    conn.rollback()
+    if not row['ledger']:
+        print("❌ Falta la migración 012 (cash_session_totals)")
+        sys.exit(1)
+    if not row['users']:
+        print("❌ No hay usuarios en la base de datos")
+        sys.exit(1)
+
+    rtt = args.rtt_ms / 1000
+    print(f"Duración: {args.seconds} s por medición | RTT simulado: {args.rtt_ms} ms")
+    print(f"{'cajas':>6} {'pagos/s fila':>13} {'pagos/s libro':>14} {'p99 ms fila':>12} {'p99 ms libro':>13} {'x':>6} {'cuadra':>7}")
+    try:
+        for tills in args.tills:
+            row_rate, _, row_p99, row_errors, _, _ = run(conn, pay_row, tills, args.seconds, rtt)
+            ledger_rate, _, ledger_p99, ledger_errors, _, balanced = run(conn, pay_ledger, tills, args.seconds, rtt)
+            speedup = ledger_rate / row_rate if row_rate else float("inf")
+            print(f"{tills:>6} {row_rate:>13.0f} {ledger_rate:>14.0f} {row_p99:>12.2f} {ledger_p99:>13.2f} "
+                  f"{speedup:>6.1f} {'sí' if balanced else 'NO':>7}")
+            if row_errors or ledger_errors:
+                print(f"       ⚠️ errores: fila {row_errors}, libro {ledger_errors}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
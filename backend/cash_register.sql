@@ -55,33 +55,9 @@ CREATE INDEX IF NOT EXISTS idx_payments_order ON payments(order_id);
 CREATE INDEX IF NOT EXISTS idx_payments_session ON payments(cash_session_id);
 CREATE INDEX IF NOT EXISTS idx_payments_created ON payments(created_at);
 
--- ============================================
--- TRIGGER: Actualizar totales de sesión de caja
--- ============================================
-CREATE OR REPLACE FUNCTION update_cash_session_totals()
-RETURNS TRIGGER AS $$
-BEGIN
-    -- Actualizar totales de la sesión de caja
-    IF NEW.cash_session_id IS NOT NULL THEN
-        UPDATE cash_sessions
-        SET 
-            total_cash_sales = total_cash_sales + NEW.cash_amount,
-            total_card_sales = total_card_sales + NEW.card_amount,
-            total_sales = total_sales + NEW.total_amount,
-            total_tips = total_tips + NEW.tip_amount,
-            orders_count = orders_count + 1,
-            expected_amount = opening_amount + total_cash_sales + NEW.cash_amount + total_tips + NEW.tip_amount
-        WHERE id = NEW.cash_session_id;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-DROP TRIGGER IF EXISTS trigger_update_cash_session_totals ON payments;
-CREATE TRIGGER trigger_update_cash_session_totals
-    AFTER INSERT ON payments
-    FOR EACH ROW
-    EXECUTE FUNCTION update_cash_session_totals();
+-- Los totales de la sesión de caja se derivan de los pagos (libro de pagos
+-- + contadores repartidos en cash_session_totals): ver
+-- migrations/012_cash_session_ledger.sql
 
 -- Comentarios
 COMMENT ON TABLE cash_sessions IS 'Sesiones de caja (apertura/cierre)';
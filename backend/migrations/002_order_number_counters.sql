@@ -0,0 +1,34 @@
+-- =============================================================
+-- Migration 002: Per-session order number counters
+-- =============================================================
+-- Replaces SELECT COUNT(*) FROM orders WHERE cash_session_id = ... (a scan
+-- that grows with the session and races between tills) with one counter row
+-- per cash session, incremented with INSERT ... ON CONFLICT ... RETURNING.
+-- The row stays locked until the order transaction commits, so concurrent
+-- tills get consecutive numbers and a rolled back order leaves no gap.
+--
+-- Keys:
+--   session:<cash_session_id>  -> "#001", "#002", ...
+--   day:<YYYY-MM-DD>           -> "ORD-001", ... (orders without open session)
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+CREATE TABLE IF NOT EXISTS order_number_counters (
+    counter_key VARCHAR(40) PRIMARY KEY,
+    last_number INTEGER NOT NULL DEFAULT 0
+);
+
+-- Seed counters for sessions that already have orders, so numbering
+-- continues where COUNT(*) left off instead of restarting at #001.
+INSERT INTO order_number_counters (counter_key, last_number)
+SELECT 'session:' || cash_session_id, COUNT(*)
+FROM orders
+WHERE cash_session_id IS NOT NULL
+GROUP BY cash_session_id
+ON CONFLICT (counter_key) DO UPDATE
+    SET last_number = GREATEST(order_number_counters.last_number, EXCLUDED.last_number);
+
+COMMENT ON TABLE order_number_counters IS 'Contadores de número de orden por sesión de caja (o por día sin sesión)';
+
+\echo '✅ Migration 002 completed successfully'
@@ -0,0 +1,30 @@
+-- =============================================================
+-- Migration 003: Composite indexes for GET /api/orders pagination
+-- =============================================================
+-- GET /api/orders pages with ORDER BY created_at DESC, id DESC and a
+-- (created_at, id) < (cursor) condition. With these indexes every page,
+-- however deep, is a short range scan on the filter column + position.
+--
+-- The single-column indexes on created_at, status and order_type are
+-- replaced by the composites (same leading column).
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+CREATE INDEX IF NOT EXISTS idx_orders_created_id
+    ON orders(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_session_created
+    ON orders(cash_session_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_status_created
+    ON orders(status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_type_created
+    ON orders(order_type, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_orders_created;
+DROP INDEX IF EXISTS idx_orders_status;
+DROP INDEX IF EXISTS idx_orders_type;
+
+\echo '✅ Migration 003 completed successfully'
@@ -0,0 +1,33 @@
+-- =============================================================
+-- Migration 004: Partial indexes over active orders
+-- =============================================================
+-- Phone-line checks, table occupancy and the kitchen board only look at
+-- orders that are not completed/cancelled: a few dozen rows, while the
+-- orders table keeps the whole history. These partial indexes contain only
+-- the active rows, so those lookups stay flat as history grows.
+--
+-- Queries must repeat the predicate  status NOT IN ('completed', 'cancelled')
+-- for the planner to use them.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+-- create_order phone-line check, GET /api/orders/phone-lines
+CREATE INDEX IF NOT EXISTS idx_orders_active_phone_line
+    ON orders(phone_line, created_at DESC)
+    WHERE status NOT IN ('completed', 'cancelled') AND phone_line IS NOT NULL;
+
+-- GET /api/tables (most recent active order per table)
+CREATE INDEX IF NOT EXISTS idx_orders_active_table
+    ON orders(table_id, created_at DESC)
+    WHERE status NOT IN ('completed', 'cancelled') AND table_id IS NOT NULL;
+
+-- Kitchen board load (all active orders, oldest first)
+CREATE INDEX IF NOT EXISTS idx_orders_active_created
+    ON orders(created_at, id)
+    WHERE status NOT IN ('completed', 'cancelled');
+
+-- Only ever queried for active orders; superseded by the partial index
+DROP INDEX IF EXISTS idx_orders_phone_line;
+
+\echo '✅ Migration 004 completed successfully'
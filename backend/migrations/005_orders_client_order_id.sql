@@ -0,0 +1,21 @@
+-- =============================================================
+-- Migration 005: Client-generated order ids (POST /api/orders/batch)
+-- =============================================================
+-- Offline tills assign a UUID to every queued order and replay them in
+-- batches when the uplink comes back. The unique index makes a replay of an
+-- already stored order a no-op: the batch reports it as a duplicate instead
+-- of creating it twice.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+ALTER TABLE orders
+    ADD COLUMN IF NOT EXISTS client_order_id UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_client_order_id
+    ON orders(client_order_id)
+    WHERE client_order_id IS NOT NULL;
+
+COMMENT ON COLUMN orders.client_order_id IS 'UUID generado por el till (órdenes offline), único';
+
+\echo '✅ Migration 005 completed successfully'
@@ -0,0 +1,182 @@
+-- =============================================================
+-- Migration 006: Daily sales rollups for /api/reports
+-- =============================================================
+-- The report endpoints used to aggregate the whole orders / order_items
+-- history on every call. These tables hold per-day totals of finished
+-- orders (completed or cancelled) and are kept up to date by triggers:
+--
+--   sales_daily           business day x order_type x status
+--   sales_daily_products  business day x product (completed orders only)
+--
+-- Orders that are still active are not in the rollups; the reports add them
+-- live from the active-order partial indexes (migration 004).
+--
+-- The business day is created_at::date.
+--
+-- The triggers cover every write path:
+--   * an order entering or leaving completed/cancelled, or a finished order
+--     whose total/tax/type/date changes, moves its old row out and its new
+--     one in;
+--   * items inserted into or deleted from a completed order (orders
+--     created directly as completed get their items after the order row)
+--     adjust sales_daily_products.
+--
+-- Rebuild (all history or a date range) at any time with
+--     python -m app.services.sales_rollup [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    business_date DATE NOT NULL,
+    order_type    VARCHAR(20) NOT NULL,
+    status        VARCHAR(20) NOT NULL,
+    orders_count  INTEGER NOT NULL DEFAULT 0,
+    total_sales   DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    total_tax     DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (business_date, order_type, status)
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily_products (
+    business_date  DATE NOT NULL,
+    product_id     INTEGER NOT NULL,
+    times_ordered  INTEGER NOT NULL DEFAULT 0,
+    total_quantity INTEGER NOT NULL DEFAULT 0,
+    total_revenue  DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (business_date, product_id)
+);
+
+-- Add (sign = 1) or remove (sign = -1) one finished order
+CREATE OR REPLACE FUNCTION sales_rollup_apply(o orders, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF o.status NOT IN ('completed', 'cancelled') THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+    VALUES (o.created_at::date, o.order_type, o.status, sign, sign * o.total, sign * o.tax)
+    ON CONFLICT (business_date, order_type, status) DO UPDATE
+    SET orders_count = sales_daily.orders_count + EXCLUDED.orders_count,
+        total_sales  = sales_daily.total_sales + EXCLUDED.total_sales,
+        total_tax    = sales_daily.total_tax + EXCLUDED.total_tax;
+
+    IF o.status = 'completed' THEN
+        INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+        SELECT o.created_at::date, oi.product_id,
+               sign * COUNT(*), sign * SUM(oi.quantity), sign * SUM(oi.subtotal)
+        FROM order_items oi
+        WHERE oi.order_id = o.id
+        GROUP BY oi.product_id
+        ON CONFLICT (business_date, product_id) DO UPDATE
+        SET times_ordered  = sales_daily_products.times_ordered + EXCLUDED.times_ordered,
+            total_quantity = sales_daily_products.total_quantity + EXCLUDED.total_quantity,
+            total_revenue  = sales_daily_products.total_revenue + EXCLUDED.total_revenue;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sales_rollup_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- BEFORE DELETE: the items are still there (they go by cascade)
+        PERFORM sales_rollup_apply(OLD, -1);
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        IF (OLD.status, OLD.total, OLD.tax, OLD.order_type, OLD.created_at::date)
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.total, NEW.tax, NEW.order_type, NEW.created_at::date) THEN
+            RETURN NEW;
+        END IF;
+        PERFORM sales_rollup_apply(OLD, -1);
+    END IF;
+
+    PERFORM sales_rollup_apply(NEW, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Items added to / removed from completed orders (set-based, per statement)
+CREATE OR REPLACE FUNCTION sales_rollup_apply_items(items order_items[], sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+    SELECT o.created_at::date, i.product_id,
+           sign * COUNT(*), sign * SUM(i.quantity), sign * SUM(i.subtotal)
+    FROM unnest(items) i
+    JOIN orders o ON o.id = i.order_id
+    WHERE o.status = 'completed'
+    GROUP BY 1, 2
+    ON CONFLICT (business_date, product_id) DO UPDATE
+    SET times_ordered  = sales_daily_products.times_ordered + EXCLUDED.times_ordered,
+        total_quantity = sales_daily_products.total_quantity + EXCLUDED.total_quantity,
+        total_revenue  = sales_daily_products.total_revenue + EXCLUDED.total_revenue;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sales_rollup_items()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Each transition table only exists for its own event
+    IF TG_OP = 'INSERT' THEN
+        PERFORM sales_rollup_apply_items(ARRAY(SELECT n::order_items FROM new_items n), 1);
+    ELSE
+        PERFORM sales_rollup_apply_items(ARRAY(SELECT d::order_items FROM old_items d), -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_sales_rollup_orders ON orders;
+CREATE TRIGGER trigger_sales_rollup_orders
+    AFTER INSERT OR UPDATE ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION sales_rollup_orders();
+
+DROP TRIGGER IF EXISTS trigger_sales_rollup_orders_delete ON orders;
+CREATE TRIGGER trigger_sales_rollup_orders_delete
+    BEFORE DELETE ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION sales_rollup_orders();
+
+DROP TRIGGER IF EXISTS trigger_sales_rollup_items_insert ON order_items;
+CREATE TRIGGER trigger_sales_rollup_items_insert
+    AFTER INSERT ON order_items
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION sales_rollup_items();
+
+DROP TRIGGER IF EXISTS trigger_sales_rollup_items_delete ON order_items;
+CREATE TRIGGER trigger_sales_rollup_items_delete
+    AFTER DELETE ON order_items
+    REFERENCING OLD TABLE AS old_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION sales_rollup_items();
+
+-- Backfill from the existing history. Writes are blocked until COMMIT so
+-- no order finishes between the backfill and the triggers going live.
+LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE;
+
+TRUNCATE sales_daily, sales_daily_products;
+
+INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+SELECT created_at::date, order_type, status, COUNT(*), SUM(total), SUM(tax)
+FROM orders
+WHERE status IN ('completed', 'cancelled')
+GROUP BY 1, 2, 3;
+
+INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+SELECT o.created_at::date, oi.product_id, COUNT(*), SUM(oi.quantity), SUM(oi.subtotal)
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE o.status = 'completed'
+GROUP BY 1, 2;
+
+COMMIT;
+
+\echo '✅ Migration 006 completed successfully'
@@ -0,0 +1,154 @@
+-- =============================================================
+-- Migration 007: Business day (timezone + cutoff hour) for orders
+-- =============================================================
+-- The shop trades past midnight, so reports group orders by business day:
+-- local time in the shop's timezone, shifted back by the cutoff hour (an
+-- order at 01:30 with a 04:00 cutoff belongs to the previous day).
+--
+-- * business_day_config holds the model used inside the database. It must
+--   match BUSINESS_TIMEZONE / BUSINESS_DAY_CUTOFF_HOUR of the API (checked at
+--   startup); change both with
+--       python -m app.services.sales_rollup --apply-business-day
+-- * orders.business_date is filled by a trigger from created_at, which is
+--   naive UTC (CURRENT_TIMESTAMP with the database TimeZone = UTC).
+-- * The sales rollups (migration 006) are keyed by business_date from now on.
+--
+-- Reports filter created_at with half-open UTC ranges computed by the API
+-- (index-friendly); business_date is for grouping and for the rollups.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS business_day_config (
+    id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    timezone    VARCHAR(64) NOT NULL DEFAULT 'UTC',
+    cutoff_hour INTEGER NOT NULL DEFAULT 0 CHECK (cutoff_hour BETWEEN 0 AND 23)
+);
+INSERT INTO business_day_config DEFAULT VALUES ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION order_business_date(ts TIMESTAMP)
+RETURNS DATE AS $$
+    SELECT ((ts AT TIME ZONE 'UTC') AT TIME ZONE c.timezone - make_interval(hours => c.cutoff_hour))::date
+    FROM business_day_config c
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION set_order_business_date()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.business_date = order_business_date(NEW.created_at);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS business_date DATE;
+
+DROP TRIGGER IF EXISTS trigger_set_order_business_date ON orders;
+CREATE TRIGGER trigger_set_order_business_date
+    BEFORE INSERT OR UPDATE OF created_at ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION set_order_business_date();
+
+-- Backfill without touching updated_at or the rollups row by row; the
+-- rollups are rebuilt below.
+ALTER TABLE orders DISABLE TRIGGER USER;
+UPDATE orders SET business_date = order_business_date(created_at)
+WHERE business_date IS DISTINCT FROM order_business_date(created_at);
+ALTER TABLE orders ENABLE TRIGGER USER;
+
+ALTER TABLE orders ALTER COLUMN business_date SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_orders_business_date ON orders(business_date);
+
+-- Rollups keyed by business_date (replaces created_at::date of migration 006)
+CREATE OR REPLACE FUNCTION sales_rollup_apply(o orders, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF o.status NOT IN ('completed', 'cancelled') THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+    VALUES (o.business_date, o.order_type, o.status, sign, sign * o.total, sign * o.tax)
+    ON CONFLICT (business_date, order_type, status) DO UPDATE
+    SET orders_count = sales_daily.orders_count + EXCLUDED.orders_count,
+        total_sales  = sales_daily.total_sales + EXCLUDED.total_sales,
+        total_tax    = sales_daily.total_tax + EXCLUDED.total_tax;
+
+    IF o.status = 'completed' THEN
+        INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+        SELECT o.business_date, oi.product_id,
+               sign * COUNT(*), sign * SUM(oi.quantity), sign * SUM(oi.subtotal)
+        FROM order_items oi
+        WHERE oi.order_id = o.id
+        GROUP BY oi.product_id
+        ON CONFLICT (business_date, product_id) DO UPDATE
+        SET times_ordered  = sales_daily_products.times_ordered + EXCLUDED.times_ordered,
+            total_quantity = sales_daily_products.total_quantity + EXCLUDED.total_quantity,
+            total_revenue  = sales_daily_products.total_revenue + EXCLUDED.total_revenue;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sales_rollup_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- BEFORE DELETE: the items are still there (they go by cascade)
+        PERFORM sales_rollup_apply(OLD, -1);
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        IF (OLD.status, OLD.total, OLD.tax, OLD.order_type, OLD.business_date)
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.total, NEW.tax, NEW.order_type, NEW.business_date) THEN
+            RETURN NEW;
+        END IF;
+        PERFORM sales_rollup_apply(OLD, -1);
+    END IF;
+
+    PERFORM sales_rollup_apply(NEW, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sales_rollup_apply_items(items order_items[], sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+    SELECT o.business_date, i.product_id,
+           sign * COUNT(*), sign * SUM(i.quantity), sign * SUM(i.subtotal)
+    FROM unnest(items) i
+    JOIN orders o ON o.id = i.order_id
+    WHERE o.status = 'completed'
+    GROUP BY 1, 2
+    ON CONFLICT (business_date, product_id) DO UPDATE
+    SET times_ordered  = sales_daily_products.times_ordered + EXCLUDED.times_ordered,
+        total_quantity = sales_daily_products.total_quantity + EXCLUDED.total_quantity,
+        total_revenue  = sales_daily_products.total_revenue + EXCLUDED.total_revenue;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the rollups by business_date
+LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE;
+
+TRUNCATE sales_daily, sales_daily_products;
+
+INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+SELECT business_date, order_type, status, COUNT(*), SUM(total), SUM(tax)
+FROM orders
+WHERE status IN ('completed', 'cancelled')
+GROUP BY 1, 2, 3;
+
+INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+SELECT o.business_date, oi.product_id, COUNT(*), SUM(oi.quantity), SUM(oi.subtotal)
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE o.status = 'completed'
+GROUP BY 1, 2;
+
+COMMIT;
+
+\echo '✅ Migration 007 completed successfully'
@@ -0,0 +1,74 @@
+-- =============================================================
+-- Migration 008: NOTIFY reports_changed with the affected business days
+-- =============================================================
+-- The API caches report results per worker (app/core/report_cache.py).
+-- Past business days are cached with no expiry, so every write that can
+-- change a report must say which days it touched. These triggers send
+--     pg_notify('reports_changed', '<business_date>')
+-- from orders and order_items writes. Postgres delivers it on COMMIT and
+-- merges identical payloads within a transaction, so a batch of orders for
+-- the same day costs a single notification.
+--
+-- Orders updates that cannot change a report (payment_method, notes...)
+-- are skipped. A payload of '*' (sales_rollup rebuilds, admin purge) drops
+-- every cached report.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+CREATE OR REPLACE FUNCTION notify_reports_changed_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF TG_OP = 'UPDATE'
+           AND (OLD.status, OLD.total, OLD.tax, OLD.order_type, OLD.business_date)
+               IS NOT DISTINCT FROM
+               (NEW.status, NEW.total, NEW.tax, NEW.order_type, NEW.business_date) THEN
+            RETURN NULL;
+        END IF;
+        PERFORM pg_notify('reports_changed', OLD.business_date::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('reports_changed', NEW.business_date::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Items change top-products for the day of their order (set-based)
+CREATE OR REPLACE FUNCTION notify_reports_changed_items()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Each transition table only exists for its own event
+    IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('reports_changed', d::text)
+        FROM (SELECT DISTINCT o.business_date AS d FROM new_items i JOIN orders o ON o.id = i.order_id) days;
+    ELSE
+        PERFORM pg_notify('reports_changed', d::text)
+        FROM (SELECT DISTINCT o.business_date AS d FROM old_items i JOIN orders o ON o.id = i.order_id) days;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_reports_changed ON orders;
+CREATE TRIGGER trigger_notify_reports_changed
+    AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_reports_changed_orders();
+
+DROP TRIGGER IF EXISTS trigger_notify_reports_changed_items_insert ON order_items;
+CREATE TRIGGER trigger_notify_reports_changed_items_insert
+    AFTER INSERT ON order_items
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_reports_changed_items();
+
+DROP TRIGGER IF EXISTS trigger_notify_reports_changed_items_delete ON order_items;
+CREATE TRIGGER trigger_notify_reports_changed_items_delete
+    AFTER DELETE ON order_items
+    REFERENCING OLD TABLE AS old_items
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_reports_changed_items();
+
+\echo '✅ Migration 008 completed successfully'
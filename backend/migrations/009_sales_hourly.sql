@@ -0,0 +1,132 @@
+-- =============================================================
+-- Migration 009: Hourly sales rollup for the hour-of-week heatmap
+-- =============================================================
+-- GET /api/reports/heatmap returns orders and revenue per (weekday, hour)
+-- over a range of business days. This table holds completed orders per
+-- business day x local hour x order_type, maintained by the same triggers
+-- as the daily rollups (migrations 006/007):
+--
+--   sales_hourly  business_date x hour x order_type (completed orders only)
+--
+-- `hour` is the local clock hour (BUSINESS_TIMEZONE, from
+-- business_day_config) of created_at. The weekday is that of the business
+-- day, so with a 04:00 cutoff an order at 01:30 on Saturday counts as
+-- Friday, hour 1: the Friday night shift.
+--
+-- created_at is now also compared by the rollup and reports_changed
+-- triggers: moving an order within its business day changes its hour.
+--
+-- Rebuilt together with the other rollups by
+--     python -m app.services.sales_rollup [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    business_date DATE NOT NULL,
+    hour          SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    order_type    VARCHAR(20) NOT NULL,
+    orders_count  INTEGER NOT NULL DEFAULT 0,
+    total_sales   DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (business_date, hour, order_type)
+);
+
+CREATE OR REPLACE FUNCTION order_local_hour(ts TIMESTAMP)
+RETURNS SMALLINT AS $$
+    SELECT EXTRACT(HOUR FROM (ts AT TIME ZONE 'UTC') AT TIME ZONE c.timezone)::smallint
+    FROM business_day_config c
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION sales_rollup_apply(o orders, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF o.status NOT IN ('completed', 'cancelled') THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO sales_daily (business_date, order_type, status, orders_count, total_sales, total_tax)
+    VALUES (o.business_date, o.order_type, o.status, sign, sign * o.total, sign * o.tax)
+    ON CONFLICT (business_date, order_type, status) DO UPDATE
+    SET orders_count = sales_daily.orders_count + EXCLUDED.orders_count,
+        total_sales  = sales_daily.total_sales + EXCLUDED.total_sales,
+        total_tax    = sales_daily.total_tax + EXCLUDED.total_tax;
+
+    IF o.status = 'completed' THEN
+        INSERT INTO sales_hourly (business_date, hour, order_type, orders_count, total_sales)
+        VALUES (o.business_date, order_local_hour(o.created_at), o.order_type, sign, sign * o.total)
+        ON CONFLICT (business_date, hour, order_type) DO UPDATE
+        SET orders_count = sales_hourly.orders_count + EXCLUDED.orders_count,
+            total_sales  = sales_hourly.total_sales + EXCLUDED.total_sales;
+
+        INSERT INTO sales_daily_products (business_date, product_id, times_ordered, total_quantity, total_revenue)
+        SELECT o.business_date, oi.product_id,
+               sign * COUNT(*), sign * SUM(oi.quantity), sign * SUM(oi.subtotal)
+        FROM order_items oi
+        WHERE oi.order_id = o.id
+        GROUP BY oi.product_id
+        ON CONFLICT (business_date, product_id) DO UPDATE
+        SET times_ordered  = sales_daily_products.times_ordered + EXCLUDED.times_ordered,
+            total_quantity = sales_daily_products.total_quantity + EXCLUDED.total_quantity,
+            total_revenue  = sales_daily_products.total_revenue + EXCLUDED.total_revenue;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sales_rollup_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- BEFORE DELETE: the items are still there (they go by cascade)
+        PERFORM sales_rollup_apply(OLD, -1);
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        IF (OLD.status, OLD.total, OLD.tax, OLD.order_type, OLD.business_date, OLD.created_at)
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.total, NEW.tax, NEW.order_type, NEW.business_date, NEW.created_at) THEN
+            RETURN NEW;
+        END IF;
+        PERFORM sales_rollup_apply(OLD, -1);
+    END IF;
+
+    PERFORM sales_rollup_apply(NEW, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_reports_changed_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF TG_OP = 'UPDATE'
+           AND (OLD.status, OLD.total, OLD.tax, OLD.order_type, OLD.business_date, OLD.created_at)
+               IS NOT DISTINCT FROM
+               (NEW.status, NEW.total, NEW.tax, NEW.order_type, NEW.business_date, NEW.created_at) THEN
+            RETURN NULL;
+        END IF;
+        PERFORM pg_notify('reports_changed', OLD.business_date::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('reports_changed', NEW.business_date::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill under the same lock as the other rollups
+LOCK TABLE orders, order_items IN SHARE ROW EXCLUSIVE MODE;
+
+TRUNCATE sales_hourly;
+
+INSERT INTO sales_hourly (business_date, hour, order_type, orders_count, total_sales)
+SELECT business_date, order_local_hour(created_at), order_type, COUNT(*), SUM(total)
+FROM orders
+WHERE status = 'completed'
+GROUP BY 1, 2, 3;
+
+COMMIT;
+
+\echo '✅ Migration 009 completed successfully'
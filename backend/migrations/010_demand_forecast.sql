@@ -0,0 +1,36 @@
+-- =============================================================
+-- Migration 010: Stored demand forecasts per hour and product
+-- =============================================================
+-- A background job (app/services/demand_forecast.py) predicts, for the next
+-- FORECAST_DAYS business days, the completed orders per local hour and the
+-- quantity of each product per hour, from a seasonal EWMA over the same
+-- weekday and hour of the last FORECAST_HISTORY_WEEKS weeks.
+--
+--   demand_forecast_hourly    business day x hour            expected_orders
+--   demand_forecast_products  business day x hour x product expected_quantity
+--
+-- Each run replaces the forecasts from the current business day onwards;
+-- past days are kept to compare against what was actually sold.
+-- GET /api/reports/forecast only reads these tables.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+CREATE TABLE IF NOT EXISTS demand_forecast_hourly (
+    business_date   DATE NOT NULL,
+    hour            SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    expected_orders DECIMAL(10, 2) NOT NULL,
+    generated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (business_date, hour)
+);
+
+CREATE TABLE IF NOT EXISTS demand_forecast_products (
+    business_date     DATE NOT NULL,
+    hour              SMALLINT NOT NULL CHECK (hour BETWEEN 0 AND 23),
+    product_id        INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    expected_quantity DECIMAL(10, 2) NOT NULL,
+    generated_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (business_date, hour, product_id)
+);
+
+\echo '✅ Migration 010 completed successfully'
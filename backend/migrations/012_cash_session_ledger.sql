@@ -0,0 +1,151 @@
+-- =============================================================
+-- Migration 012: Cash session totals from the payments ledger
+-- =============================================================
+-- Every payment used to add its amounts to the open cash_sessions row twice:
+-- once in POST /cash/payments and once more in the AFTER INSERT trigger of
+-- cash_register.sql (with the cash handed over instead of the sale). All
+-- tills paying at the same time queued on that one row lock.
+--
+-- Now payments is the ledger (the API only inserts into it) and the totals
+-- of a session are
+--
+--   cash_sessions.total_*            folded in when the session is closed
+--                                    (and whatever it held before this
+--                                    migration, e.g. demo data)
+-- + SUM(cash_session_totals.*)       sharded counters of the payments since
+--
+-- cash_session_totals has one row per session and shard; a payment adds to
+-- shard pg_backend_pid() % 16, so tills on different connections update
+-- different rows and never wait for each other. The cash_session_balances
+-- view returns cash_sessions with the sums applied: read it, not the
+-- total_* columns. POST /cash/sessions/{id}/close folds the shards into
+-- cash_sessions (and deletes them) in the same transaction.
+--
+-- payments.cash_sales / card_sales are the sale split of each payment
+-- (generated columns, so the backfill is automatic):
+--   cash  -> total_amount in cash
+--   card  -> total_amount on card
+--   mixed -> card_amount on card, the rest of the total in cash
+--
+-- Open sessions with payments get their totals rebuilt from the ledger
+-- (they were double counted). Closed sessions keep their totals, which
+-- match the expected_amount / difference computed when they were closed.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+ALTER TABLE payments
+    ADD COLUMN IF NOT EXISTS cash_sales DECIMAL(10, 2) GENERATED ALWAYS AS (
+        CASE payment_type
+            WHEN 'cash' THEN total_amount
+            WHEN 'card' THEN 0
+            ELSE total_amount - COALESCE(card_amount, 0)
+        END) STORED,
+    ADD COLUMN IF NOT EXISTS card_sales DECIMAL(10, 2) GENERATED ALWAYS AS (
+        CASE payment_type
+            WHEN 'cash' THEN 0
+            WHEN 'card' THEN total_amount
+            ELSE COALESCE(card_amount, 0)
+        END) STORED;
+
+CREATE TABLE IF NOT EXISTS cash_session_totals (
+    cash_session_id  INTEGER NOT NULL REFERENCES cash_sessions(id) ON DELETE CASCADE,
+    shard            SMALLINT NOT NULL,
+    total_cash_sales DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    total_card_sales DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    total_sales      DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    total_tips       DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    orders_count     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cash_session_id, shard)
+);
+
+CREATE OR REPLACE FUNCTION cash_session_totals_apply(p payments, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p.cash_session_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO cash_session_totals (cash_session_id, shard, total_cash_sales, total_card_sales,
+                                     total_sales, total_tips, orders_count)
+    VALUES (p.cash_session_id, pg_backend_pid() % 16, sign * p.cash_sales, sign * p.card_sales,
+            sign * p.total_amount, sign * COALESCE(p.tip_amount, 0), sign)
+    ON CONFLICT (cash_session_id, shard) DO UPDATE
+    SET total_cash_sales = cash_session_totals.total_cash_sales + EXCLUDED.total_cash_sales,
+        total_card_sales = cash_session_totals.total_card_sales + EXCLUDED.total_card_sales,
+        total_sales      = cash_session_totals.total_sales      + EXCLUDED.total_sales,
+        total_tips       = cash_session_totals.total_tips       + EXCLUDED.total_tips,
+        orders_count     = cash_session_totals.orders_count     + EXCLUDED.orders_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cash_session_totals_payments()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Pagos borrados en cascada con su orden
+        PERFORM cash_session_totals_apply(OLD, -1);
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM cash_session_totals_apply(OLD, -1);
+    END IF;
+    PERFORM cash_session_totals_apply(NEW, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE VIEW cash_session_balances AS
+SELECT s.id, s.user_id, s.status, s.opening_amount, s.closing_amount,
+       s.expected_amount, s.difference,
+       COALESCE(s.total_cash_sales, 0) + COALESCE(t.total_cash_sales, 0) AS total_cash_sales,
+       COALESCE(s.total_card_sales, 0) + COALESCE(t.total_card_sales, 0) AS total_card_sales,
+       COALESCE(s.total_sales, 0)      + COALESCE(t.total_sales, 0)      AS total_sales,
+       COALESCE(s.total_tips, 0)       + COALESCE(t.total_tips, 0)       AS total_tips,
+       COALESCE(s.orders_count, 0)     + COALESCE(t.orders_count, 0)     AS orders_count,
+       s.opened_at, s.closed_at, s.notes
+FROM cash_sessions s
+LEFT JOIN LATERAL (
+    SELECT SUM(total_cash_sales) AS total_cash_sales, SUM(total_card_sales) AS total_card_sales,
+           SUM(total_sales) AS total_sales, SUM(total_tips) AS total_tips,
+           SUM(orders_count)::integer AS orders_count
+    FROM cash_session_totals
+    WHERE cash_session_id = s.id
+) t ON TRUE;
+
+-- No payment may be inserted while the totals are rebuilt
+LOCK TABLE payments, cash_sessions IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_update_cash_session_totals ON payments;
+DROP FUNCTION IF EXISTS update_cash_session_totals();
+
+DELETE FROM cash_session_totals t
+USING cash_sessions s
+WHERE s.id = t.cash_session_id AND s.status = 'open';
+
+UPDATE cash_sessions s
+SET total_cash_sales = l.cash_sales,
+    total_card_sales = l.card_sales,
+    total_sales      = l.total_sales,
+    total_tips       = l.tips,
+    orders_count     = l.orders
+FROM (
+    SELECT cash_session_id, SUM(cash_sales) AS cash_sales, SUM(card_sales) AS card_sales,
+           SUM(total_amount) AS total_sales, SUM(COALESCE(tip_amount, 0)) AS tips, COUNT(*) AS orders
+    FROM payments
+    GROUP BY cash_session_id
+) l
+WHERE l.cash_session_id = s.id AND s.status = 'open';
+
+DROP TRIGGER IF EXISTS trg_cash_session_totals ON payments;
+CREATE TRIGGER trg_cash_session_totals
+    AFTER INSERT OR DELETE OR UPDATE OF cash_session_id, payment_type, total_amount, card_amount, tip_amount
+    ON payments
+    FOR EACH ROW
+    EXECUTE FUNCTION cash_session_totals_payments();
+
+COMMIT;
+
+\echo '✅ Migration 012 completed successfully'
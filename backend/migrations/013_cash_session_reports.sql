@@ -0,0 +1,26 @@
+-- =============================================================
+-- Migration 013: Z-report snapshot of closed cash sessions
+-- =============================================================
+-- POST /cash/sessions/{id}/close stores the session summary (totals by
+-- payment type, tips, order counts, top products and the payment list) as
+-- one JSONB document, in the same transaction as the close. GET
+-- /cash/sessions/{id}/summary of a closed session is then a primary-key
+-- fetch of that document; open sessions are still computed live.
+--
+-- Sessions closed before this migration get their snapshot the first time
+-- their summary is read.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS cash_session_reports (
+    cash_session_id INTEGER PRIMARY KEY REFERENCES cash_sessions(id) ON DELETE CASCADE,
+    report          JSONB NOT NULL,
+    created_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMIT;
+
+\echo '✅ Migration 013 completed successfully'
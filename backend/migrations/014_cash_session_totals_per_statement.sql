@@ -0,0 +1,127 @@
+-- =============================================================
+-- Migration 014: One session-total update per payments INSERT
+-- =============================================================
+-- POST /cash/payments/batch inserts the partial payments of a split bill
+-- (possibly several orders of merged tables) with one INSERT. The row
+-- trigger of migration 012 upserted the shard once per payment; inserts
+-- now go through a statement trigger that adds the whole statement per
+-- session (transition table), so a batch is a single counter update.
+-- Deletes get their own statement trigger (a trigger with a transition
+-- table can only have one event); UPDATE keeps the row trigger.
+--
+-- orders_count counts orders, not payments: an order adds 1 to the session
+-- of its first payment (lowest id) and the rest of a split bill adds 0.
+-- Both endpoints lock the order before paying it, so its first payment is
+-- always committed before the next one is inserted.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+-- Row trigger (UPDATE): orders_count moves with the order's first payment
+CREATE OR REPLACE FUNCTION cash_session_totals_apply(p payments, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p.cash_session_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO cash_session_totals (cash_session_id, shard, total_cash_sales, total_card_sales,
+                                     total_sales, total_tips, orders_count)
+    VALUES (p.cash_session_id, pg_backend_pid() % 16, sign * p.cash_sales, sign * p.card_sales,
+            sign * p.total_amount, sign * COALESCE(p.tip_amount, 0),
+            CASE WHEN EXISTS (SELECT 1 FROM payments WHERE order_id = p.order_id AND id < p.id)
+                 THEN 0 ELSE sign END)
+    ON CONFLICT (cash_session_id, shard) DO UPDATE
+    SET total_cash_sales = cash_session_totals.total_cash_sales + EXCLUDED.total_cash_sales,
+        total_card_sales = cash_session_totals.total_card_sales + EXCLUDED.total_card_sales,
+        total_sales      = cash_session_totals.total_sales      + EXCLUDED.total_sales,
+        total_tips       = cash_session_totals.total_tips       + EXCLUDED.total_tips,
+        orders_count     = cash_session_totals.orders_count     + EXCLUDED.orders_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cash_session_totals_payments()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM cash_session_totals_apply(OLD, -1);
+    PERFORM cash_session_totals_apply(NEW, 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The inserted rows are already visible in payments: an order's first
+-- payment is the one with no lower id, in this statement or before it
+CREATE OR REPLACE FUNCTION cash_session_totals_inserted()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO cash_session_totals (cash_session_id, shard, total_cash_sales, total_card_sales,
+                                     total_sales, total_tips, orders_count)
+    SELECT i.cash_session_id, pg_backend_pid() % 16, SUM(i.cash_sales), SUM(i.card_sales),
+           SUM(i.total_amount), SUM(COALESCE(i.tip_amount, 0)),
+           COUNT(*) FILTER (WHERE NOT EXISTS (
+               SELECT 1 FROM payments p WHERE p.order_id = i.order_id AND p.id < i.id))
+    FROM inserted i
+    WHERE i.cash_session_id IS NOT NULL
+    GROUP BY i.cash_session_id
+    ON CONFLICT (cash_session_id, shard) DO UPDATE
+    SET total_cash_sales = cash_session_totals.total_cash_sales + EXCLUDED.total_cash_sales,
+        total_card_sales = cash_session_totals.total_card_sales + EXCLUDED.total_card_sales,
+        total_sales      = cash_session_totals.total_sales      + EXCLUDED.total_sales,
+        total_tips       = cash_session_totals.total_tips       + EXCLUDED.total_tips,
+        orders_count     = cash_session_totals.orders_count     + EXCLUDED.orders_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The deleted rows are gone from payments: a first payment has no lower
+-- id among what is left or what the same statement deleted
+CREATE OR REPLACE FUNCTION cash_session_totals_deleted()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO cash_session_totals (cash_session_id, shard, total_cash_sales, total_card_sales,
+                                     total_sales, total_tips, orders_count)
+    SELECT d.cash_session_id, pg_backend_pid() % 16, -SUM(d.cash_sales), -SUM(d.card_sales),
+           -SUM(d.total_amount), -SUM(COALESCE(d.tip_amount, 0)),
+           -COUNT(*) FILTER (WHERE NOT EXISTS (
+               SELECT 1 FROM payments p WHERE p.order_id = d.order_id AND p.id < d.id
+           ) AND NOT EXISTS (
+               SELECT 1 FROM deleted e WHERE e.order_id = d.order_id AND e.id < d.id))
+    FROM deleted d
+    WHERE d.cash_session_id IS NOT NULL
+    GROUP BY d.cash_session_id
+    ON CONFLICT (cash_session_id, shard) DO UPDATE
+    SET total_cash_sales = cash_session_totals.total_cash_sales + EXCLUDED.total_cash_sales,
+        total_card_sales = cash_session_totals.total_card_sales + EXCLUDED.total_card_sales,
+        total_sales      = cash_session_totals.total_sales      + EXCLUDED.total_sales,
+        total_tips       = cash_session_totals.total_tips       + EXCLUDED.total_tips,
+        orders_count     = cash_session_totals.orders_count     + EXCLUDED.orders_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_cash_session_totals ON payments;
+CREATE TRIGGER trg_cash_session_totals
+    AFTER UPDATE OF cash_session_id, payment_type, total_amount, card_amount, tip_amount
+    ON payments
+    FOR EACH ROW
+    EXECUTE FUNCTION cash_session_totals_payments();
+
+DROP TRIGGER IF EXISTS trg_cash_session_totals_insert ON payments;
+CREATE TRIGGER trg_cash_session_totals_insert
+    AFTER INSERT ON payments
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION cash_session_totals_inserted();
+
+DROP TRIGGER IF EXISTS trg_cash_session_totals_delete ON payments;
+CREATE TRIGGER trg_cash_session_totals_delete
+    AFTER DELETE ON payments
+    REFERENCING OLD TABLE AS deleted
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION cash_session_totals_deleted();
+
+COMMIT;
+
+\echo '✅ Migration 014 completed successfully'
@@ -0,0 +1,34 @@
+-- =============================================================
+-- Migration 015: Idempotency keys for order and payment POSTs
+-- =============================================================
+-- POST /api/orders, POST /api/cash/payments and POST /api/cash/payments/batch
+-- accept an `Idempotency-Key` header (app/core/idempotency.py). The key is
+-- claimed with an INSERT in the request's own transaction and the response
+-- is stored before the commit, so either both the write and its response
+-- are kept or neither is. A retry with the same key gets the stored
+-- response back without running the request again; a retry that arrives
+-- while the first request is still running waits for it on the primary
+-- key.
+--
+-- Rows older than IDEMPOTENCY_TTL_HOURS are deleted by a periodic job.
+--
+-- Safe to run multiple times.
+-- =============================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope        VARCHAR(50) NOT NULL,
+    key          VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code  SMALLINT,
+    response     JSONB,
+    created_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
+
+COMMIT;
+
+\echo '✅ Migration 015 completed successfully'
@@ -0,0 +1,55 @@
+"""
+Tests for the in-memory active cash session registry.
+"""
+from app.core import active_session as registry_module
+from app.core.active_session import ActiveSessionRegistry
+from app.repositories.cash_repository import ACTIVE_SESSION_ID_SQL
+
+
+def test_queries_every_time_while_listener_is_down(make_conn):
+    registry, conn = ActiveSessionRegistry(), make_conn(fetchone={"id": 7})
+    assert registry.get_id(conn) == 7
+    assert registry.get_id(conn) == 7
+    assert conn.cursor.return_value.execute.call_count == 2
+
+
+def test_loads_once_until_cash_sessions_change(listening, make_conn):
+    registry, conn = ActiveSessionRegistry(), make_conn(fetchone={"id": 7})
+    assert [registry.get_id(conn) for _ in range(3)] == [7, 7, 7]
+    conn.cursor.return_value.execute.assert_called_once_with(ACTIVE_SESSION_ID_SQL)
+
+    registry._on_resources_changed("tables")
+    registry.get_id(conn)
+    assert conn.cursor.return_value.execute.call_count == 1
+
+    registry._on_resources_changed("cash_sessions")
+    assert registry.get_id(make_conn(fetchone=lambda: None)) is None
+    assert registry.get_id(conn) is None  # "ninguna abierta" también se guarda
+
+
+def test_open_updates_this_worker_without_a_query(listening, make_conn):
+    registry = ActiveSessionRegistry()
+    registry.set(9)
+    conn = make_conn(fetchone={"id": 1})
+    assert registry.get_id(conn) == 9
+    conn.cursor.return_value.execute.assert_not_called()
+
+
+def test_load_overlapping_invalidation_is_not_stored(listening, make_conn):
+    registry = ActiveSessionRegistry()
+
+    def load_then_invalidate():
+        registry.invalidate()
+        return {"id": 7}
+
+    stale = make_conn(fetchone=load_then_invalidate)
+    assert registry.get_id(stale) == 7
+    assert registry.get_id(make_conn(fetchone={"id": 8})) == 8
+
+
+def test_replica_reads_are_not_stored(listening, monkeypatch, make_conn):
+    registry = ActiveSessionRegistry()
+    monkeypatch.setattr(registry_module, "read_staleness", lambda conn: 5.0)
+    registry.get_id(make_conn(fetchone={"id": 7}))
+    monkeypatch.setattr(registry_module, "read_staleness", lambda conn: 0.0)
+    assert registry.get_id(make_conn(fetchone={"id": 8})) == 8
@@ -8,6 +8,14 @@ Routes (prefix /api/auth):
   GET  /perfil        - User profile
   GET  /users-list    - List users
 """
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from app import security
+from app.main import app
+from app.security import obtener_usuario_actual
+from tests.conftest import override_obtener_usuario_actual
 
 
 def test_login_requires_credentials(client):
@@ -28,10 +36,6 @@ def test_login_returns_response(client):
 
 def test_verificar_without_auth_header(client):
     """Test verificar without Authorization header returns 401/403"""
-    from app.main import app
-    from app.security import obtener_usuario_actual
-    from tests.conftest import override_obtener_usuario_actual
-    
     app.dependency_overrides.pop(obtener_usuario_actual, None)
     try:
         response = client.get("/api/auth/verificar")
@@ -42,10 +46,6 @@ def test_verificar_without_auth_header(client):
 
 def test_verificar_with_invalid_token(client):
     """Test verificar with invalid token returns 401/403"""
-    from app.main import app
-    from app.security import obtener_usuario_actual
-    from tests.conftest import override_obtener_usuario_actual
-    
     app.dependency_overrides.pop(obtener_usuario_actual, None)
     try:
         response = client.get("/api/auth/verificar", headers={
@@ -58,10 +58,6 @@ def test_verificar_with_invalid_token(client):
 
 def test_perfil_without_auth(client):
     """Test perfil endpoint without auth returns 401/403"""
-    from app.main import app
-    from app.security import obtener_usuario_actual
-    from tests.conftest import override_obtener_usuario_actual
-    
     app.dependency_overrides.pop(obtener_usuario_actual, None)
     try:
         response = client.get("/api/auth/perfil")
@@ -72,13 +68,30 @@ def test_perfil_without_auth(client):
 
 def test_users_list_without_auth(client):
     """Test users-list endpoint requires auth"""
-    from app.main import app
-    from app.security import obtener_usuario_actual
-    from tests.conftest import override_obtener_usuario_actual
-    
     app.dependency_overrides.pop(obtener_usuario_actual, None)
     try:
         response = client.get("/api/auth/users-list")
         assert response.status_code in [401, 403]
     finally:
         app.dependency_overrides[obtener_usuario_actual] = override_obtener_usuario_actual
+
+
+def test_current_user_releases_async_connection_before_the_route(monkeypatch):
+    """The user lookup must not hold an async pool connection for the whole request"""
+    events = []
+    conn = MagicMock()
+    conn.cursor.return_value.execute = AsyncMock()
+    conn.cursor.return_value.fetchone = AsyncMock(return_value={"id": 1, "role": "admin", "is_active": True})
+
+    @asynccontextmanager
+    async def fake_connection():
+        events.append("acquired")
+        yield conn
+        events.append("released")
+
+    monkeypatch.setattr(security, "async_connection", fake_connection)
+    token = security.crear_token({"id": 1, "username": "admin", "email": "a@a.com", "role": "admin"})
+    usuario = asyncio.run(security.obtener_usuario_actual(token))
+
+    assert usuario["id"] == 1
+    assert events == ["acquired", "released"]
@@ -0,0 +1,47 @@
+"""
+Tests for the business-day model (timezone + cutoff hour).
+"""
+from datetime import date, datetime
+
+import pytest
+
+from app.core import business_day
+from app.core.business_day import business_date, day_bounds, range_bounds
+
+
+@pytest.fixture
+def dublin_4am(monkeypatch):
+    monkeypatch.setattr(business_day.settings, "BUSINESS_TIMEZONE", "Europe/Dublin")
+    monkeypatch.setattr(business_day.settings, "BUSINESS_DAY_CUTOFF_HOUR", 4)
+
+
+def test_defaults_match_calendar_day_in_utc():
+    assert day_bounds(date(2025, 3, 1)) == (datetime(2025, 3, 1), datetime(2025, 3, 2))
+    assert business_date(datetime(2025, 3, 1, 23, 59)) == date(2025, 3, 1)
+
+
+def test_sale_after_midnight_belongs_to_previous_day(dublin_4am):
+    # 01:30 hora de Dublín en verano (UTC+1) = 00:30 UTC
+    assert business_date(datetime(2025, 7, 12, 0, 30)) == date(2025, 7, 11)
+    assert business_date(datetime(2025, 7, 12, 3, 0)) == date(2025, 7, 12)
+
+
+def test_bounds_are_half_open_utc_and_follow_dst(dublin_4am):
+    # Verano: 04:00 local = 03:00 UTC; invierno: 04:00 local = 04:00 UTC
+    assert day_bounds(date(2025, 7, 11)) == (datetime(2025, 7, 11, 3), datetime(2025, 7, 12, 3))
+    assert day_bounds(date(2025, 1, 10)) == (datetime(2025, 1, 10, 4), datetime(2025, 1, 11, 4))
+    # La hora se adelanta la madrugada del 30 de marzo: el día de negocio 29 dura 23 horas
+    start, end = day_bounds(date(2025, 3, 29))
+    assert (end - start).total_seconds() == 23 * 3600
+
+
+def test_bounds_and_business_date_agree(dublin_4am):
+    start, end = day_bounds(date(2025, 10, 26))
+    assert business_date(start) == date(2025, 10, 26)
+    assert business_date(end) == date(2025, 10, 27)
+
+
+def test_range_bounds_cover_whole_days(dublin_4am):
+    start, end = range_bounds(date(2025, 1, 1), date(2025, 1, 31))
+    assert (start, end) == (datetime(2025, 1, 1, 4), datetime(2025, 2, 1, 4))
+    assert range_bounds(None, None) == (None, None)
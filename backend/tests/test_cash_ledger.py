@@ -0,0 +1,68 @@
+"""
+Tests for cash session totals derived from the payments ledger (migration 012).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+
+def executed(cursor):
+    return [" ".join(call.args[0].split()) for call in cursor.execute.call_args_list]
+
+
+def session_row(**totals):
+    return {
+        "id": 7, "user_id": 1, "status": "closed", "opening_amount": Decimal("100.00"),
+        "closing_amount": Decimal("150.00"), "expected_amount": Decimal("132.00"),
+        "difference": Decimal("18.00"), "total_cash_sales": Decimal("29.00"),
+        "total_card_sales": Decimal("22.00"), "total_sales": Decimal("51.00"),
+        "total_tips": Decimal("3.00"), "orders_count": 3,
+        "opened_at": datetime(2025, 1, 13, 9), "closed_at": datetime(2025, 1, 13, 22), "notes": None,
+        **totals,
+    }
+
+
+def test_payment_only_appends_to_the_ledger(client, mock_db):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchone.return_value = {"id": 7}  # sesión activa
+    cursor.fetchall.side_effect = [
+        [{"id": 5, "total": Decimal("20.00"), "status": "pending"}],
+        [],  # sin pagos previos
+        [{"id": 1, "order_id": 5, "payment_type": "cash", "total_amount": Decimal("20.00"),
+          "cash_amount": Decimal("25.00"), "card_amount": Decimal("0"), "tip_amount": Decimal("0"),
+          "change_amount": Decimal("5.00"), "created_at": datetime(2025, 1, 13, 12)}],
+    ]
+    response = client.post("/api/cash/payments", json={
+        "order_id": 5, "payment_type": "cash", "cash_amount": 25, "card_amount": 0, "tip_amount": 0,
+    })
+    assert response.status_code == 201, response.text
+    statements = executed(cursor)
+    assert any(s.startswith("INSERT INTO payments") for s in statements)
+    assert not any("UPDATE cash_sessions" in s for s in statements)
+
+
+def test_close_folds_counters_before_computing_expected(client, mock_db):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchone.side_effect = [
+        {"opening_amount": Decimal("100.00"), "user_id": 1},
+        {"total_cash_sales": Decimal("29.00"), "total_card_sales": Decimal("22.00"),
+         "total_sales": Decimal("51.00"), "total_tips": Decimal("3.00"), "orders_count": 3},
+        session_row(),
+        session_row(),  # informe Z
+    ]
+    response = client.post("/api/cash/sessions/7/close", json={"closing_amount": 150})
+    assert response.status_code == 200, response.text
+
+    statements = executed(cursor)
+    assert statements[0].endswith("FOR UPDATE")
+    assert "DELETE FROM cash_session_totals" in statements[1]
+    close_params = cursor.execute.call_args_list[2].args[1]
+    assert close_params[1:3] == (Decimal("132.00"), Decimal("18.00"))
+
+
+def test_sessions_are_read_from_the_balances_view(client, mock_db):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchall.return_value = [session_row()]
+    cursor.fetchone.return_value = session_row(status="open")
+    assert client.get("/api/cash/sessions").json()[0]["total_sales"] == "51.00"
+    assert client.get("/api/cash/sessions/7").status_code == 200
+    assert all("FROM cash_session_balances" in s for s in executed(cursor))
@@ -0,0 +1,38 @@
+"""
+Tests for the process-local catalog cache.
+"""
+from app.core.catalog_cache import CatalogCache
+
+
+def catalog_rows():
+    return [{"id": 1, "name": "Classic Burger", "is_active": True}]
+
+
+def test_bypassed_while_listener_is_down(make_conn):
+    """Without LISTEN the cache could never be invalidated, so it is not used"""
+    cache = CatalogCache()
+    assert cache.get(make_conn(fetchall=catalog_rows)) is None
+    assert cache.get_stats()["bypassed"] == 1
+
+
+def test_second_lookup_is_a_hit(listening, make_conn):
+    cache = CatalogCache()
+    conn = make_conn(fetchall=catalog_rows)
+    first = cache.get(conn)
+    assert cache.get(conn) is first
+    assert conn.cursor.return_value.execute.call_count == 3
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_load_overlapping_invalidation_is_not_stored(listening, make_conn):
+    cache = CatalogCache()
+    conn = make_conn(fetchall=catalog_rows)
+    cursor = conn.cursor.return_value
+
+    def invalidate_mid_load(query):
+        cache.invalidate()
+    cursor.execute.side_effect = invalidate_mid_load
+
+    assert cache.get(conn) is not None
+    assert cache.get_stats()["cached"] is False
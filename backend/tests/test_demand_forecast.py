@@ -0,0 +1,45 @@
+"""
+Tests for the demand forecast job.
+"""
+from datetime import date
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.services.demand_forecast import compute, seasonal_ewma
+
+
+def test_seasonal_ewma_weights_recent_weeks_more():
+    history = np.zeros((2, 7, 24))
+    history[0, 3, 20] = 30  # hace dos semanas
+    history[1, 3, 20] = 60  # la semana pasada
+    forecast = seasonal_ewma(history, alpha=0.5)
+    # pesos 0.25 y 0.5, normalizados a 1/3 y 2/3
+    assert forecast[3, 20] == pytest.approx(50)
+    assert forecast.shape == (7, 24)
+
+
+def test_compute_maps_each_day_to_its_weekday_slot():
+    # Hoy lunes 2025-01-13, 2 semanas: historia del 2024-12-30 (lunes) al 2025-01-12
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [(0, 19, 4), (7, 19, 10)],                  # lunes 19 h: 4 y 10 órdenes
+        [(7, 19, 5, 6), (1, 12, 5, 3), (8, 12, 9, 1)],  # (día, hora, producto, cantidad)
+    ]
+    hourly, products = compute(cursor, date(2025, 1, 13), weeks=2, days=2)
+
+    assert len(hourly) == 48
+    monday_19 = next(r for r in hourly if r[0] == date(2025, 1, 13) and r[1] == 19)
+    assert monday_19[2] == pytest.approx((0.21 * 4 + 0.3 * 10) / 0.51, abs=0.01)
+    assert (date(2025, 1, 13), 19, 5, pytest.approx(6 * 0.3 / 0.51, abs=0.01)) in products
+    # El martes solo tiene productos a las 12 h
+    assert {(r[1], r[2]) for r in products if r[0] == date(2025, 1, 14)} == {(12, 5), (12, 9)}
+
+
+def test_forecast_endpoint_reads_stored_rows(client):
+    response = client.get("/api/reports/forecast?date_from=2025-01-13&days=3")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["date_to"] == "2025-01-15"
+    assert body["generated_at"] is None
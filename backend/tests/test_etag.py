@@ -0,0 +1,89 @@
+"""
+Tests for conditional GET (ETag / 304) on the polled read endpoints.
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from app.core.db_events import NOTIFY_SQL, db_events
+from app.core.etag import resource_versions
+from app.main import app
+from app.security import obtener_usuario_actual
+
+
+def test_guard_is_off_while_listener_is_down(client):
+    response = client.get("/api/categories")
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert response.headers["server-timing"] == 'etag;desc="off"'
+
+
+def test_matching_etag_returns_bare_304(client, listening):
+    first = client.get("/api/tables")
+    assert first.status_code == 200
+    assert 'desc="miss"' in first.headers["server-timing"]
+
+    response = client.get("/api/tables", headers={"If-None-Match": first.headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert 'desc="hit"' in response.headers["server-timing"]
+
+
+def test_bump_invalidates_etag(client, listening):
+    etag = client.get("/api/cash/sessions/active").headers["etag"]
+    resource_versions.bump("cash_sessions")
+    response = client.get("/api/cash/sessions/active", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_unrelated_resource_keeps_etag(client, listening):
+    etag = client.get("/api/categories").headers["etag"]
+    resource_versions.bump("tables")
+    response = client.get("/api/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_excluded_endpoint_has_no_etag(client, listening):
+    response = client.get("/api/products/cache/stats")
+    assert "etag" not in response.headers
+
+
+def test_role_is_checked_before_a_304(client, listening):
+    """A cashier replaying the ETag of a manager-only route gets 403, not 304"""
+    previous = app.dependency_overrides[obtener_usuario_actual]
+    cashier = {**previous(), "role": "cashier"}
+    response = client.get("/api/cash/sessions")
+    etag = response.headers["etag"]
+    app.dependency_overrides[obtener_usuario_actual] = lambda: cashier
+    try:
+        response = client.get("/api/cash/sessions", headers={"If-None-Match": etag})
+    finally:
+        app.dependency_overrides[obtener_usuario_actual] = previous
+    assert response.status_code == 403
+
+
+def test_opening_a_session_invalidates_the_active_session_orders(client, listening, mock_db):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchall.return_value = []
+    cursor.fetchone.side_effect = [
+        {"id": 7},  # sesión activa
+        None,  # el usuario no tiene otra abierta
+        {"id": 8, "user_id": 1, "status": "open", "opening_amount": Decimal("100.00"),
+         "closing_amount": None, "expected_amount": None, "difference": None,
+         "total_cash_sales": Decimal("0"), "total_card_sales": Decimal("0"), "total_sales": Decimal("0"),
+         "total_tips": Decimal("0"), "orders_count": 0, "opened_at": datetime(2025, 1, 13, 9),
+         "closed_at": None, "notes": None},
+        {"id": 8},  # la nueva sesión activa
+    ]
+    etag = client.get("/api/orders?only_active_session=true").headers["etag"]
+
+    assert client.post("/api/cash/sessions", json={"user_id": 1, "opening_amount": 100}).status_code == 201
+    # Postgres entrega el NOTIFY que la ruta dejó en su transacción
+    for call in cursor.execute.call_args_list:
+        if call.args[0] == NOTIFY_SQL:
+            asyncio.run(db_events._dispatch(*call.args[1]))
+
+    response = client.get("/api/orders?only_active_session=true", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert cursor.execute.call_args.args[1][0] == 8
@@ -0,0 +1,110 @@
+"""
+Tests for Idempotency-Key replay on order and payment POSTs.
+"""
+from datetime import datetime
+from decimal import Decimal
+import pytest
+
+from app.core.idempotency import CLAIM_SQL, STORED_SQL, idempotency, request_hash
+from app.models.cash_register import PaymentCreate
+
+PAYMENT = {
+    "id": 1, "order_id": 5, "payment_type": "cash", "total_amount": Decimal("20.00"),
+    "cash_amount": Decimal("25.00"), "card_amount": Decimal("0"), "tip_amount": Decimal("0"),
+    "change_amount": Decimal("5.00"), "created_at": datetime(2025, 1, 13, 12),
+}
+BODY = {"order_id": 5, "payment_type": "cash", "cash_amount": 25, "card_amount": 0, "tip_amount": 0}
+USER = {"id": 1}
+
+
+class FakeCursor:
+    """Routes each statement to a canned result."""
+
+    def __init__(self, claimed=True, stored=None):
+        self.claimed = claimed
+        self.stored = stored
+        self.statements = []
+        self._result = None
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+        if query == CLAIM_SQL:
+            self._result = {"key": params[1]} if self.claimed else None
+        elif query == STORED_SQL:
+            self._result = self.stored
+        elif "FROM orders" in query:
+            self._result = [{"id": 5, "total": Decimal("20.00"), "status": "pending"}]
+        elif "FROM cash_sessions" in query:
+            self._result = {"id": 7}
+        elif "INSERT INTO payments" in query:
+            self._result = [PAYMENT]
+        elif "FROM payments" in query:
+            self._result = []
+        else:
+            self._result = None
+
+    def fetchone(self):
+        return self._result
+
+    def fetchall(self):
+        return self._result
+
+
+@pytest.fixture
+def db(mock_db):
+    idempotency.clear()
+    mock_db.cursor.return_value = FakeCursor()
+    yield mock_db, mock_db.cursor.return_value
+    idempotency.clear()
+
+
+def inserts(cursor):
+    return sum("INSERT INTO payments" in s for s in cursor.statements)
+
+
+def test_retry_is_replayed_from_memory(client, db):
+    conn, cursor = db
+    headers = {"Idempotency-Key": "pay-1"}
+    first = client.post("/api/cash/payments", json=BODY, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    cursor.statements.clear()
+    retry = client.post("/api/cash/payments", json=BODY, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert cursor.statements == []  # ni siquiera consulta la base
+
+
+def test_key_claimed_by_another_worker_is_replayed_from_the_table(client, db):
+    conn, cursor = db
+    stored = {"id": 9, "order_id": 5, "payment_type": "cash", "total_amount": "20.00", "cash_amount": "25.00",
+              "card_amount": "0", "tip_amount": "0", "change_amount": "5.00", "created_at": "2025-01-13T12:00:00"}
+    cursor.claimed = False
+    cursor.stored = {
+        "request_hash": request_hash(USER, PaymentCreate(**BODY)),
+        "status_code": 201, "response": stored, "age_seconds": 30,
+    }
+    response = client.post("/api/cash/payments", json=BODY, headers={"Idempotency-Key": "pay-2"})
+    assert response.status_code == 201
+    assert response.json() == stored
+    assert inserts(cursor) == 0
+    conn.rollback.assert_called()
+
+
+def test_same_key_with_another_body_is_rejected(client, db):
+    conn, cursor = db
+    headers = {"Idempotency-Key": "pay-3"}
+    assert client.post("/api/cash/payments", json=BODY, headers=headers).status_code == 201
+    response = client.post("/api/cash/payments", json={**BODY, "tip_amount": 2}, headers=headers)
+    assert response.status_code == 422
+    assert inserts(cursor) == 1
+
+
+def test_without_key_every_request_runs(client, db):
+    conn, cursor = db
+    for _ in range(2):
+        assert client.post("/api/cash/payments", json=BODY).status_code == 201
+    assert inserts(cursor) == 2
+    assert CLAIM_SQL not in cursor.statements
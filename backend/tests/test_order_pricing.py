@@ -0,0 +1,106 @@
+"""
+Tests for the set-based order pricing and numbering helpers used by POST /api/orders.
+"""
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.order import OrderItemCreate
+from app.repositories.order_repository import (
+    format_order_number, items_insert_params, order_counter_key, orders_items_insert_params,
+    stock_decrement_params
+)
+from app.services.order_pricing import collect_catalog_ids, delivery_fee_for, price_items
+
+PRODUCTS = {
+    1: {"id": 1, "name": "Classic Burger", "price": Decimal("8.50"), "is_available": True},
+    2: {"id": 2, "name": "Fries", "price": Decimal("3.50"), "is_available": False},
+}
+MODIFIERS = {
+    10: {"id": 10, "name": "Extra Cheese", "price": Decimal("1.00")},
+}
+
+
+def test_collect_catalog_ids_deduplicates():
+    """Each product/modifier id is looked up once, whatever the order size"""
+    items = [
+        OrderItemCreate(product_id=1, quantity=1, modifier_ids=[10, 11]),
+        OrderItemCreate(product_id=1, quantity=2, modifier_ids=[10]),
+        OrderItemCreate(product_id=3, quantity=1),
+    ]
+    assert collect_catalog_ids(items) == ([1, 3], [10, 11])
+
+
+def test_price_items_adds_modifiers_and_skips_inactive():
+    """Unknown/inactive modifiers are ignored, as in the per-item flow"""
+    items = [OrderItemCreate(product_id=1, quantity=2, modifier_ids=[10, 99])]
+    priced, total = price_items(items, PRODUCTS, MODIFIERS)
+
+    assert priced[0]["unit_price"] == Decimal("9.50")
+    assert priced[0]["subtotal"] == Decimal("19.00")
+    assert [m["id"] for m in priced[0]["modifiers"]] == [10]
+    assert total == Decimal("19.00")
+
+
+def test_price_items_missing_product_returns_404():
+    with pytest.raises(HTTPException) as exc:
+        price_items([OrderItemCreate(product_id=42, quantity=1)], PRODUCTS, MODIFIERS)
+    assert exc.value.status_code == 404
+    assert exc.value.detail == "Producto 42 no encontrado"
+
+
+def test_price_items_unavailable_product_returns_400():
+    with pytest.raises(HTTPException) as exc:
+        price_items([OrderItemCreate(product_id=2, quantity=1)], PRODUCTS, MODIFIERS)
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Producto Fries no está disponible"
+
+
+def test_insert_params_link_modifiers_to_item_position():
+    items = [
+        OrderItemCreate(product_id=1, quantity=1, modifier_ids=[10]),
+        OrderItemCreate(product_id=1, quantity=1),
+        OrderItemCreate(product_id=1, quantity=1, modifier_ids=[10, 10]),
+    ]
+    priced, _ = price_items(items, PRODUCTS, MODIFIERS)
+    params = items_insert_params(7, priced)
+
+    assert params[0] == [7, 7, 7]
+    assert params[6] == [1, 3, 3]   # posición del item de cada modificador
+    assert params[7] == [10, 10, 10]
+
+
+def test_insert_params_for_several_orders_use_global_positions():
+    priced, _ = price_items(
+        [OrderItemCreate(product_id=1, quantity=1, modifier_ids=[10])], PRODUCTS, MODIFIERS
+    )
+    params = orders_items_insert_params([(7, priced), (8, priced)])
+
+    assert params[0] == [7, 8]
+    assert params[6] == [1, 2]
+
+
+def test_stock_decrement_groups_by_product():
+    priced = [
+        {"product_id": 2, "quantity": 1},
+        {"product_id": 1, "quantity": 2},
+        {"product_id": 2, "quantity": 3},
+    ]
+    assert stock_decrement_params(priced) == ([1, 2], [2, 4])
+
+
+def test_order_numbers_are_per_session_and_keep_format():
+    assert order_counter_key(5) == "session:5"
+    assert order_counter_key(None).startswith("day:")
+    assert format_order_number(5, 7) == "#007"
+    assert format_order_number(None, 12) == "ORD-012"
+
+
+def test_delivery_fee_grows_with_distance_from_the_store():
+    store = {"latitude": Decimal("53.7145"), "longitude": Decimal("-6.3503")}
+    dundalk = {"latitude": Decimal("54.0008"), "longitude": Decimal("-6.4058")}
+    assert delivery_fee_for("takeout", dundalk) == Decimal("0.00")
+    assert delivery_fee_for("delivery", None) == Decimal("3.00")
+    assert delivery_fee_for("delivery", store) == Decimal("3.0")
+    assert delivery_fee_for("delivery", dundalk) > Decimal("30")
@@ -0,0 +1,127 @@
+"""
+Tests for the orders router (DB mocked in conftest).
+"""
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from app.database import get_read_db
+from app.main import app
+from app.routers.orders import MAX_ORDERS_PAGE, _decode_cursor, _encode_cursor
+
+
+def test_get_order_not_found_returns_404(client):
+    response = client.get("/api/orders/1")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Orden no encontrada"
+
+
+def test_orders_details_is_not_captured_by_order_id_route(client):
+    """/details must resolve before /{order_id}"""
+    response = client.get("/api/orders/details?ids=1,2,3")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_orders_details_rejects_non_integer_ids(client):
+    response = client.get("/api/orders/details?ids=1,abc")
+    assert response.status_code == 400
+
+
+def test_orders_details_caps_number_of_ids(client):
+    ids = ",".join(str(i) for i in range(1, 102))
+    response = client.get(f"/api/orders/details?ids={ids}")
+    assert response.status_code == 400
+
+
+def test_orders_cursor_round_trip():
+    position = (datetime(2026, 1, 20, 14, 30, 0, 123456), 42)
+    assert _decode_cursor(_encode_cursor(*position)) == position
+
+
+def test_orders_invalid_cursor_returns_400(client):
+    response = client.get("/api/orders?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor inválido"
+
+
+def test_orders_limit_above_the_page_cap_is_cut_not_rejected(client, mock_db):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchall.return_value = []
+    response = client.get("/api/orders?limit=2000")
+    assert response.status_code == 200
+    assert cursor.execute.call_args.args[1][-1] == MAX_ORDERS_PAGE + 1
+
+
+def test_order_list_stays_on_the_primary_and_history_reads_the_replica(client, listening, mock_db):
+    """The KDS reloads through GET /orders after every event: a lagging replica could miss the new order"""
+    replica = MagicMock()
+    replica.cursor.return_value.fetchall.return_value = []
+    mock_db.cursor.return_value.fetchall.return_value = []
+    app.dependency_overrides[get_read_db] = lambda: replica  # mock_db lo restaura
+
+    assert "etag" in client.get("/api/orders?status=pending").headers
+    assert mock_db.cursor.return_value.execute.called
+    assert not replica.cursor.return_value.execute.called
+
+    response = client.get("/api/orders/history?date_from=2025-01-01&date_to=2025-01-31&status=completed")
+    assert response.status_code == 200
+    assert "etag" not in response.headers  # el ETag sigue al primario, no a la réplica
+    query, params = replica.cursor.return_value.execute.call_args.args
+    assert "o.created_at >= %s AND o.created_at < %s" in query
+    assert params[:2] == [datetime(2025, 1, 1), datetime(2025, 2, 1)]
+
+
+def test_order_history_rejects_inverted_range(client):
+    response = client.get("/api/orders/history?date_from=2025-02-01&date_to=2025-01-01")
+    assert response.status_code == 400
+
+
+def test_live_board_served_from_db_while_not_listening(client):
+    response = client.get("/api/orders/board")
+    assert response.status_code == 200
+    assert response.json() == {"version": None, "up_to_date": False, "orders": []}
+
+
+def test_live_board_drops_finished_orders():
+    from app.core.live_board import LiveBoard
+
+    board = LiveBoard()
+    row = {"id": 7, "status": "pending", "order_number": "#007",
+           "items": [{"id": 1, "product_id": 1, "modifiers": [{"id": 3, "modifier_id": 2}]}]}
+    board._apply([7], [row])
+    assert board._orders[7].items[0].modifiers[0].modifier_id == 2
+
+    board._apply([7], [{**row, "status": "completed"}])
+    assert 7 not in board._orders
+
+
+def test_phone_lines_lists_every_line(client):
+    response = client.get("/api/orders/phone-lines")
+    assert response.status_code == 200
+    lines = response.json()
+    assert [line["line"] for line in lines] == [1, 2, 3, 4]
+    assert not any(line["occupied"] for line in lines)
+
+
+def _batch_order(client_order_id, product_id=1):
+    return {"client_order_id": client_order_id, "order_type": "takeout",
+            "items": [{"product_id": product_id, "quantity": 1}]}
+
+
+def test_orders_batch_reports_per_order_errors(client):
+    ids = ["6f1c3c0e-7a4e-4a36-9d6a-2b4f8f0e1a01", "6f1c3c0e-7a4e-4a36-9d6a-2b4f8f0e1a02"]
+    response = client.post("/api/orders/batch", json={
+        "orders": [_batch_order(ids[0]), _batch_order(ids[1]), _batch_order(ids[1])]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["errors"] == 3
+    assert [r["client_order_id"] for r in body["results"]] == [ids[0], ids[1], ids[1]]
+    assert body["results"][0]["error"] == "Producto 1 no encontrado"
+    assert body["results"][2]["error"] == "client_order_id repetido en el lote"
+
+
+def test_orders_batch_size_is_capped(client):
+    orders = [_batch_order(f"00000000-0000-0000-0000-{i:012d}") for i in range(301)]
+    response = client.post("/api/orders/batch", json={"orders": orders})
+    assert response.status_code == 422
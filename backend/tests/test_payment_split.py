@@ -0,0 +1,130 @@
+"""
+Tests for split-bill batch payments (POST /api/cash/payments/batch).
+"""
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from fastapi import HTTPException
+
+from app.models.cash_register import PaymentCreate
+from app.repositories.cash_repository import CashRepository
+from app.services.payment_split import allocate_payments
+
+
+def pay(order_id, payment_type, cash=0, card=0, tip=0):
+    return PaymentCreate(order_id=order_id, payment_type=payment_type,
+                         cash_amount=cash, card_amount=card, tip_amount=tip)
+
+
+ORDERS = {
+    1: {"id": 1, "total": Decimal("34.00"), "status": "pending", "paid": Decimal("0")},
+    2: {"id": 2, "total": Decimal("17.00"), "status": "pending", "paid": Decimal("5.00")},
+}
+
+
+def test_allocate_splits_bill_and_gives_change_from_cash():
+    rows, balances = allocate_payments(
+        [pay(1, "card", card=10), pay(1, "card", card=10), pay(1, "cash", cash=20), pay(2, "mixed", cash=5, card=5)],
+        ORDERS,
+    )
+    assert [(r["total_amount"], r["change_amount"]) for r in rows] == [
+        (Decimal("10.00"), Decimal("0.00")), (Decimal("10.00"), Decimal("0.00")),
+        (Decimal("14.00"), Decimal("6.00")), (Decimal("10.00"), Decimal("0.00")),
+    ]
+    assert balances == [
+        {"order_id": 1, "total": Decimal("34.00"), "paid": Decimal("34.00"), "remaining": Decimal("0.00")},
+        {"order_id": 2, "total": Decimal("17.00"), "paid": Decimal("15.00"), "remaining": Decimal("2.00")},
+    ]
+
+
+@pytest.mark.parametrize("payments, status_code", [
+    ([pay(2, "card", card=20)], 400),  # tarjeta por encima del saldo
+    ([pay(1, "cash", cash=34), pay(1, "cash", cash=1)], 400),  # ya pagada dentro del lote
+    ([pay(1, "cash")], 400),  # sin importe
+    ([pay(9, "cash", cash=5)], 404),
+])
+def test_allocate_rejects_invalid_payments(payments, status_code):
+    with pytest.raises(HTTPException) as exc:
+        allocate_payments(payments, ORDERS)
+    assert exc.value.status_code == status_code
+
+
+def test_lock_reads_paid_amounts_after_the_orders_are_locked(make_conn):
+    conn = make_conn(fetchall=iter([
+        [{"id": 1, "total": Decimal("34.00"), "status": "pending"},
+         {"id": 2, "total": Decimal("17.00"), "status": "pending"}],
+        [{"order_id": 2, "paid": Decimal("5.00")}],
+    ]).__next__)
+
+    orders = CashRepository(conn).lock_order_balances([2, 1])
+    assert orders == ORDERS
+    lock, paid = [" ".join(call.args[0].split()) for call in conn.cursor.return_value.execute.call_args_list]
+    assert lock.endswith("FOR UPDATE") and "payments" not in lock
+    assert "FROM payments" in paid
+
+
+def test_batch_endpoint_inserts_all_payments_with_one_statement(client, mock_db):
+    conn, cursor = mock_db, mock_db.cursor.return_value
+    cursor.fetchall.side_effect = [
+        [{"id": 1, "total": Decimal("34.00"), "status": "pending"},
+         {"id": 2, "total": Decimal("17.00"), "status": "pending"}],
+        [{"order_id": 2, "paid": Decimal("5.00")}],
+        [{"id": 11 + i, "order_id": order_id, "payment_type": "card", "total_amount": amount,
+          "cash_amount": Decimal("0"), "card_amount": amount, "tip_amount": Decimal("0"),
+          "change_amount": Decimal("0"), "created_at": datetime(2025, 1, 13, 12)}
+         for i, (order_id, amount) in enumerate([(1, Decimal("34.00")), (2, Decimal("12.00"))])],
+    ]
+    cursor.fetchone.return_value = {"id": 7}  # sesión activa
+
+    response = client.post("/api/cash/payments/batch", json={"payments": [
+        {"order_id": 1, "payment_type": "card", "card_amount": 34},
+        {"order_id": 2, "payment_type": "card", "card_amount": 12},
+    ]})
+
+    assert response.status_code == 201, response.text
+    assert [o["remaining"] for o in response.json()["orders"]] == ["0.00", "0.00"]
+    inserts = [c for c in cursor.execute.call_args_list if "INSERT INTO payments" in c.args[0]]
+    assert len(inserts) == 1
+    assert inserts[0].args[1][0] == 7
+    conn.commit.assert_called_once()
+
+
+@pytest.mark.parametrize("cash, status_code", [(12, 201), (10, 400)])
+def test_single_payment_only_charges_what_a_split_left(client, mock_db, cash, status_code):
+    cursor = mock_db.cursor.return_value
+    cursor.fetchone.return_value = {"id": 7}  # sesión activa
+    cursor.fetchall.side_effect = [
+        [{"id": 2, "total": Decimal("17.00"), "status": "pending"}],
+        [{"order_id": 2, "paid": Decimal("5.00")}],
+        [{"id": 12, "order_id": 2, "payment_type": "cash", "total_amount": Decimal("12.00"),
+          "cash_amount": Decimal(cash), "card_amount": Decimal("0"), "tip_amount": Decimal("0"),
+          "change_amount": Decimal("0"), "created_at": datetime(2025, 1, 13, 12)}],
+    ]
+
+    response = client.post("/api/cash/payments", json={"order_id": 2, "payment_type": "cash", "cash_amount": cash})
+    assert response.status_code == status_code, response.text
+    inserts = [c for c in cursor.execute.call_args_list if "INSERT INTO payments" in c.args[0]]
+    if status_code == 201:
+        assert inserts[0].args[1][3] == [Decimal("12.00")]  # total_amount: solo el saldo
+    else:
+        assert response.json()["detail"] == "Monto insuficiente. Total: 12.00, Pagado: 10.00"
+        assert inserts == []
+
+
+def test_single_payment_still_gives_change_on_a_card_over_tender(client, mock_db):
+    """Only the batch endpoint rejects card over-tenders; POST /payments keeps its baseline rule"""
+    cursor = mock_db.cursor.return_value
+    cursor.fetchone.return_value = {"id": 7}  # sesión activa
+    cursor.fetchall.side_effect = [
+        [{"id": 2, "total": Decimal("17.00"), "status": "pending"}],
+        [],  # sin pagos previos
+        [{"id": 12, "order_id": 2, "payment_type": "card", "total_amount": Decimal("17.00"),
+          "cash_amount": Decimal("0"), "card_amount": Decimal("20.00"), "tip_amount": Decimal("0"),
+          "change_amount": Decimal("3.00"), "created_at": datetime(2025, 1, 13, 12)}],
+    ]
+
+    response = client.post("/api/cash/payments", json={"order_id": 2, "payment_type": "card", "card_amount": 20})
+    assert response.status_code == 201, response.text
+    insert = next(c for c in cursor.execute.call_args_list if "INSERT INTO payments" in c.args[0])
+    assert insert.args[1][3] == [Decimal("17.00")]  # total_amount
+    assert insert.args[1][7] == [Decimal("3.00")]  # change_amount
@@ -0,0 +1,52 @@
+"""
+Tests for prep-time percentiles from log-bucket histograms.
+"""
+import math
+
+import pytest
+
+from app.services.prep_time import GAMMA, bucket_seconds, percentiles, summarize
+
+
+def bucket_of(seconds):
+    # Igual que prep_time_bucket() de la migración 011
+    return math.ceil(math.log(max(seconds, 1)) / math.log(GAMMA))
+
+
+@pytest.mark.parametrize("seconds", [1, 45, 300, 599, 3600, 5 * 3600])
+def test_bucket_value_is_within_five_percent(seconds):
+    assert bucket_seconds(bucket_of(seconds)) == pytest.approx(seconds, rel=0.05)
+
+
+def test_percentiles_use_nearest_rank():
+    # 90 órdenes de ~5 min y 10 de ~20 min
+    buckets = [(bucket_of(300), 90), (bucket_of(1200), 10)]
+    stats = percentiles(buckets)
+    assert stats["orders"] == 100
+    assert stats["p50"] == pytest.approx(300, rel=0.05)
+    assert stats["p90"] == pytest.approx(300, rel=0.05)
+    assert stats["p99"] == pytest.approx(1200, rel=0.05)
+    assert percentiles([]) == {"orders": 0, "p50": None, "p90": None, "p99": None}
+
+
+def test_summarize_merges_days_and_drops_empty_groups():
+    rows = [
+        {"order_type": "delivery", "bucket": 60, "orders": 2},
+        {"order_type": "delivery", "bucket": 60, "orders": 1},  # otro día
+        {"order_type": "delivery", "bucket": 70, "orders": 1},
+        {"order_type": "takeout", "bucket": 50, "orders": 0},
+    ]
+    summary = summarize(rows, ["order_type"])
+    assert [(r["order_type"], r["orders"]) for r in summary] == [("delivery", 4)]
+    assert summary[0]["p50"] == round(bucket_seconds(60), 1)
+
+
+def test_prep_times_endpoint(client):
+    response = client.get("/api/reports/prep-times?date_from=2025-01-01&date_to=2025-01-31&group_by=product")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["overall"] == {"orders": 0, "p50": None, "p90": None, "p99": None}
+    assert body["rows"] == []
+
+    response = client.get("/api/reports/prep-times?date_from=2025-01-01&date_to=2025-01-31&group_by=waiter")
+    assert response.status_code == 422
@@ -0,0 +1,142 @@
+"""
+Tests for read-replica routing (database.get_read_db).
+
+The unit tests fake both pools. The integration tests need a primary and a
+streaming standby (docker-compose.replica.yml) and are skipped unless both
+TEST_DATABASE_URL and TEST_REPLICA_URL are set.
+"""
+import os
+import time
+from unittest.mock import MagicMock
+
+import psycopg2
+import pytest
+
+from app import database
+from app.config import settings
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TEST_REPLICA_URL = os.getenv("TEST_REPLICA_URL")
+
+
+class FakePool:
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.out = 0
+
+    def getconn(self):
+        if self.error:
+            raise self.error
+        self.out += 1
+        conn = MagicMock(closed=0)
+        conn.source = self.name
+        return conn
+
+    def putconn(self, conn, close=False):
+        self.out -= 1
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    primary, replica = FakePool("primary"), FakePool("replica")
+    monkeypatch.setattr(database, "_get_pool", lambda: primary)
+    monkeypatch.setattr(database, "_get_replica_pool", lambda: replica)
+    monkeypatch.setattr(database, "_replica_state", {"usable": False, "lag_seconds": None, "checked_at": None, "error": None})
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", "postgresql://replica/burger_pos")
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_MAX_LAG_SECONDS", 5.0)
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_CHECK_SECONDS", 2.0)
+    return primary, replica
+
+
+def read_source():
+    dependency = database.get_read_db()
+    conn = next(dependency)
+    dependency.close()
+    return conn.source
+
+
+def test_reads_from_replica_when_caught_up(pools, monkeypatch):
+    primary, replica = pools
+    monkeypatch.setattr(database, "_measure_lag", lambda conn: 0.3)
+    assert read_source() == "replica"
+    assert (primary.out, replica.out) == (0, 0)
+    assert database.replica_status()["usable"] is True
+
+
+def test_lagging_replica_falls_back_until_next_check(pools, monkeypatch):
+    lag = [30.0]
+    checks = []
+
+    def measure(conn):
+        checks.append(lag[0])
+        return lag[0]
+
+    clock = [100.0]
+    monkeypatch.setattr(database, "_measure_lag", measure)
+    monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+
+    assert read_source() == "primary"
+    lag[0] = 0.0
+    clock[0] += 1
+    assert read_source() == "primary"  # sin comprobar de nuevo
+    clock[0] += 1
+    assert read_source() == "replica"
+    assert checks == [30.0, 0.0]
+
+
+def test_replica_down_falls_back_to_primary(pools, monkeypatch):
+    _, replica = pools
+    replica.error = psycopg2.OperationalError("connection refused")
+    assert read_source() == "primary"
+    status = database.replica_status()
+    assert status["usable"] is False
+    assert "connection refused" in status["error"]
+
+
+def test_without_replica_url_reads_from_primary(pools, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", "")
+    assert read_source() == "primary"
+    assert database.replica_status()["configured"] is False
+
+
+@pytest.mark.skipif(not (TEST_DATABASE_URL and TEST_REPLICA_URL), reason="TEST_DATABASE_URL / TEST_REPLICA_URL not set")
+def test_paused_replay_routes_reads_to_primary(monkeypatch):
+    monkeypatch.setattr(database, "_replica_pool", None)
+    monkeypatch.setattr(database, "_replica_state", {"usable": False, "lag_seconds": None, "checked_at": None, "error": None})
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", TEST_REPLICA_URL)
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_MAX_LAG_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_CHECK_SECONDS", 0)
+    primary = psycopg2.connect(TEST_DATABASE_URL)
+    primary.autocommit = True
+    standby = psycopg2.connect(TEST_REPLICA_URL)
+    standby.autocommit = True
+
+    def read_is_replica():
+        conn = database._acquire_replica()
+        if conn is None:
+            return False
+        database._release_replica(conn)
+        return True
+
+    try:
+        assert read_is_replica()
+        standby.cursor().execute("SELECT pg_wal_replay_pause()")
+        primary.cursor().execute("CREATE TABLE IF NOT EXISTS replica_probe (id int)")
+        primary.cursor().execute("INSERT INTO replica_probe VALUES (1)")
+        time.sleep(1)
+        assert not read_is_replica()
+        assert database.replica_status()["lag_seconds"] > 0.5
+    finally:
+        standby.cursor().execute("SELECT pg_wal_replay_resume()")
+        primary.cursor().execute("DROP TABLE IF EXISTS replica_probe")
+        primary.close()
+        standby.close()
+        if database._replica_pool is not None:
+            database._replica_pool.closeall()
+
+    deadline = time.monotonic() + 5
+    while not read_is_replica():
+        assert time.monotonic() < deadline, database.replica_status()
+        time.sleep(0.1)
+    database._replica_pool.closeall()
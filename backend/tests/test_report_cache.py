@@ -0,0 +1,112 @@
+"""
+Tests for the process-local report cache.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.core import report_cache as report_module
+from app.core.report_cache import ReportCache, make_key
+
+TODAY = date(2025, 3, 10)
+
+
+@pytest.fixture(autouse=True)
+def fixed_today(monkeypatch):
+    monkeypatch.setattr(report_module.business_day, "today", lambda: TODAY)
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"n": self.calls}
+
+
+def test_key_ignores_parameter_order():
+    assert make_key("top", {"a": 1, "b": date(2025, 1, 1)}) == make_key("top", {"b": date(2025, 1, 1), "a": 1})
+
+
+def test_bypassed_while_listener_is_down():
+    cache, compute = ReportCache(), Counter()
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    assert compute.calls == 2
+    assert cache.get_stats()["bypassed"] == 2
+
+
+def test_closed_day_never_expires(listening, monkeypatch):
+    cache, compute = ReportCache(today_ttl=30), Counter()
+    yesterday = TODAY - timedelta(days=1)
+    cache.get_or_compute("daily-sales", {"d": yesterday}, yesterday, yesterday, compute)
+    monkeypatch.setattr(report_module.time, "monotonic", lambda: 10 ** 9)
+    assert cache.get_or_compute("daily-sales", {"d": yesterday}, yesterday, yesterday, compute) == {"n": 1}
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["closed_day_entries"]) == (1, 1, 1)
+
+
+def test_today_expires_after_ttl(listening, monkeypatch):
+    cache, compute = ReportCache(today_ttl=30), Counter()
+    clock = [1000.0]
+    monkeypatch.setattr(report_module.time, "monotonic", lambda: clock[0])
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    clock[0] += 29
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    clock[0] += 2
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    assert compute.calls == 2
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_notify_drops_only_ranges_covering_the_day(listening):
+    cache, compute = ReportCache(), Counter()
+    cache.get_or_compute("top", {"m": 1}, date(2025, 1, 1), date(2025, 1, 31), compute)
+    cache.get_or_compute("top", {"m": 2}, date(2025, 2, 1), date(2025, 2, 28), compute)
+    cache.get_or_compute("top", {"all": True}, None, None, compute)
+
+    assert cache.invalidate("2025-01-15") == 2
+    cache.get_or_compute("top", {"m": 2}, date(2025, 2, 1), date(2025, 2, 28), compute)
+    assert compute.calls == 3
+    assert cache.invalidate("*") == 1
+
+
+def test_result_overlapping_invalidation_is_not_stored(listening):
+    cache = ReportCache()
+
+    def compute():
+        cache.invalidate("2025-01-01")
+        return {}
+
+    cache.get_or_compute("daily-sales", {}, TODAY, TODAY, compute)
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_replica_result_after_recent_invalidation_expires(listening, monkeypatch):
+    cache, compute = ReportCache(today_ttl=30), Counter()
+    clock = [1000.0]
+    monkeypatch.setattr(report_module.time, "monotonic", lambda: clock[0])
+    yesterday = TODAY - timedelta(days=1)
+    cache.invalidate(yesterday.isoformat())
+    clock[0] += 3
+    # La réplica puede ir 5 s por detrás: aún podría no tener el cambio de ayer
+    cache.get_or_compute("daily-sales", {"d": 1}, yesterday, yesterday, compute, staleness=5)
+    cache.get_or_compute("daily-sales", {"d": 2}, yesterday - timedelta(days=1), yesterday - timedelta(days=1), compute, staleness=5)
+    clock[0] += 10
+    cache.get_or_compute("daily-sales", {"d": 3}, yesterday, yesterday, compute, staleness=5)
+    assert cache.get_stats()["closed_day_entries"] == 2
+
+
+def test_lru_eviction(listening):
+    cache, compute = ReportCache(max_entries=2), Counter()
+    for n in range(3):
+        cache.get_or_compute("top", {"n": n}, None, None, compute)
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["evicted"]) == (2, 1)
+
+
+def test_purge_endpoint(client):
+    response = client.delete("/api/reports/cache")
+    assert response.status_code == 200
+    assert client.get("/api/reports/cache/stats").json()["listening"] is False
@@ -0,0 +1,79 @@
+"""
+EXPLAIN checks: report filters on orders must be served by indexes.
+
+Needs a migrated database (init.sql + migrations); skipped unless
+TEST_DATABASE_URL is set, e.g.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/burger_pos pytest tests/test_report_indexes.py
+
+Sequential scans are disabled for the transaction, so the planner picks an
+index whenever one can serve the predicate, even on a small table. A scan
+counts as served by an index only if the predicate is its Index Cond (a full
+index walk with a Filter does not).
+"""
+import json
+import os
+from datetime import date
+
+import pytest
+
+from app.core.business_day import day_bounds
+from app.repositories.report_repository import DAILY_SALES_SQL
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+@pytest.fixture
+def cursor():
+    import psycopg2
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL enable_seqscan = off")
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def plan_scans(cursor, query, params=None) -> list[tuple[str, str]]:
+    """(index name, index condition) for every index scan on orders in the plan."""
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    raw = cursor.fetchone()[0]
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    scans, stack = [], [plan]
+    while stack:
+        node = stack.pop()
+        if node.get("Index Name", "").startswith("idx_orders"):
+            scans.append((node["Index Name"], node.get("Index Cond", "")))
+        stack.extend(node.get("Plans", []))
+    return scans
+
+
+def test_date_function_cannot_use_an_index(cursor):
+    """The old filter: DATE(created_at) hides the column from every index"""
+    scans = plan_scans(cursor, "SELECT COUNT(*) FROM orders WHERE DATE(created_at) = %s", (date(2025, 1, 10),))
+    assert all("created_at" not in cond for _, cond in scans)
+
+
+def test_business_day_range_uses_created_at_index(cursor):
+    start, end = day_bounds(date(2025, 1, 10))
+    scans = plan_scans(cursor, "SELECT COUNT(*) FROM orders WHERE created_at >= %s AND created_at < %s", (start, end))
+    assert scans and all("created_at" in cond for _, cond in scans)
+    assert {name for name, _ in scans} <= {"idx_orders_created_id", "idx_orders_active_created"}
+
+
+def test_daily_sales_live_part_uses_active_index(cursor):
+    start, end = day_bounds(date(2025, 1, 10))
+    scans = plan_scans(cursor, DAILY_SALES_SQL, {"day": date(2025, 1, 10), "start": start, "end": end})
+    assert scans and all(name == "idx_orders_active_created" and "created_at" in cond for name, cond in scans)
+
+
+def test_business_date_uses_its_index(cursor):
+    scans = plan_scans(
+        cursor, "SELECT COUNT(*) FROM orders WHERE business_date BETWEEN %s AND %s",
+        (date(2025, 1, 1), date(2025, 1, 31)),
+    )
+    assert scans and all(name == "idx_orders_business_date" and "business_date" in cond for name, cond in scans)
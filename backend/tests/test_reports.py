@@ -0,0 +1,142 @@
+"""
+Tests for the sales reports served from the daily rollups.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from psycopg2.pool import PoolError
+
+from app.repositories.report_repository import ReportRepository
+from app.routers import reports
+from app.services import order_export
+
+
+def test_daily_sales_merges_rollup_and_active_orders(make_conn):
+    rows = [
+        {"order_type": "takeout", "status": "completed", "orders_count": 3, "total_sales": Decimal("30.00"), "total_tax": Decimal("3.00")},
+        {"order_type": "takeout", "status": "cancelled", "orders_count": 1, "total_sales": Decimal("9.00"), "total_tax": Decimal("0.90")},
+        {"order_type": "takeout", "status": "active", "orders_count": 1, "total_sales": Decimal("10.00"), "total_tax": Decimal("1.00")},
+        {"order_type": "delivery", "status": "cancelled", "orders_count": 2, "total_sales": Decimal("20.00"), "total_tax": Decimal("2.00")},
+    ]
+    summary, by_type = ReportRepository(make_conn(fetchall=rows)).get_daily_sales(date(2025, 1, 1))
+
+    assert summary["total_orders"] == 4
+    assert summary["total_sales"] == Decimal("40.00")
+    assert summary["average_ticket"] == Decimal("10")
+    assert summary["total_tax"] == Decimal("4.00")
+    assert (summary["completed_orders"], summary["cancelled_orders"]) == (3, 3)
+    # Solo cancelaciones: el tipo no aparece, igual que con GROUP BY sobre no canceladas
+    assert by_type == [{"order_type": "takeout", "count": 4, "total": Decimal("40.00")}]
+
+
+def test_daily_sales_empty_day(make_conn):
+    summary, by_type = ReportRepository(make_conn(fetchall=[])).get_daily_sales(date(2025, 1, 1))
+    assert summary["total_orders"] == 0
+    assert summary["average_ticket"] == 0
+    assert by_type == []
+
+
+def test_revenue_by_period_rejects_unknown_grouping(client):
+    response = client.get("/api/reports/revenue-by-period?date_from=2025-01-01&date_to=2025-01-31&group_by=year")
+    assert response.status_code == 400
+
+
+def test_top_products_reads_rollups(client):
+    response = client.get("/api/reports/top-products?date_from=2025-01-01&date_to=2025-01-31")
+    assert response.status_code == 200
+    assert response.json()["top_products"] == []
+
+
+def test_export_rejects_inverted_range(client):
+    response = client.get("/api/reports/export?date_from=2025-02-01&date_to=2025-01-01")
+    assert response.status_code == 400
+
+
+def test_export_rejects_unknown_format(client):
+    response = client.get("/api/reports/export?date_from=2025-01-01&date_to=2025-01-31&format=xml")
+    assert response.status_code == 422
+
+
+def test_export_streams_in_chunks(monkeypatch):
+    rows = [(i, f"#{i:03d}") + (None,) * (len(order_export.CSV_COLUMNS) - 2) for i in range(1, 1201)]
+    monkeypatch.setattr(order_export, "_rows", lambda query, start, end, cursor_factory=None: iter(rows))
+
+    chunks = list(order_export.stream_orders_export("csv", datetime(2025, 1, 1), datetime(2025, 2, 1)))
+    assert len(chunks) == 3  # 500 + 500 + 200 filas
+    lines = "".join(chunks).splitlines()
+    assert lines[0].startswith("order_id,order_number,business_date")
+    assert len(lines) == 1201
+    assert lines[1].startswith("1,#001,")
+
+
+def test_dashboard_runs_sections_concurrently(client, monkeypatch, make_conn):
+    """Each section waits for the other three: only passes if they run at the same time"""
+    barrier = threading.Barrier(4, timeout=5)
+
+    @contextmanager
+    def fake_connection():
+        barrier.wait()
+        conn = make_conn(fetchall=[])
+        conn.cursor.return_value.fetchone.return_value = None
+        yield conn
+
+    monkeypatch.setattr(reports, "pooled_read_connection", fake_connection)
+    response = client.get("/api/reports/dashboard?report_date=2025-01-10&revenue_days=3")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["daily_sales"]["summary"]["total_orders"] == 0
+    assert body["revenue"]["date_from"] == "2025-01-08"
+    assert body["cash_session"] is None
+    assert set(body["timings_ms"]) == {"daily_sales", "top_products", "revenue", "cash_session", "total"}
+    assert "daily_sales;dur=" in response.headers["server-timing"]
+
+
+def test_dashboard_caps_connections_per_worker(client, monkeypatch, make_conn):
+    lock, held, peak = threading.Lock(), [0], [0]
+
+    @contextmanager
+    def fake_connection():
+        with lock:
+            held[0] += 1
+            peak[0] = max(peak[0], held[0])
+        time.sleep(0.01)
+        try:
+            yield make_conn(fetchall=[])
+        finally:
+            with lock:
+                held[0] -= 1
+
+    monkeypatch.setattr(reports, "pooled_read_connection", fake_connection)
+    monkeypatch.setattr(reports, "dashboard_slots", asyncio.Semaphore(2))
+    response = client.get("/api/reports/dashboard?report_date=2025-01-10")
+    assert response.status_code == 200
+    assert peak[0] == 2
+
+
+def test_dashboard_pool_exhausted_is_503(client, monkeypatch):
+    def exhausted():
+        raise PoolError("connection pool exhausted")
+
+    monkeypatch.setattr(reports, "pooled_read_connection", exhausted)
+    response = client.get("/api/reports/dashboard?report_date=2025-01-09")
+    assert response.status_code == 503
+
+
+def test_heatmap_counts_days_per_weekday(client):
+    # 2025-01-01 y 2025-01-15 son miércoles: el miércoles aparece 3 veces, el resto 2
+    response = client.get("/api/reports/heatmap?date_from=2025-01-01&date_to=2025-01-15")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["days_per_weekday"] == {"1": 2, "2": 2, "3": 3, "4": 2, "5": 2, "6": 2, "7": 2}
+    assert body["cells"] == []
+
+
+def test_heatmap_groups_by_order_type_on_request(make_conn):
+    conn = make_conn(fetchall=[])
+    ReportRepository(conn).get_heatmap(date(2025, 1, 1), date(2025, 1, 31), by_order_type=True)
+    query = conn.cursor.return_value.execute.call_args[0][0]
+    assert "GROUP BY weekday, hour, order_type" in query
@@ -0,0 +1,121 @@
+"""
+Tests for the in-memory sales cube.
+"""
+from contextlib import contextmanager
+from datetime import date
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.services import sales_cube as cube_module
+from app.services.sales_cube import COLUMNS, DTYPES, CubeQueryError, SalesCube, query
+
+# (día, hora, tipo, producto, categoría, usuario, orden, cantidad, céntimos)
+LINES = [
+    (date(2025, 1, 6), 12, "takeout", 1, 10, 7, 100, 1, 1000),   # lunes
+    (date(2025, 1, 6), 12, "takeout", 2, 20, 7, 100, 2, 600),
+    (date(2025, 1, 6), 19, "delivery", 1, 10, 8, 101, 1, 1000),
+    (date(2025, 1, 7), 19, "delivery", 1, 10, 8, 102, 3, 3000),  # martes
+    (date(2025, 2, 3), 20, "takeout", 2, 20, 7, 103, 1, 300),
+]
+
+
+def chunks_for(lines, order_types):
+    chunks = {name: [] for name in COLUMNS}
+    for name, dtype, values in zip(COLUMNS, DTYPES, zip(*lines)):
+        if name == "order_type":
+            for t in values:
+                if t not in order_types:
+                    order_types.append(t)
+            values = [order_types.index(t) for t in values]
+        chunks[name].append(np.array(values, dtype=dtype))
+    return chunks
+
+
+@pytest.fixture
+def data():
+    order_types = []
+    return SalesCube._build(chunks_for(LINES, order_types), order_types, None, None)
+
+
+def test_group_by_several_dimensions(data):
+    result = query(data, ["weekday", "order_type"])
+    assert result["rows"] == [
+        {"weekday": 1, "order_type": "takeout", "orders": 2, "lines": 3, "quantity": 4, "revenue": 19.0},
+        {"weekday": 1, "order_type": "delivery", "orders": 1, "lines": 1, "quantity": 1, "revenue": 10.0},
+        {"weekday": 2, "order_type": "delivery", "orders": 1, "lines": 1, "quantity": 3, "revenue": 30.0},
+    ]
+
+
+def test_filters_and_order_by(data):
+    result = query(data, ["user_id"], ["date:2025-01-01..2025-01-31", "product_id:1"], order_by="revenue")
+    assert [(r["user_id"], r["revenue"]) for r in result["rows"]] == [(8, 40.0), (7, 10.0)]
+    assert result["rows_scanned"] == 3
+
+
+def test_totals_without_group_by(data):
+    assert query(data, [])["rows"] == [{"orders": 4, "lines": 5, "quantity": 8, "revenue": 59.0}]
+    assert query(data, ["month"], ["order_type:unknown"])["rows"] == []
+
+
+def test_rejects_unknown_dimension(data):
+    with pytest.raises(CubeQueryError):
+        query(data, ["waiter"])
+    with pytest.raises(CubeQueryError):
+        query(data, [], ["hour:abc"])
+
+
+def test_out_of_range_queries_are_rejected(data):
+    # hour es int8: 264 no debe dar la vuelta hasta coincidir con las 8
+    for spec in ["hour:264", "hour:0..1000", "product_id:99999999999"]:
+        with pytest.raises(CubeQueryError):
+            query(data, [], [spec])
+
+    top = 2**31 - 1
+    sparse = LINES[:1] + [(date(2025, 1, 6), 12, "takeout", top, top, top, 104, 1, 100)]
+    wide = SalesCube._build(chunks_for(sparse, []), [], None, None)
+    with pytest.raises(CubeQueryError):
+        query(wide, ["product_id", "category_id", "user_id"])
+
+
+def test_refresh_reloads_only_changed_days(monkeypatch, listening):
+    sales_cube = SalesCube()
+    fetched = []
+
+    def fake_fetch(conn, days, order_types):
+        fetched.append(days)
+        lines = LINES if days is None else [
+            (date(2025, 1, 7), 21, "dine_in", 3, 30, 9, 104, 1, 500),
+        ]
+        return chunks_for(lines, order_types)
+
+    @contextmanager
+    def fake_connection():
+        yield MagicMock()
+
+    monkeypatch.setattr(sales_cube, "_fetch", fake_fetch)
+    monkeypatch.setattr(cube_module, "pooled_connection", fake_connection)
+
+    sales_cube.refresh()
+    sales_cube.mark_changed("2025-01-07")
+    data = sales_cube.refresh()
+
+    assert fetched == [None, [date(2025, 1, 7)]]
+    tuesday = query(data, ["order_type"], ["weekday:2"])["rows"]
+    assert tuesday == [{"order_type": "dine_in", "orders": 1, "lines": 1, "quantity": 1, "revenue": 5.0}]
+    assert data.rows == 5
+    assert sales_cube.refresh() is data  # nada pendiente
+
+
+def test_cube_endpoint_while_loading(client):
+    response = client.get("/api/reports/cube?group_by=hour")
+    assert response.status_code == 503
+
+
+def test_sparse_group_space_gives_same_result(data, monkeypatch):
+    dense = query(data, ["date", "product_id"], order_by="quantity")
+    monkeypatch.setattr(cube_module, "DENSE_GROUPS", 0)
+    assert query(data, ["date", "product_id"], order_by="quantity") == dense
+    assert dense["rows"][0] == {"date": date(2025, 1, 7), "product_id": 1, "orders": 1, "lines": 1, "quantity": 3, "revenue": 30.0}
+    assert [r["month"] for r in query(data, ["month"])["rows"]] == ["2025-01", "2025-02"]
@@ -0,0 +1,65 @@
+"""
+Tests for the Z-report snapshot of closed cash sessions (migration 013).
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+from app.repositories.cash_repository import CashRepository
+
+SESSION = {
+    "id": 7, "user_id": 1, "status": "open", "opening_amount": Decimal("100.00"),
+    "closing_amount": None, "expected_amount": None, "difference": None,
+    "total_cash_sales": Decimal("30.00"), "total_card_sales": Decimal("20.00"),
+    "total_sales": Decimal("50.00"), "total_tips": Decimal("2.00"), "orders_count": 3,
+    "opened_at": datetime(2025, 1, 13, 9), "closed_at": None, "notes": None,
+}
+
+PAYMENTS = [
+    {"id": i, "order_id": 10 + i, "payment_type": payment_type, "total_amount": amount,
+     "cash_amount": amount if payment_type == "cash" else Decimal("0"),
+     "card_amount": amount if payment_type == "card" else Decimal("0"),
+     "tip_amount": Decimal("1.00"), "change_amount": Decimal("0"), "created_at": datetime(2025, 1, 13, 12, i)}
+    for i, (payment_type, amount) in enumerate([("cash", Decimal("12.00")), ("cash", Decimal("18.00")), ("card", Decimal("20.00"))])
+]
+
+
+def test_build_z_report_groups_payments_by_type(make_conn):
+    top_products = [{"product_id": 2, "product_name": "Cheeseburger", "quantity": 4, "revenue": Decimal("38.00")}]
+    conn = make_conn(fetchone=SESSION, fetchall=iter([PAYMENTS, top_products]).__next__)
+
+    report = CashRepository(conn).build_z_report(7)
+    assert report["expected_cash"] == Decimal("132.00")
+    assert report["payment_types"] == [
+        {"payment_type": "card", "payments": 1, "total_amount": Decimal("20.00"), "tip_amount": Decimal("1.00")},
+        {"payment_type": "cash", "payments": 2, "total_amount": Decimal("30.00"), "tip_amount": Decimal("2.00")},
+    ]
+    assert report["top_products"][0]["product_name"] == "Cheeseburger"
+
+
+def test_closed_session_summary_is_one_fetch(client, mock_db):
+    conn, cursor = mock_db, mock_db.cursor.return_value
+    report = json.loads(json.dumps({
+        "session_id": 7, "user_id": 1, "status": "closed", "opening_amount": "100.00",
+        "total_cash_sales": "30.00", "total_card_sales": "20.00", "total_tips": "2.00",
+        "expected_cash": "132.00", "orders_count": 3, "payments": PAYMENTS,
+    }, default=str))
+    cursor.fetchone.return_value = {"report": report}
+
+    response = client.get("/api/cash/sessions/7/summary")
+    assert response.status_code == 200, response.text
+    assert response.json()["expected_cash"] == "132.00"
+    assert len(response.json()["payments"]) == 3
+    assert cursor.execute.call_count == 1
+    conn.commit.assert_not_called()
+
+
+def test_open_session_summary_is_computed_live_and_not_stored(client, mock_db):
+    conn, cursor = mock_db, mock_db.cursor.return_value
+    cursor.fetchone.side_effect = [None, SESSION]  # sin informe Z, sesión abierta
+    cursor.fetchall.side_effect = [PAYMENTS, []]
+
+    response = client.get("/api/cash/sessions/7/summary")
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "open"
+    assert not any("cash_session_reports (" in call.args[0] for call in cursor.execute.call_args_list)
+    conn.commit.assert_not_called()
@@ -31,6 +31,37 @@ public class PosApiService
             _httpClient.DefaultRequestHeaders.Authorization = new AuthenticationHeaderValue("Bearer", token);
         }
     }
+
+    /// <summary>
+    /// POST with an Idempotency-Key header, retried with the same key on network
+    /// errors, timeouts, 409 and 5xx (flaky shop Wi-Fi). The backend answers a retry
+    /// of a request that already went through with the original response, so the
+    /// order or payment is never recorded twice.
+    /// </summary>
+    private async Task<HttpResponseMessage> PostIdempotentAsync<T>(string url, T body, int attempts = 3)
+    {
+        var key = Guid.NewGuid().ToString();
+        for (var attempt = 1; ; attempt++)
+        {
+            using var request = new HttpRequestMessage(HttpMethod.Post, url) { Content = JsonContent.Create(body) };
+            request.Headers.Add("Idempotency-Key", key);
+            try
+            {
+                var response = await _httpClient.SendAsync(request);
+                var retry = response.StatusCode == System.Net.HttpStatusCode.Conflict || (int)response.StatusCode >= 500;
+                if (!retry || attempt == attempts)
+                {
+                    return response;
+                }
+                response.Dispose();
+            }
+            catch (Exception ex) when (attempt < attempts && ex is HttpRequestException or TaskCanceledException)
+            {
+                _logger.LogWarning(ex, "Reintentando {Url} ({Attempt}/{Attempts})", url, attempt, attempts);
+            }
+            await Task.Delay(TimeSpan.FromMilliseconds(500 * attempt));
+        }
+    }
     // ==================== HEALTH CHECK ====================
 
     public async Task<bool> TestConnectionAsync()
@@ -354,6 +385,30 @@ public class PosApiService
         }
     }
 
+    /// <summary>
+    /// Historial completo (admin/manager): lee de la réplica, puede ir unos segundos por detrás.
+    /// </summary>
+    public async Task<List<Order>> GetOrderHistoryAsync(string? status = null, int limit = 100)
+    {
+        try
+        {
+            var url = $"/api/orders/history?limit={limit}";
+            if (!string.IsNullOrEmpty(status))
+            {
+                url += $"&status={status}";
+            }
+
+            await EnsureAuthHeaderAsync();
+            var orders = await _httpClient.GetFromJsonAsync<List<Order>>(url);
+            return orders ?? new List<Order>();
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Error obteniendo historial de órdenes");
+            return new List<Order>();
+        }
+    }
+
     // ==================== CATEGORIES ====================
 
     public async Task<List<Category>> GetCategoriesAsync()
@@ -435,7 +490,7 @@ public class PosApiService
             _logger.LogInformation("Creando orden para: {CustomerName}", orderData.CustomerName);
             
             await EnsureAuthHeaderAsync();
-            var response = await _httpClient.PostAsJsonAsync("/api/orders", orderData);
+            var response = await PostIdempotentAsync("/api/orders", orderData);
             
             if (response.IsSuccessStatusCode)
             {
@@ -516,7 +571,7 @@ public class PosApiService
             _logger.LogInformation("Procesando pago para orden: {OrderId}", payment.OrderId);
             
             await EnsureAuthHeaderAsync();
-            var response = await _httpClient.PostAsJsonAsync("/api/cash/payments", payment);
+            var response = await PostIdempotentAsync("/api/cash/payments", payment);
             
             if (response.IsSuccessStatusCode)
             {
@@ -0,0 +1,17 @@
+#!/bin/bash
+# ==============================================
+# Allow streaming replication on the primary (docker-compose.replica.yml)
+# ==============================================
+# Runs from /docker-entrypoint-initdb.d the first time the db volume is
+# created. On an existing volume run it once by hand:
+#   docker compose exec db bash /docker-entrypoint-initdb.d/03_replication.sh
+#   docker compose restart db
+# ==============================================
+
+set -euo pipefail
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+
+if ! grep -q "^host replication" "${PGDATA}/pg_hba.conf"; then
+  echo "host replication all all scram-sha-256" >> "${PGDATA}/pg_hba.conf"
+fi
@@ -0,0 +1,30 @@
+#!/bin/bash
+# ==============================================
+# Hot standby of the db service (docker-compose.replica.yml)
+# ==============================================
+# The first start clones the primary with pg_basebackup (-R writes
+# standby.signal and primary_conninfo); later starts just resume streaming.
+# Remove the db-replica volume to clone again from scratch.
+# ==============================================
+
+set -euo pipefail
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+PRIMARY_HOST="${PRIMARY_HOST:-db}"
+
+until pg_isready -h "${PRIMARY_HOST}" -U "${POSTGRES_USER}" -q; do
+  echo "[$(date)] Waiting for ${PRIMARY_HOST}..."
+  sleep 1
+done
+
+if [ ! -s "${PGDATA}/PG_VERSION" ]; then
+  echo "[$(date)] Cloning ${PRIMARY_HOST} into ${PGDATA}..."
+  PGPASSWORD="${POSTGRES_PASSWORD}" pg_basebackup \
+    -h "${PRIMARY_HOST}" \
+    -U "${POSTGRES_USER}" \
+    -D "${PGDATA}" \
+    -R -X stream
+  chmod 700 "${PGDATA}"
+fi
+
+exec postgres -c hot_standby=on -c hot_standby_feedback=on